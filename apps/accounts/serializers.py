@@ -106,13 +106,25 @@ class ChangePasswordSerializer(serializers.Serializer):
         return data
 
 
-class UpdateProfileSerializer(serializers.Serializer):
+class UpdateProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model= CustomUser
-        fileds = ['first_name', 'last_name', 'username', 'phone_number', 'date_of_birth', 'default_currency']
+        fields = ['first_name', 'last_name', 'username', 'phone_number', 'date_of_birth', 'default_currency']
 
     def validate_username(self, value):
         user = self.context.get('request').user if self.context.get('request') else self.instance
         if CustomUser.objects.filter(username= value).exclude(id=user.id).exists():
             raise serializers.ValidationError('Username already taken')
-        return value
\ No newline at end of file
+        return value
+
+
+class RevaluationJobSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    currency = serializers.CharField()
+    status = serializers.CharField()
+    total_transactions = serializers.IntegerField()
+    processed_transactions = serializers.IntegerField()
+    progress = serializers.FloatField()
+    error = serializers.CharField(allow_null=True)
+    created_at = serializers.DateTimeField()
+    completed_at = serializers.DateTimeField(allow_null=True)
@@ -19,6 +19,7 @@ urlpatterns= [
     path('profile/change-password/', UserProfileViewSet.as_view({'post': 'change_password'}), name = 'change-password'),
     path('profile/delete/', UserProfileViewSet.as_view({'delete': 'delete_account'}), name='delete-account'),
     path('profile/statistics/', UserProfileViewSet.as_view({'get': 'statistics'}), name='profile-statistics'),
+    path('profile/revaluation/', UserProfileViewSet.as_view({'get': 'revaluation'}), name='profile-revaluation'),
 
     #additionals
     path('check-username/', check_username_availability, name='check-username'),
@@ -480,14 +480,32 @@ class UserProfileViewSet(viewsets. ViewSet):
     
 
     def update(self, request):
-        serializer = UpdateProfileSerializer(request.user, data=request.data, partial=True)
+        from apps.transactions.jobs import schedule_revaluation
+
+        old_currency = request.user.default_currency
+        serializer = UpdateProfileSerializer(request.user, data=request.data, partial=True, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        user = serializer.save()
 
-        return Response({
+        data = {
             'message': 'Profile updated successfully',
-            'user': UserSerializer(request.user).data
-        })
+            'user': UserSerializer(user).data
+        }
+
+        if user.default_currency != old_currency:
+            job = schedule_revaluation(user)
+            data['revaluation_job'] = RevaluationJobSerializer(job).data
+
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def revaluation(self, request):
+        job = request.user.revaluation_jobs.first()
+        if job is None:
+            return Response({
+                'error': 'No re-valuation has been started'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response(RevaluationJobSerializer(job).data)
     
     @action(detail=False, methods=['post'])
     def change_password(self, request):
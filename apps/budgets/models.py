@@ -5,6 +5,7 @@ from decimal import Decimal
 from datetime import timedelta
 from apps.accounts.models import *
 from apps.cards.models import *
+from apps.cards.money import Money, to_minor
 from apps.transactions.models import *
 
 
@@ -27,6 +28,7 @@ class Budget(models.Model):
     category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='budgets', help_text="Budget applies to this category")
     name = models.CharField(max_length=200, help_text="Budget name (e.g., 'Weekly Food Budget')")
     amount = models.DecimalField(max_digits=15, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))], help_text="Maximum amount allowed for this period")
+    amount_minor = models.BigIntegerField(default=0, editable=False, help_text="Amount in minor units (e.g. cents), kept in sync with amount")
     currency = models.ForeignKey(Currency, on_delete=models.PROTECT, related_name="budgets", help_text="Currency for this budget")
     period = models.CharField(max_length=10, choices=PERIOD_CHOICES, default='monthly', help_text="Budget reset period")
     start_date = models.DateField(help_text="When this budget starts")
@@ -51,6 +53,10 @@ class Budget(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.name} ({self.amount} {self.currency.code})"
     
+    def save(self, *args, **kwargs):
+        self.amount_minor = to_minor(self.amount)
+        super().save(*args, **kwargs)
+    
     def get_current_period_start(self):
         today = timezone.now().date()
 
@@ -66,7 +72,7 @@ class Budget(models.Model):
         return self.start_date
     
     def get_current_period_end(self):
-        period_start = self.get_current_period_end()
+        period_start = self.get_current_period_start()
 
         if self.period == 'daily':
             return period_start
@@ -84,26 +90,31 @@ class Budget(models.Model):
         return self.end_date or timezone.now().date()
     
     def get_spent_amount(self):
-        from transactions.models import Transaction
-        from cards.models import ExchangeRate
+        from django.db.models import Sum
+        from apps.transactions.models import Transaction
+        from apps.cards.rates import get_rate_matrix
 
         period_start = self.get_current_period_start()
         period_end = self.get_current_period_end()
 
-        transactions = Transaction.objects.filter(user = self.user, category= self.category, type='expense', date__gte=period_start, date_lte = period_end)
+        transactions = Transaction.objects.filter(user_id = self.user_id, category_id= self.category_id, type='expense', date__gte=period_start, date__lte = period_end)
+        rates = get_rate_matrix()
 
-        total = Decimal('0.00')
+        totals = transactions.order_by().values_list('card__currency_id', 'date').annotate(total=Sum('amount_minor'))
 
-        for transaction in transactions:
+        spent = Money()
+
+        for card_currency_id, transaction_date, total_minor in totals:
+            amount = Money(total_minor)
              
-            if transaction.card.currency == self.currency:
-                total += transaction.amount
+            if card_currency_id == self.currency_id:
+                spent += amount
             else:
-                 convert = ExchangeRate.convert(transaction.amount, transaction.card.currency, self.currency)
+                 rate = rates.get_on(card_currency_id, self.currency_id, transaction_date) or rates.get(card_currency_id, self.currency_id)
 
-                 if convert:
-                      total += convert
-        return total
+                 if rate:
+                      spent += amount.convert(rate)
+        return spent.amount
     
     def get_remaining_amount(self):
         spent = self.get_spent_amount()
@@ -119,6 +130,9 @@ class Budget(models.Model):
     
     def is_exceeded(self):
         return self.get_spent_amount() > self.amount
+
+    def is_over_budget(self):
+        return self.is_exceeded()
     
     def should_send_alert(self):
         if self.alert_sent:
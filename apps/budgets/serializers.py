@@ -1,11 +1,13 @@
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Budget
 from apps.transactions.models import Category
 from apps.cards.models import Currency
+from core.serializers import SparseFieldsetMixin
 
 
 
-class BudgetSerializer(serializers.ModelSerializer):
+class BudgetSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only = True)
     category_icon = serializers.ImageField(source='category.icon', read_only =True)
     category_color = serializers.CharField(source='category.color', read_only = True)
@@ -15,7 +17,7 @@ class BudgetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Budget
         fields = [
-            'id', 'name', 'category', 'category_name', 'category_icon', 'category_color', 'amount', 'currency', 'currency_code', 'currency_symbol', 'period', 'alert_threshold', 'is_active', 'created_at'
+            'id', 'name', 'category', 'category_name', 'category_icon', 'category_color', 'amount', 'currency', 'currency_code', 'currency_symbol', 'period', 'alert_threshold', 'status', 'created_at'
         ]
 
 
@@ -40,7 +42,7 @@ class BudgetDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'category_name', 'category_icon', 'category_color', 'category_type',
             'amount', 'currency', 'currency_code', 'currency_name', 'currency_symbol',
-            'period', 'alert_threshold', 'is_active', 'spent_amount', 'percentage_used', 'is_over_budget', 'created_at', 'updated_at'
+            'period', 'alert_threshold', 'status', 'spent_amount', 'percentage_used', 'is_over_budget', 'created_at', 'updated_at'
         ]
 
     def get_spent_amount(self, obj):
@@ -58,11 +60,14 @@ class BudgetDetailSerializer(serializers.ModelSerializer):
 
 
 class BudgetCreateSerializer(serializers.ModelSerializer):
+    start_date = serializers.DateField(required=False)
+
     class Meta:
         model = Budget
         fields = [
-            'name', 'category', 'amount', 'currency', 'period', 'alert_threshold', 'is_active'
+            'name', 'category', 'amount', 'currency', 'period', 'start_date', 'end_date', 'alert_threshold', 'status'
         ]
+        extra_kwargs = {'name': {'required': False}}
 
     def validate_category(self, value):
         if value.type != 'expense':
@@ -75,10 +80,15 @@ class BudgetCreateSerializer(serializers.ModelSerializer):
         return value
     
     def validate(self, data):
+        # Defaults only on create; a partial update keeps what is stored
+        if self.instance is not None:
+            return data
+
         if 'name' not in data or not data['name']:
             period = data.get('period', 'monthly')
             category_name = data['category'].name
             data['name'] = f"{period.capitalize()} {category_name} Budget"
+        data.setdefault('start_date', timezone.localdate())
 
         return data
     
@@ -1,3 +1,114 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import CustomUser
+from apps.cards.models import Card, CardType, Currency
+from apps.transactions.models import Category, Transaction
+from .models import Budget
+
+
+class BudgetTestData:
+    """
+    A USD user with a USD card, two expense categories and a monthly
+    budget of 100 on the first one, 90 of it already spent.
+    """
+
+    def create_world(self):
+        cache.clear()
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.user = CustomUser.objects.create(email='a@b.c', username='alice', auth_status='done', default_currency='USD')
+        self.card = Card.objects.create(
+            user=self.user, card_type=CardType.objects.create(name='Visa'), currency=self.usd, card_name='main',
+            balance=Decimal('1000'), initial_balance=Decimal('1000'),
+        )
+        self.food = Category.objects.create(name='Food', type='expense')
+        self.transport = Category.objects.create(name='Transport', type='expense')
+        self.today = timezone.localdate()
+        self.budget = Budget.objects.create(
+            user=self.user, name='Food', category=self.food, amount=Decimal('100'), currency=self.usd,
+            period='monthly', start_date=self.today - timedelta(days=60),
+        )
+        Transaction.objects.create(
+            user=self.user, card=self.card, category=self.food, type='expense', title='Groceries',
+            amount=Decimal('90'), amount_in_user_currency=Decimal('90'), exchange_rate_used=Decimal('1'), date=self.today,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class BudgetStatusTests(BudgetTestData, TestCase):
+
+    def setUp(self):
+        self.create_world()
+
+    def test_overview_answers_and_is_served_from_the_cache(self):
+        Budget.objects.create(
+            user=self.user, name='Transport', category=self.transport, amount=Decimal('50'), currency=self.usd,
+            period='weekly', start_date=self.today, status='paused',
+        )
+
+        response = self.client.get('/api/budgets/budgets/overview/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_budgets'], 2)
+        self.assertEqual(response.data['active_budgets'], 1)
+        self.assertEqual(response.data['total_spent'], Decimal('90'))
+        self.assertEqual(response.data['budgets_at_warning'], 1)
+        self.assertEqual([budget['id'] for budget in response.data['budgets']], [self.budget.pk])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/budgets/budgets/overview/')
+        self.assertEqual(cached.data, response.data)
+
+    def test_toggle_active_pauses_and_resumes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/budgets/budgets/{self.budget.pk}/toggle_active/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'paused')
+        self.assertEqual(self.client.get('/api/budgets/budgets/active/').data, [])
+        self.assertEqual(self.client.get('/api/budgets/budgets/overview/').data['active_budgets'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/budgets/budgets/{self.budget.pk}/toggle_active/')
+
+        self.assertEqual(response.data['status'], 'active')
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.status, 'active')
+        self.assertEqual(self.client.get('/api/budgets/budgets/overview/').data['active_budgets'], 1)
+
+    def test_alerts_and_groupings_list_active_budgets(self):
+        Budget.objects.create(
+            user=self.user, name='Transport', category=self.transport, amount=Decimal('50'), currency=self.usd,
+            period='daily', start_date=self.today,
+        )
+
+        alerts = self.client.get('/api/budgets/budgets/alerts/')
+        by_category = self.client.get('/api/budgets/budgets/by_category/')
+        by_period = self.client.get('/api/budgets/budgets/by_period/')
+
+        self.assertEqual(alerts.status_code, 200)
+        self.assertEqual([alert['alert_type'] for alert in alerts.data['alerts']], ['warning'])
+        self.assertEqual(by_category.status_code, 200)
+        self.assertEqual(
+            sorted(group['category_name'] for group in by_category.data['categories']), ['Food', 'Transport'],
+        )
+        self.assertEqual(by_period.status_code, 200)
+        self.assertEqual(len(by_period.data['periods']['daily']), 1)
+        self.assertEqual(len(by_period.data['periods']['monthly']), 1)
+
+    def test_create_belongs_to_the_user_and_refuses_a_second_active_budget(self):
+        data = {'category': self.transport.pk, 'amount': '50.00', 'currency': self.usd.pk, 'period': 'weekly'}
+
+        response = self.client.post('/api/budgets/budgets/', data)
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 201, response.data)
+        budget = Budget.objects.get(category=self.transport)
+        self.assertEqual((budget.user, budget.status, budget.start_date), (self.user, 'active', self.today))
+        self.assertEqual(budget.name, 'Weekly Transport Budget')
+        self.assertEqual(self.client.post('/api/budgets/budgets/', data).status_code, 400)
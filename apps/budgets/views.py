@@ -11,6 +11,7 @@ from decimal import Decimal
 from .models import *
 from .serializers import *
 from .filters import BudgetFilter
+from core.cache import cached_response
 
 
 
@@ -22,7 +23,7 @@ from .filters import BudgetFilter
 class BudgetViewSet(viewsets.ModelViewSet):
     """
     Endpoints:
-     GET /api/budgets/ - list user budgets
+     GET /api/budgets/ - list user budgets (?fields=/?omit= to trim)
      POST /api/budgets/ -create
      GET /api/budgets/{id}/ - get a budget by its id
      PUT/PATCH /api/budgets/{id}/ update the budget
@@ -42,10 +43,13 @@ class BudgetViewSet(viewsets.ModelViewSet):
     ordering=['-created_at']
 
     def get_queryset(self):
-        return Budget.objects.filter(user= self.request.user).select_related('category', 'currency')
+        queryset = Budget.objects.filter(user= self.request.user).select_related('category', 'currency')
+        if self.action == 'list':
+            queryset = BudgetSerializer.setup_queryset(queryset, self.request)
+        return queryset
     
 
-    def get_serializer(self):
+    def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return BudgetCreateSerializer
         elif self.action == 'retrieve':
@@ -63,14 +67,14 @@ class BudgetViewSet(viewsets.ModelViewSet):
         category = serializer.validated_data['category']
         period = serializer.validated_data['period']
 
-        existing = Budget.objects.filter(user=request.user, category=category, period=period, is_active=True).exists()
+        existing = Budget.objects.filter(user=request.user, category=category, period=period, status='active').exists()
 
         if existing:
             return Response({
                 'error': f"You already have an active {period} budget for {category.name}",
                 'suggestion': "Update the existing budget or deactivate it first"
             }, status=status.HTTP_400_BAD_REQUEST)
-        budget = serializer.save()
+        budget = serializer.save(user=request.user)
         return Response(
             BudgetDetailSerializer(budget).data,
             status=status.HTTP_201_CREATED
@@ -148,19 +152,20 @@ class BudgetViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def active(self, request):
-        budgets = self.get_queryset().filter(is_active=True)
+        budgets = self.get_queryset().filter(status='active')
         serializer = self.get_serializer(budgets, many=True)
         return Response(serializer.data)
     
 
 
     @action(detail=False, methods=['get'])
+    @cached_response
     def overview(self, request):
-        budgets = self.get_queryset().filter(is_active = True)
+        budgets = self.get_queryset().filter(status='active')
 
         if not budgets.exists():
             return Response({
-                'total_budgets': 0,
+                'total_budgets': self.get_queryset().count(),
                 'active_budgets': 0,
                 'messages': 'No active budgets found'
             })
@@ -206,8 +211,8 @@ class BudgetViewSet(viewsets.ModelViewSet):
 
 
         return Response({
-            'total_budgets': budgets.count(),
-            'active_budgets': budgets.filter(is_active=True).count(),
+            'total_budgets': self.get_queryset().count(),
+            'active_budgets': len(budgets_data),
             'total_budget_amount': total_budget_amount,
             'total_spent': total_spent,
             'total_remaining': total_remaining,
@@ -221,7 +226,7 @@ class BudgetViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def alerts(self, request):
-        budgets =self.get_queryset().filter(is_active=True)
+        budgets =self.get_queryset().filter(status='active')
         alerts = []
 
         for budget in budgets:
@@ -258,23 +263,24 @@ class BudgetViewSet(viewsets.ModelViewSet):
     def toggle_active(self, request, pk=None):
         budget = self.get_object()
 
-        budget.is_active = not budget.is_active
-        budget.save()
+        budget.status = 'paused' if budget.status == 'active' else 'active'
+        budget.save(update_fields=['status', 'updated_at'])
 
-        status_text = 'activated' if budget.is_active else 'deactivated'
+        status_text = 'activated' if budget.status == 'active' else 'deactivated'
 
         return Response({
             'message': f"Budget {status_text}",
-            'is_active': budget.is_active,
+            'status': budget.status,
             'budget': BudgetSerializer(budget).data
         })
     
     @action(detail=False , methods=['get'])
     def by_category(self, request):
-        budgets =self.get_queryset().filter(is_active=True)
+        budgets =self.get_queryset().filter(status='active')
         
         from collections import defaultdict
         categories_dict = defaultdict(list)
+        categories = {}
 
         for budget in budgets:
             budget_data = BudgetSerializer(budget).data
@@ -283,18 +289,17 @@ class BudgetViewSet(viewsets.ModelViewSet):
             budget_data['is_over_budget'] = budget.is_over_budget()
 
             categories_dict[budget.category.id].append(budget_data)
+            categories[budget.category.id] = budget.category
         
         result = []
         for category_id, budgets_list in categories_dict.items():
-            category = budgets[0].category if budgets else None
-            if category:
-                result.append({
-                    'category_id': category_id,
-                    'category_name': category.name,
-                    'category_icon': category.icon,
-                    'category_color': category.color,
-                    'budgets': budgets_list
-                })
+            category = categories[category_id]
+            result.append({
+                'category_id': category_id,
+                'category_name': category.name,
+                'category_icon': category.icon,
+                'budgets': budgets_list
+            })
         
         return Response({
             'categories': result
@@ -302,9 +307,10 @@ class BudgetViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def by_period(self, request):
-        budgets = self.get_queryset().filter(is_active=True)
+        budgets = self.get_queryset().filter(status='active')
 
         periods = {
+            'daily': [],
             'weekly': [],
             'monthly': [],
             'yearly': []
@@ -324,7 +330,8 @@ class BudgetViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def spending_history(self, request, pk=None):
-        from apps.transactions.models import Transaction
+        from apps.cards.money import from_minor
+        from apps.transactions.models import DailyRollup
         from django.db.models.functions import TruncMonth
         from datetime import datetime
 
@@ -332,13 +339,13 @@ class BudgetViewSet(viewsets.ModelViewSet):
         months_back = int(request.query_params.get('months_back', 6))
 
         today = timezone.now().date()
-        start_date = today - timedelta(days=30, * months_back)
-        transactions = Transaction.objects.filter(user=request.user, category=budget.category, type='expense', date__gte=start_date).annotate(month=TruncMonth('date')).values('month').annotate(total=Sum('amount_in_user_currency')).order_by('month')
+        start_date = today - timedelta(days=30 * months_back)
+        spending = DailyRollup.objects.filter(user=request.user, category=budget.category, type='expense', date__gte=start_date, count__gt=0).annotate(month=TruncMonth('date')).values('month').annotate(total=Sum('user_amount_minor')).order_by('month')
 
         history =[]
-        for item in transactions:
+        for item in spending:
             month = item['month']
-            spent = item['total']
+            spent = from_minor(item['total'])
             percentage = (spent/ budget.amount *100) if budget.amount > 0 else 0
 
             history.append({
@@ -47,4 +47,26 @@ class CardAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         })
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('card', 'entry_type', 'amount', 'effective_date', 'transaction_id', 'transfer_id', 'created_at')
+    list_filter = ('entry_type', 'effective_date')
+    search_fields = ('card__card_name', 'description')
+    date_hierarchy = 'effective_date'
+    ordering = ('-id',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('card', 'as_of_date', 'balance', 'entry_count', 'created_at')
+    list_filter = ('as_of_date',)
+    ordering = ('-as_of_date',)
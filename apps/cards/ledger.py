@@ -0,0 +1,133 @@
+from django.db.models import Count, Sum
+
+from .models import BalanceCheckpoint, LedgerEntry
+from .money import from_minor
+
+
+def nearest_checkpoint(card, on_date=None):
+    checkpoints = BalanceCheckpoint.objects.filter(card=card)
+    if on_date is not None:
+        checkpoints = checkpoints.filter(as_of_date__lte=on_date)
+    return checkpoints.order_by('-as_of_date').first()
+
+
+def ledger_total(card, on_date=None):
+    """
+    (balance_minor, entry_count) of the ledger up to and including
+    `on_date` (or everything), starting from the nearest checkpoint so only
+    the entries after it are summed.
+    """
+    checkpoint = nearest_checkpoint(card, on_date)
+
+    entries = LedgerEntry.objects.filter(card=card)
+    if on_date is not None:
+        entries = entries.filter(effective_date__lte=on_date)
+
+    balance_minor = 0
+    entry_count = 0
+    if checkpoint is not None:
+        entries = entries.filter(effective_date__gt=checkpoint.as_of_date)
+        balance_minor = checkpoint.balance_minor
+        entry_count = checkpoint.entry_count
+
+    totals = entries.aggregate(total=Sum('amount_minor'), count=Count('id'))
+    return balance_minor + (totals['total'] or 0), entry_count + totals['count']
+
+
+def balance_as_of(card, on_date):
+    balance_minor, _ = ledger_total(card, on_date)
+    return from_minor(balance_minor)
+
+
+def create_checkpoint(card, as_of_date):
+    balance_minor, entry_count = ledger_total(card, as_of_date)
+    checkpoint, _ = BalanceCheckpoint.objects.update_or_create(
+        card=card,
+        as_of_date=as_of_date,
+        defaults={'balance_minor': balance_minor, 'entry_count': entry_count},
+    )
+    return checkpoint
+
+
+def reconcile(card):
+    """
+    Compare the stored balance (the projection) with the ledger total.
+    """
+    ledger_minor, entry_count = ledger_total(card)
+    return {
+        'card': card.pk,
+        'balance': card.balance,
+        'ledger_balance': from_minor(ledger_minor),
+        'difference': card.balance - from_minor(ledger_minor),
+        'entry_count': entry_count,
+        'is_balanced': card.balance_minor == ledger_minor,
+    }
+
+
+STATEMENT_PAGE_SIZE = 50
+STATEMENT_MAX_PAGE_SIZE = 500
+STATEMENT_CURSOR_SALT = 'cards.statement'
+
+
+def statement_page(card, cursor=None, start=None, end=None, limit=STATEMENT_PAGE_SIZE):
+    """
+    One page of the card's statement in (effective_date, id) order, each
+    entry carrying the running balance after it.
+
+    The running total is a SUM() OVER window in the database, offset by the
+    balance the page opens with. The first page's opening balance comes from
+    the checkpoints (ledger_total up to the day before `start`); every later
+    page opens with the closing balance of the page before, carried in the
+    signed `cursor` together with the last (date, id) seen, so a deep page
+    reads only its own rows.
+
+    Returns (entries, opening_minor, closing_minor, next_cursor).
+    """
+    from datetime import date, timedelta
+    from django.core import signing
+    from django.db.models import F, Q, Window
+
+    entries = LedgerEntry.objects.filter(card=card)
+    if end is not None:
+        entries = entries.filter(effective_date__lte=end)
+
+    if cursor:
+        position = signing.loads(cursor, salt=STATEMENT_CURSOR_SALT)
+        if position['card'] != card.pk:
+            raise signing.BadSignature('Cursor belongs to another card')
+        last_date = date.fromisoformat(position['date'])
+        entries = entries.filter(
+            Q(effective_date__gt=last_date) | Q(effective_date=last_date, id__gt=position['id'])
+        )
+        opening_minor = position['balance']
+    elif start is not None:
+        entries = entries.filter(effective_date__gte=start)
+        opening_minor, _ = ledger_total(card, start - timedelta(days=1))
+    else:
+        opening_minor = 0
+
+    rows = list(
+        entries.annotate(
+            running_minor=Window(Sum('amount_minor'), order_by=[F('effective_date').asc(), F('id').asc()])
+        ).order_by('effective_date', 'id')[:limit + 1]
+    )
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    closing_minor = opening_minor
+    for entry in rows:
+        entry.balance_minor = opening_minor + entry.running_minor
+        closing_minor = entry.balance_minor
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = signing.dumps({
+            'card': card.pk,
+            'date': last.effective_date.isoformat(),
+            'id': last.pk,
+            'balance': closing_minor,
+        }, salt=STATEMENT_CURSOR_SALT)
+
+    return rows, opening_minor, closing_minor, next_cursor
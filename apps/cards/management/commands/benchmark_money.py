@@ -0,0 +1,68 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from apps.accounts.models import CustomUser
+from apps.cards.models import Card, CardType, Currency, LedgerEntry
+from apps.cards.money import from_minor
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare sums over the decimal amount column with sums over amount_minor (on scratch ledger rows that are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help="Number of ledger rows (default 1000000)")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def timed(self, function):
+        started = time.perf_counter()
+        result = function()
+        return result, time.perf_counter() - started
+
+    def run(self, options):
+        rows = options['rows']
+        amounts = random.Random(options['seed'])
+
+        currency = Currency.objects.create(code='ZZA', name='Benchmark', symbol='A')
+        user = CustomUser.objects.create(username='benchmark-money', email='benchmark-money@example.com')
+        card = Card.objects.create(user=user, card_type=CardType.objects.create(name='Benchmark'), currency=currency, card_name='benchmark')
+
+        # UZS-sized amounts, up to two million with tiyin
+        exact_minor = 0
+        batch = []
+        for _ in range(rows):
+            minor = amounts.randrange(-200000000, 200000000)
+            exact_minor += minor
+            batch.append(LedgerEntry(card=card, entry_type='adjustment', amount=from_minor(minor), amount_minor=minor))
+            if len(batch) == 10000:
+                LedgerEntry.objects.bulk_create(batch)
+                batch = []
+        LedgerEntry.objects.bulk_create(batch)
+        exact = from_minor(exact_minor)
+
+        entries = LedgerEntry.objects.filter(card=card)
+        sql_decimal, sql_decimal_seconds = self.timed(lambda: entries.aggregate(total=Sum('amount'))['total'])
+        sql_minor, sql_minor_seconds = self.timed(lambda: entries.aggregate(total=Sum('amount_minor'))['total'])
+        python_decimal, python_decimal_seconds = self.timed(lambda: sum(entries.values_list('amount', flat=True).iterator(chunk_size=5000)))
+        python_minor, python_minor_seconds = self.timed(lambda: sum(entries.values_list('amount_minor', flat=True).iterator(chunk_size=5000)))
+
+        self.stdout.write(f"{rows} ledger rows, exact total {exact}")
+        self.stdout.write(f"SQL SUM(amount):          {sql_decimal_seconds:.3f}s  {sql_decimal}  {'exact' if sql_decimal == exact else 'off'}")
+        self.stdout.write(f"SQL SUM(amount_minor):    {sql_minor_seconds:.3f}s  {from_minor(sql_minor)}  {'exact' if sql_minor == exact_minor else 'off'}")
+        self.stdout.write(f"Python sum of Decimals:   {python_decimal_seconds:.3f}s  {python_decimal}  {'exact' if python_decimal == exact else 'off'}")
+        self.stdout.write(f"Python sum of ints:       {python_minor_seconds:.3f}s  {from_minor(python_minor)}  {'exact' if python_minor == exact_minor else 'off'}")
@@ -0,0 +1,103 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.cards.models import Currency, ExchangeRate
+from apps.cards.rates import RateMatrix
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    # Not CaptureQueriesContext: its log is capped at 9000 queries and
+    # slows every call down
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def rate_on_query(from_currency, to_currency, on_date):
+    """
+    What a dated lookup costs without the matrix: one query per call for the
+    stored direction, a second one for the inverse when it isn't stored.
+    """
+    rate = ExchangeRate.objects.filter(
+        from_currency=from_currency, to_currency=to_currency, date__lte=on_date,
+    ).order_by('-date').values_list('rate', flat=True).first()
+    if rate is not None:
+        return rate
+
+    rate = ExchangeRate.objects.filter(
+        from_currency=to_currency, to_currency=from_currency, date__lte=on_date,
+    ).order_by('-date').values_list('rate', flat=True).first()
+    if rate is not None:
+        return Decimal('1.0') / rate
+    return None
+
+
+class Command(BaseCommand):
+    help = "Time dated conversions through RateMatrix.get_on against one query per conversion (on scratch data that is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversions', type=int, default=100000, help="Number of dated conversions (default 100000)")
+        parser.add_argument('--days', type=int, default=3 * 365, help="Days of daily rate history for the pair (default 1095)")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        conversions = options['conversions']
+        days = options['days']
+        random_dates = random.Random(options['seed'])
+
+        base = Currency.objects.create(code='ZZA', name='Benchmark A', symbol='A')
+        quote = Currency.objects.create(code='ZZB', name='Benchmark B', symbol='B')
+        first_day = date(2020, 1, 1)
+        ExchangeRate.objects.bulk_create(
+            ExchangeRate(from_currency=base, to_currency=quote, rate=Decimal(12000 + day), date=first_day + timedelta(days=day))
+            for day in range(days)
+        )
+
+        # Half the lookups go the stored way, half need the inverse
+        lookups = [
+            ((base.pk, quote.pk) if number % 2 else (quote.pk, base.pk), first_day + timedelta(days=random_dates.randrange(days)))
+            for number in range(conversions)
+        ]
+        amount = Decimal('125.50')
+
+        matrix = RateMatrix.load('benchmark')
+        matrix_queries = QueryCounter()
+        with connection.execute_wrapper(matrix_queries):
+            started = time.perf_counter()
+            matrix_results = [amount * matrix.get_on(from_id, to_id, on_date) for (from_id, to_id), on_date in lookups]
+            matrix_seconds = time.perf_counter() - started
+
+        query_queries = QueryCounter()
+        with connection.execute_wrapper(query_queries):
+            started = time.perf_counter()
+            query_results = [amount * rate_on_query(from_id, to_id, on_date) for (from_id, to_id), on_date in lookups]
+            query_seconds = time.perf_counter() - started
+
+        self.stdout.write(f"{conversions} dated conversions over {days} days of history")
+        self.stdout.write(f"RateMatrix.get_on: {matrix_seconds:.3f}s, {matrix_queries.count} queries")
+        self.stdout.write(f"query per call:    {query_seconds:.3f}s, {query_queries.count} queries")
+
+        if matrix_results != query_results:
+            self.stdout.write(self.style.ERROR("Results differ"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Same results, {query_seconds / max(matrix_seconds, 1e-9):.0f}x faster"))
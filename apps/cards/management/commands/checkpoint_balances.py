@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.cards.ledger import create_checkpoint
+from apps.cards.models import Card
+
+
+class Command(BaseCommand):
+    help = "Store each card's ledger balance as of a past day, so balance-as-of and reconciliation only scan the entries after it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Checkpoint date (YYYY-MM-DD), defaults to yesterday")
+        parser.add_argument('--card', type=int, action='append', help="Only this card id (repeatable)")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        as_of_date = today - timedelta(days=1)
+        if options['date']:
+            try:
+                as_of_date = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date '{options['date']}'")
+        if as_of_date >= today:
+            raise CommandError("Checkpoints can only be taken for days that are over")
+
+        cards = Card.objects.order_by('id')
+        if options['card']:
+            cards = cards.filter(id__in=options['card'])
+
+        count = 0
+        for card in cards.only('id').iterator():
+            create_checkpoint(card, as_of_date)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} checkpoints as of {as_of_date}"))
@@ -0,0 +1,151 @@
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.cards.models import Currency, ExchangeRate
+from apps.cards.rates import invalidate_rate_matrix
+
+
+def read_csv(path):
+    """
+    Rows with `from_currency,to_currency,rate,date` columns (date as YYYY-MM-DD).
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield row
+
+
+def read_json(path):
+    """
+    A list of objects with the same keys as the CSV feed.
+    """
+    with open(path, encoding='utf-8') as f:
+        rows = json.load(f)
+    if not isinstance(rows, list):
+        raise CommandError("JSON feed must be a list of rate objects")
+    yield from rows
+
+
+def read_cbu(path, base='UZS'):
+    """
+    Local stand-in for the Central Bank of Uzbekistan feed: the same JSON the
+    bank publishes ({"Ccy": "USD", "Rate": "12650.00", "Nominal": "1",
+    "Date": "17.10.2026"}), saved to a file. Every rate is quoted against
+    the base currency.
+    """
+    for row in read_json(path):
+        try:
+            rate = Decimal(str(row['Rate'])) / Decimal(str(row.get('Nominal') or 1))
+            rate_date = datetime.strptime(row['Date'], '%d.%m.%Y').date().isoformat()
+        except (KeyError, TypeError, ValueError, InvalidOperation, ZeroDivisionError):
+            yield row
+            continue
+
+        yield {
+            'from_currency': row.get('Ccy'),
+            'to_currency': base,
+            'rate': rate,
+            'date': rate_date,
+        }
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'cbu': read_cbu,
+}
+
+
+class Command(BaseCommand):
+    help = "Bulk import exchange rates from a CSV/JSON feed, updating rates that already exist for the same pair and date"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the feed file")
+        parser.add_argument('--format', choices=sorted(READERS), help="Feed format (defaults to the file extension)")
+        parser.add_argument('--base', default='UZS', help="Quote currency for the cbu feed")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+
+        feed_format = options['format'] or path.suffix.lstrip('.').lower()
+        if feed_format not in READERS:
+            raise CommandError(f"Unknown feed format '{feed_format}', use --format")
+
+        if feed_format == 'cbu':
+            rows = read_cbu(path, base=options['base'].upper())
+        else:
+            rows = READERS[feed_format](path)
+
+        currencies = dict(Currency.objects.values_list('code', 'id'))
+        batch_size = options['batch_size']
+
+        imported = 0
+        errors = []
+        batch = {}
+
+        with transaction.atomic():
+            for line, row in enumerate(rows, start=1):
+                rate, error = self.parse_row(row, currencies)
+                if error:
+                    errors.append(f"row {line}: {error}")
+                    continue
+
+                batch[(rate.from_currency_id, rate.to_currency_id, rate.date)] = rate
+                if len(batch) >= batch_size:
+                    imported += self.upsert(batch.values())
+                    batch = {}
+
+            if batch:
+                imported += self.upsert(batch.values())
+
+            transaction.on_commit(invalidate_rate_matrix)
+
+        for error in errors[:20]:
+            self.stderr.write(error)
+        if len(errors) > 20:
+            self.stderr.write(f"... and {len(errors) - 20} more invalid rows")
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} exchange rates ({len(errors)} rows skipped)"))
+
+    def parse_row(self, row, currencies):
+        try:
+            from_code = str(row['from_currency']).strip().upper()
+            to_code = str(row['to_currency']).strip().upper()
+            rate = Decimal(str(row['rate']).strip())
+            rate_date = date.fromisoformat(str(row['date']).strip())
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            return None, "missing or malformed from_currency/to_currency/rate/date"
+
+        if from_code not in currencies or to_code not in currencies:
+            return None, f"unknown currency {from_code if from_code not in currencies else to_code}"
+        if from_code == to_code:
+            return None, "from_currency and to_currency must differ"
+        if not rate.is_finite():
+            return None, "rate must be a number"
+        if rate < Decimal('0.000001') or rate >= Decimal('1e14'):
+            return None, "rate must be between 0.000001 and 10^14"
+
+        return ExchangeRate(
+            from_currency_id=currencies[from_code],
+            to_currency_id=currencies[to_code],
+            rate=rate.quantize(Decimal('0.000001')),
+            date=rate_date,
+        ), None
+
+    def upsert(self, rates):
+        rates = list(rates)
+        ExchangeRate.objects.bulk_create(
+            rates,
+            update_conflicts=True,
+            unique_fields=['from_currency', 'to_currency', 'date'],
+            update_fields=['rate', 'updated_at'],
+        )
+        return len(rates)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from apps.cards.ledger import reconcile
+from apps.cards.models import Card
+from apps.cards.money import to_minor
+
+
+class Command(BaseCommand):
+    help = "Check every card's stored balance against its ledger and optionally reset it to the ledger total"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--card', type=int, action='append', help="Only this card id (repeatable)")
+        parser.add_argument('--fix', action='store_true', help="Set mismatched balances to the ledger total")
+
+    def handle(self, *args, **options):
+        cards = Card.objects.order_by('id')
+        if options['card']:
+            cards = cards.filter(id__in=options['card'])
+
+        mismatched = 0
+        for card in cards.only('id', 'balance', 'balance_minor').iterator():
+            result = reconcile(card)
+            if result['is_balanced']:
+                continue
+
+            mismatched += 1
+            self.stdout.write(
+                f"Card {card.pk}: balance {result['balance']}, ledger {result['ledger_balance']} "
+                f"(difference {result['difference']})"
+            )
+            if options['fix']:
+                # Relative, so a posting that lands meanwhile isn't lost.
+                Card.objects.filter(pk=card.pk).update(
+                    balance=F('balance') - result['difference'],
+                    balance_minor=F('balance_minor') - to_minor(result['difference']),
+                )
+
+        if mismatched and not options['fix']:
+            self.stdout.write(self.style.WARNING(f"{mismatched} cards out of balance"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{mismatched} cards {'fixed' if mismatched else 'out of balance'}"))
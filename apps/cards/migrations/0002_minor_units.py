@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:44
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+
+def backfill_balance_minor(apps, schema_editor):
+    Card = apps.get_model('cards', 'Card')
+    Card.objects.update(balance_minor=Cast(Round(F('balance') * 100), models.BigIntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='balance_minor',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Balance in minor units (e.g. cents), kept in sync with balance for fast aggregation'),
+        ),
+        migrations.RunPython(backfill_balance_minor, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 6.0.2 on 2026-10-17 02:00
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Min, Sum
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Journal the existing history: one entry per transaction and per
+    transfer leg, plus an opening entry per card for whatever part of the
+    current balance they don't explain (initial balance, manual edits).
+    """
+    Card = apps.get_model('cards', 'Card')
+    LedgerEntry = apps.get_model('cards', 'LedgerEntry')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    CardTransfer = apps.get_model('transfers', 'CardTransfer')
+
+    def flush(entries):
+        LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+        entries.clear()
+
+    entries = []
+    rows = Transaction.objects.order_by('id').values_list('id', 'card_id', 'type', 'amount', 'amount_minor', 'date', 'title')
+    for transaction_id, card_id, transaction_type, amount, amount_minor, transaction_date, title in rows.iterator(chunk_size=2000):
+        sign = 1 if transaction_type == 'income' else -1
+        entries.append(LedgerEntry(
+            card_id=card_id, entry_type=transaction_type, amount=amount * sign, amount_minor=amount_minor * sign,
+            effective_date=transaction_date, transaction_id=transaction_id, description=title[:255],
+        ))
+        if len(entries) >= 1000:
+            flush(entries)
+
+    rows = CardTransfer.objects.order_by('id').values_list('id', 'from_card_id', 'to_card_id', 'amount', 'converted_amount', 'created_at')
+    for transfer_id, from_card_id, to_card_id, amount, converted_amount, created_at in rows.iterator(chunk_size=2000):
+        entries.append(LedgerEntry(
+            card_id=from_card_id, entry_type='transfer_out', amount=-amount, amount_minor=-round(amount * 100),
+            effective_date=created_at.date(), transfer_id=transfer_id,
+        ))
+        entries.append(LedgerEntry(
+            card_id=to_card_id, entry_type='transfer_in', amount=converted_amount, amount_minor=round(converted_amount * 100),
+            effective_date=created_at.date(), transfer_id=transfer_id,
+        ))
+        if len(entries) >= 1000:
+            flush(entries)
+    flush(entries)
+
+    totals = {
+        row['card_id']: row
+        for row in LedgerEntry.objects.values('card_id').annotate(total=Sum('amount_minor'), first_date=Min('effective_date'))
+    }
+    for card_id, balance_minor, created_at in Card.objects.values_list('id', 'balance_minor', 'created_at').iterator():
+        row = totals.get(card_id, {})
+        opening_minor = balance_minor - (row.get('total') or 0)
+        if opening_minor:
+            opening_date = min(created_at.date(), row.get('first_date') or created_at.date())
+            entries.append(LedgerEntry(
+                card_id=card_id, entry_type='opening', amount=Decimal(opening_minor).scaleb(-2), amount_minor=opening_minor,
+                effective_date=opening_date, description="Opening balance",
+            ))
+        if len(entries) >= 1000:
+            flush(entries)
+    flush(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_minor_units'),
+        ('transactions', '0004_statement_imports'),
+        ('transfers', '0002_minor_units'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of_date', models.DateField()),
+                ('balance_minor', models.BigIntegerField()),
+                ('entry_count', models.PositiveIntegerField(default=0, help_text='Number of ledger entries included')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='cards.card')),
+            ],
+            options={
+                'verbose_name': 'Balance Checkpoint',
+                'verbose_name_plural': 'Balance Checkpoints',
+                'db_table': 'balance_checkpoints',
+                'ordering': ['-as_of_date'],
+                'unique_together': {('card', 'as_of_date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('opening', 'Opening balance'), ('income', 'Income'), ('expense', 'Expense'), ('reversal', 'Reversal'), ('transfer_out', 'Transfer out'), ('transfer_in', 'Transfer in'), ('adjustment', 'Manual adjustment')], max_length=12)),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Signed change to the card balance, in card currency', max_digits=15)),
+                ('amount_minor', models.BigIntegerField(default=0, editable=False)),
+                ('effective_date', models.DateField(default=django.utils.timezone.localdate, help_text='Date the change counts towards (transaction date)')),
+                ('transaction_id', models.BigIntegerField(blank=True, help_text='Transaction the entry was posted for, if any', null=True)),
+                ('transfer_id', models.BigIntegerField(blank=True, help_text='Card transfer the entry was posted for, if any', null=True)),
+                ('description', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='cards.card')),
+            ],
+            options={
+                'verbose_name': 'Ledger Entry',
+                'verbose_name_plural': 'Ledger Entries',
+                'db_table': 'ledger_entries',
+                'ordering': ['effective_date', 'id'],
+                'indexes': [models.Index(fields=['card', 'effective_date', 'id'], name='ledger_entr_card_id_92c833_idx'), models.Index(fields=['transaction_id'], name='ledger_entr_transac_16a1ad_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
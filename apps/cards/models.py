@@ -2,6 +2,8 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from apps.accounts.models import CustomUser
+from django.utils import timezone
+from .money import from_minor, to_minor
 
 class Currency(models.Model):
     code = models.CharField(max_length=3, unique=True, help_text="Currency code (e.g., USD, UZS, EUR)")
@@ -45,33 +47,26 @@ class ExchangeRate(models.Model):
     
     @classmethod
     def get_latest_rate(cls, from_currency, to_currency):
-        if from_currency == to_currency:
-            return Decimal('1.0')
-        
-        rate = cls.objects.filter(
-            from_currency=from_currency,
-            to_currency = to_currency
-        ).order_by('-date').first()
+        from .rates import get_rate_matrix
 
-        if rate:
-            return rate.rate
-        
-        reverse_rate = cls.objects.filter(
-            from_currency=to_currency,
-            to_currency=from_currency
-        ).order_by('-date').first()
+        return get_rate_matrix().get(from_currency, to_currency)
+    
+    @classmethod
+    def get_rate_on(cls, from_currency, to_currency, on_date):
+        from .rates import get_rate_matrix
 
-        if reverse_rate:
-            return Decimal('1.0')/reverse_rate.rate
-        
-        return None
+        return get_rate_matrix().get_on(from_currency, to_currency, on_date)
     
     @classmethod
-    def convert(cls, amount, from_currency, to_currency):
+    def convert(cls, amount, from_currency, to_currency, on_date=None):
         if from_currency == to_currency:
             return amount
         
-        rate = cls.get_latest_rate(from_currency, to_currency)
+        rate = None
+        if on_date is not None:
+            rate = cls.get_rate_on(from_currency, to_currency, on_date)
+        if rate is None:
+            rate = cls.get_latest_rate(from_currency, to_currency)
 
         if rate:
             return amount * rate
@@ -132,6 +127,7 @@ class Card(models.Model):
     card_name = models.CharField(max_length=100, help_text="Custom name for the card (e.g., 'My Main Waller')")
     card_number_last4 = models.CharField(max_length=4, blank=True, null=True, help_text="Last 4 digits of card number (optional, for identification)")
     balance = models.DecimalField(max_digits=15, decimal_places=2, default=0, help_text="Current balance in card's currency")
+    balance_minor = models.BigIntegerField(default=0, editable=False, help_text="Balance in minor units (e.g. cents), kept in sync with balance for fast aggregation")
     initial_balance = models.DecimalField(max_digits=15, decimal_places=2, default=0, help_text="Starting balance when card was created")
     bank_name = models.CharField(max_length=100, blank=True, null=True, help_text="Bank name (e.g., TBC Bank, Kapitalbank)")
     color = models.CharField(max_length=7, choices=COLOR_CHOICES, default='#4ECDC4', help_text="Color for UI display (hex code)")
@@ -154,28 +150,138 @@ class Card(models.Model):
         return f"{self.user.username} - {self.card_name} ({self.currency.code})"
     
     def get_balance_in_currency(self, target_currency):
-        if self.currency == target_currency:
+        if self.currency_id == target_currency.pk:
             return self.balance
         
-        return ExchangeRate.convert(self.balance, self.currency, target_currency)
+        return ExchangeRate.convert(self.balance, self.currency_id, target_currency)
     
     def update_balance(self, amount, transaction_type):
-        if transaction_type == 'income':
-            self.balance += amount
-        elif transaction_type == 'expenxe':
-            self.balance -= 'amount'
-        
-        self.save()
+        from .services import post_balance, signed_amount
+
+        post_balance(self, signed_amount(amount, transaction_type), entry_type=transaction_type)
 
     def can_withdraw(self, amount):
         return self.balance >= amount
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'balance' in field_names:
+            instance._loaded_balance = instance.balance
+        return instance
+
     def save(self, *args, **kwargs):
+        self.balance_minor = to_minor(self.balance)
+
         if self.is_default:
             Card.objects.filter(user=self.user, is_default=True).exclude(pk=self.pk).update(is_default=False)
-        
+
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            if self.balance:
+                LedgerEntry.objects.create(
+                    card=self, entry_type='opening', amount=self.balance, description="Opening balance"
+                )
+            self._loaded_balance = self.balance
+            return
+
+        loaded_balance = getattr(self, '_loaded_balance', None)
+        if loaded_balance is None or 'update_fields' in kwargs:
+            super().save(*args, **kwargs)
+            return
+
+        # The balance is a projection of the ledger: an edited balance is
+        # posted as an adjustment and the row is saved without it, so a
+        # stale instance can't overwrite postings made since it was loaded.
+        delta = self.balance - loaded_balance
+        kwargs['update_fields'] = [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in ['balance', 'balance_minor']
+        ]
         super().save(*args, **kwargs)
 
+        if delta:
+            from .services import post_balance
+            post_balance(self, delta, description="Balance edited")
+
+
+class LedgerEntry(models.Model):
+    """
+    Append-only journal of everything that moved a card's balance.
+    Card.balance is the running total of these entries; entries are never
+    updated or deleted, a change is recorded as a reversal plus a new entry.
+    """
+    ENTRY_TYPE_CHOICES = [
+        ('opening', 'Opening balance'),
+        ('income', 'Income'),
+        ('expense', 'Expense'),
+        ('reversal', 'Reversal'),
+        ('transfer_out', 'Transfer out'),
+        ('transfer_in', 'Transfer in'),
+        ('adjustment', 'Manual adjustment'),
+    ]
+
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=12, choices=ENTRY_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=15, decimal_places=2, help_text="Signed change to the card balance, in card currency")
+    amount_minor = models.BigIntegerField(default=0, editable=False)
+    effective_date = models.DateField(default=timezone.localdate, help_text="Date the change counts towards (transaction date)")
+    transaction_id = models.BigIntegerField(null=True, blank=True, help_text="Transaction the entry was posted for, if any")
+    transfer_id = models.BigIntegerField(null=True, blank=True, help_text="Card transfer the entry was posted for, if any")
+    description = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ledger_entries'
+        verbose_name = 'Ledger Entry'
+        verbose_name_plural = 'Ledger Entries'
+        ordering = ['effective_date', 'id']
+        indexes = [
+            models.Index(fields=['card', 'effective_date', 'id']),
+            models.Index(fields=['transaction_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.card.card_name} {self.entry_type} {self.amount} ({self.effective_date})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Ledger entries are append-only")
+
+        self.amount_minor = to_minor(self.amount)
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Ledger entries are append-only")
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    Card balance at the end of `as_of_date`, so balance-as-of and
+    reconciliation only need the entries after the nearest checkpoint.
+    Checkpoints are only taken for past days; posting an entry dated on or
+    before a checkpoint drops it.
+    """
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='balance_checkpoints')
+    as_of_date = models.DateField()
+    balance_minor = models.BigIntegerField()
+    entry_count = models.PositiveIntegerField(default=0, help_text="Number of ledger entries included")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'balance_checkpoints'
+        verbose_name = 'Balance Checkpoint'
+        verbose_name_plural = 'Balance Checkpoints'
+        ordering = ['-as_of_date']
+        unique_together = ['card', 'as_of_date']
+
+    def __str__(self):
+        return f"{self.card.card_name} @ {self.as_of_date}: {self.balance}"
+
+    @property
+    def balance(self):
+        return from_minor(self.balance_minor)
+
 
 
 
@@ -221,6 +327,9 @@ class Card(models.Model):
 
 
 # Creating Exchange Rates
+# For more than a handful of rates use the bulk importer instead:
+#   python manage.py import_rates rates.csv
+#   python manage.py import_rates cbu.json --format cbu
 # from cards.models import Currency, ExchangeRate
 # from datetime import date
 # from decimal import Decimal
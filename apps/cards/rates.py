@@ -0,0 +1,228 @@
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Q, Subquery
+
+
+RATES_VERSION_KEY = 'cards:exchange-rates:version'
+DEFAULT_RATE_MATRIX_MAX_AGE = 300
+
+_lock = threading.Lock()
+_matrix = None
+
+
+def _currency_id(currency):
+    return getattr(currency, 'pk', currency)
+
+
+class RateMatrix:
+    """
+    Latest exchange rate for every known currency pair, keyed by
+    (from_currency_id, to_currency_id). Inverse pairs are filled in when
+    only the opposite direction is stored, so lookups never hit the database.
+
+    Pairs with no stored rate in either direction are derived through
+    pivot currencies: shortest paths over the rate graph are computed once
+    per load, so a triangulated lookup is as cheap as a direct one.
+
+    Historical rates are kept per pair as parallel sorted (dates, rates)
+    lists, loaded the first time a pair is asked for and dropped together
+    with the matrix when rates change.
+
+    Currency codes are mapped to ids here as well, so callers that only
+    know a code (user.default_currency) don't need a Currency lookup.
+    """
+
+    def __init__(self, version, rates, paths=None, currency_ids=None):
+        self.version = version
+        self.rates = rates
+        self.paths = paths or {}
+        self.currency_ids = currency_ids or {}
+        self.series = {}
+        self.loaded_at = time.monotonic()
+
+    def is_stale(self, version):
+        max_age = getattr(settings, 'RATE_MATRIX_MAX_AGE', DEFAULT_RATE_MATRIX_MAX_AGE)
+        return self.version != version or time.monotonic() - self.loaded_at >= max_age
+
+    @classmethod
+    def load(cls, version):
+        from .models import Currency, ExchangeRate
+
+        latest_date = ExchangeRate.objects.filter(
+            from_currency=OuterRef('from_currency'),
+            to_currency=OuterRef('to_currency'),
+        ).order_by('-date').values('date')[:1]
+
+        rows = ExchangeRate.objects.filter(date=Subquery(latest_date)).order_by().values_list(
+            'from_currency_id', 'to_currency_id', 'rate'
+        )
+
+        rates = {}
+        for from_id, to_id, rate in rows:
+            rates[(from_id, to_id)] = rate
+
+        for (from_id, to_id), rate in list(rates.items()):
+            if (to_id, from_id) not in rates:
+                rates[(to_id, from_id)] = Decimal('1.0') / rate
+
+        paths = cls.triangulate(rates)
+        currency_ids = dict(Currency.objects.values_list('code', 'id'))
+        return cls(version, rates, paths, currency_ids)
+
+    @staticmethod
+    def triangulate(rates):
+        """
+        Fill `rates` with every pair reachable through other currencies and
+        return the path used for each derived pair. Breadth-first search keeps
+        the number of hops minimal; well-connected currencies (UZS, USD, ...)
+        are tried first so they act as the pivots.
+        """
+        graph = {}
+        for from_id, to_id in rates:
+            graph.setdefault(from_id, []).append(to_id)
+        for neighbours in graph.values():
+            neighbours.sort(key=lambda currency_id: (-len(graph.get(currency_id, ())), currency_id))
+
+        paths = {}
+        for source in graph:
+            previous = {source: None}
+            queue = deque([source])
+            while queue:
+                current = queue.popleft()
+                for neighbour in graph[current]:
+                    if neighbour in previous:
+                        continue
+                    previous[neighbour] = current
+                    queue.append(neighbour)
+
+                    if (source, neighbour) not in rates:
+                        path = [neighbour]
+                        while path[-1] != source:
+                            path.append(previous[path[-1]])
+                        path.reverse()
+
+                        paths[(source, neighbour)] = path
+                        rates[(source, neighbour)] = rates[(source, current)] * rates[(current, neighbour)]
+        return paths
+
+    def get(self, from_currency, to_currency):
+        from_id = _currency_id(from_currency)
+        to_id = _currency_id(to_currency)
+
+        if from_id == to_id:
+            return Decimal('1.0')
+        return self.rates.get((from_id, to_id))
+
+    def currency_id(self, code):
+        return self.currency_ids.get(code)
+
+    def load_series(self, from_id, to_id):
+        from .models import ExchangeRate
+
+        rows = ExchangeRate.objects.filter(
+            Q(from_currency_id=from_id, to_currency_id=to_id) | Q(from_currency_id=to_id, to_currency_id=from_id)
+        ).order_by().values_list('from_currency_id', 'date', 'rate')
+
+        direct = {}
+        inverse = {}
+        for row_from_id, rate_date, rate in rows:
+            if row_from_id == from_id:
+                direct[rate_date] = rate
+            else:
+                inverse[rate_date] = rate
+
+        # A stored row always wins over the inverse of the opposite pair on the same day.
+        forward = {rate_date: Decimal('1.0') / rate for rate_date, rate in inverse.items()}
+        forward.update(direct)
+        backward = {rate_date: Decimal('1.0') / rate for rate_date, rate in direct.items()}
+        backward.update(inverse)
+
+        for key, points in (((from_id, to_id), forward), ((to_id, from_id), backward)):
+            dates = sorted(points)
+            self.series[key] = (dates, [points[d] for d in dates])
+
+        return self.series[(from_id, to_id)]
+
+    def get_on(self, from_currency, to_currency, on_date):
+        """
+        Rate in effect on `on_date`: the most recent rate recorded on or
+        before that day, or None if the pair has no history that far back.
+        """
+        from_id = _currency_id(from_currency)
+        to_id = _currency_id(to_currency)
+
+        if from_id == to_id:
+            return Decimal('1.0')
+
+        if isinstance(on_date, datetime):
+            on_date = on_date.date()
+
+        path = self.paths.get((from_id, to_id))
+        if path is not None:
+            rate = Decimal('1.0')
+            for leg_from_id, leg_to_id in zip(path, path[1:]):
+                leg_rate = self.get_on(leg_from_id, leg_to_id, on_date)
+                if leg_rate is None:
+                    return None
+                rate *= leg_rate
+            return rate
+
+        series = self.series.get((from_id, to_id))
+        if series is None:
+            series = self.load_series(from_id, to_id)
+
+        dates, rates = series
+        index = bisect_right(dates, on_date)
+        if index == 0:
+            return None
+        return rates[index - 1]
+
+
+def current_version():
+    version = cache.get(RATES_VERSION_KEY)
+    if version is None:
+        cache.add(RATES_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(RATES_VERSION_KEY)
+    return version
+
+
+def get_rate_matrix():
+    """
+    The process-wide matrix, reloaded when the version in the cache moves
+    or once it is RATE_MATRIX_MAX_AGE seconds old. The version only reaches
+    other processes through a shared cache (Redis/Memcached in CACHES);
+    with the default per-process cache a rate change made elsewhere (e.g.
+    by import_rates) is picked up by the age limit instead.
+    """
+    global _matrix
+
+    version = current_version()
+    matrix = _matrix
+    if matrix is not None and not matrix.is_stale(version):
+        return matrix
+
+    with _lock:
+        matrix = _matrix
+        if matrix is None or matrix.is_stale(version):
+            matrix = RateMatrix.load(version)
+            _matrix = matrix
+    return matrix
+
+
+def invalidate_rate_matrix():
+    """
+    Drop the local matrix and publish a new version through the cache so
+    every other process reloads on its next lookup as well.
+    """
+    global _matrix
+
+    _matrix = None
+    cache.set(RATES_VERSION_KEY, uuid.uuid4().hex, None)
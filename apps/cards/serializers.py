@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import *
 from decimal import Decimal
+from .money import from_minor
+from core.serializers import SparseFieldsetMixin
 
 
 
@@ -37,7 +39,7 @@ class CardTypeSerializer(serializers.ModelSerializer):
 
 
 
-class CardSerializer(serializers.ModelSerializer):
+class CardSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     card_type_name = serializers.CharField(source = 'card_type.name', read_only = True)
     card_type_logo = serializers.ImageField(source = 'card_type.logo', read_only = True)
     currency_code = serializers.CharField(source = 'currency.code', read_only = True)
@@ -116,4 +118,24 @@ class CurrencyConversionSerializer(serializers.Serializer):
         if value<=0: 
             raise serializers.ValidationError("AMount must be greater than 0")
         return value
-    
+
+
+
+class CurrencyBatchConversionItemSerializer(CurrencyConversionSerializer):
+    date = serializers.DateField(required=False)
+
+
+class CurrencyBatchConversionSerializer(serializers.Serializer):
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=1000)
+
+
+class StatementEntrySerializer(serializers.ModelSerializer):
+    date = serializers.DateField(source='effective_date', read_only=True)
+    balance = serializers.SerializerMethodField()
+
+    class Meta:
+        model = LedgerEntry
+        fields = ['id', 'date', 'entry_type', 'amount', 'balance', 'description', 'transaction_id', 'transfer_id', 'created_at']
+
+    def get_balance(self, obj):
+        return from_minor(obj.balance_minor)
@@ -0,0 +1,106 @@
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+
+from core.cache import bump_data_version
+from .models import BalanceCheckpoint, Card, LedgerEntry
+from .money import to_minor
+
+
+BALANCE_FIELD = DecimalField(max_digits=15, decimal_places=2)
+LEDGER_BATCH_SIZE = 1000
+
+
+def signed_amount(amount, transaction_type):
+    """
+    Effect of a transaction on its card: income adds, expense subtracts.
+    """
+    amount = Decimal(amount)
+    return amount if transaction_type == 'income' else -amount
+
+
+def apply_balance_deltas(deltas):
+    """
+    Add `deltas` ({card_id: Decimal}) to the card balances in the database.
+    Callers go through post_entries so every change is journalled.
+
+    The addition happens in SQL (balance = balance + delta), so concurrent
+    postings to the same card can't overwrite each other the way a
+    read-modify-save would. Only balance and balance_minor are written, and
+    however many cards are touched it is a single UPDATE ... CASE statement.
+    """
+    deltas = {card_id: Decimal(delta) for card_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+
+    if len(deltas) == 1:
+        (card_id, delta), = deltas.items()
+        balance_delta = Value(delta, output_field=BALANCE_FIELD)
+        minor_delta = Value(to_minor(delta), output_field=BigIntegerField())
+    else:
+        balance_delta = Case(
+            *[When(pk=card_id, then=Value(delta)) for card_id, delta in deltas.items()],
+            output_field=BALANCE_FIELD,
+        )
+        minor_delta = Case(
+            *[When(pk=card_id, then=Value(to_minor(delta))) for card_id, delta in deltas.items()],
+            output_field=BigIntegerField(),
+        )
+
+    with transaction.atomic(savepoint=False):
+        return Card.objects.filter(pk__in=deltas).update(
+            balance=F('balance') + balance_delta,
+            balance_minor=F('balance_minor') + minor_delta,
+        )
+
+
+def post_entries(entries):
+    """
+    Append `entries` (unsaved LedgerEntry objects) to the ledger and move
+    each card's balance by the total of its entries, in one atomic block:
+    one multi-row INSERT plus one UPDATE. Entries dated in the past drop
+    the checkpoints they would make stale. Returns the {card_id: delta}
+    that was applied.
+    """
+    entries = [entry for entry in entries if entry.amount]
+    if not entries:
+        return {}
+
+    today = timezone.localdate()
+    deltas = {}
+    earliest = {}
+    for entry in entries:
+        entry.amount = Decimal(entry.amount)
+        entry.amount_minor = to_minor(entry.amount)
+        deltas[entry.card_id] = deltas.get(entry.card_id, Decimal('0')) + entry.amount
+        if entry.effective_date < today:
+            earliest[entry.card_id] = min(entry.effective_date, earliest.get(entry.card_id, entry.effective_date))
+
+    with transaction.atomic(savepoint=False):
+        LedgerEntry.objects.bulk_create(entries, batch_size=LEDGER_BATCH_SIZE)
+        apply_balance_deltas(deltas)
+        if earliest:
+            BalanceCheckpoint.objects.filter(
+                reduce(or_, [Q(card_id=card_id, as_of_date__gte=day) for card_id, day in earliest.items()])
+            ).delete()
+    return deltas
+
+
+def refresh_balance(card):
+    card.refresh_from_db(fields=['balance', 'balance_minor'])
+    card._loaded_balance = card.balance
+    return card
+
+
+def post_balance(card, delta, entry_type='adjustment', description=None):
+    """
+    Post a single entry of `delta` to `card` and refresh the balance on the
+    instance so callers that serialize it afterwards see the stored value.
+    """
+    post_entries([LedgerEntry(card=card, entry_type=entry_type, amount=delta, description=description)])
+    bump_data_version(card.user_id)
+    return refresh_balance(card)
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache import bump_data_version
+from .models import Card, Currency, ExchangeRate
+from .rates import invalidate_rate_matrix
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def exchange_rate_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_rate_matrix)
+
+
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Currency)
+def currency_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_rate_matrix)
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+def card_changed(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
@@ -1,3 +1,540 @@
-from django.test import TestCase
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.conf import settings
+from django.core import signing
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import CustomUser
+from apps.transactions.models import Category, Transaction
+from apps.transactions.services import TransactionPostingService
+from . import rates
+from .ledger import STATEMENT_CURSOR_SALT, balance_as_of, create_checkpoint, ledger_total, reconcile
+from .models import BalanceCheckpoint, Card, CardType, Currency, ExchangeRate, LedgerEntry
+from .money import to_minor
+from .services import post_balance, post_entries
+
+
+# Publishes a new rate version from a separate interpreter, the way
+# import_rates does from its own process.
+INVALIDATE_SCRIPT = """
+import sys
+import django
+from django.conf import settings
+settings.configure(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': sys.argv[1]}})
+django.setup()
+from apps.cards.rates import invalidate_rate_matrix
+invalidate_rate_matrix()
+"""
+
+
+def invalidate_in_other_process(location):
+    subprocess.run([sys.executable, '-c', INVALIDATE_SCRIPT, location], cwd=settings.BASE_DIR, check=True)
+
+
+class ImportRatesTests(TestCase):
+
+    def setUp(self):
+        rates._matrix = None
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.uzs = Currency.objects.create(code='UZS', name='Sum', symbol='s')
+
+    def tearDown(self):
+        rates._matrix = None
+
+    def test_unusable_rates_are_skipped_rows(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as feed:
+            feed.write('from_currency,to_currency,rate,date\n')
+            for rate in ('NaN', 'sNaN', 'Infinity', '12650.5'):
+                feed.write(f'USD,UZS,{rate},2026-10-01\n')
+            feed.flush()
+
+            stdout, stderr = StringIO(), StringIO()
+            call_command('import_rates', feed.name, stdout=stdout, stderr=stderr)
+
+        self.assertIn("Imported 1 exchange rates (3 rows skipped)", stdout.getvalue())
+        self.assertEqual(stderr.getvalue().count("rate must be a number"), 3)
+        self.assertEqual(list(ExchangeRate.objects.values_list('rate', flat=True)), [Decimal('12650.5')])
+
+
+class RateMatrixAcrossProcessesTests(TestCase):
+
+    def setUp(self):
+        rates._matrix = None
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.uzs = Currency.objects.create(code='UZS', name='Sum', symbol='s')
+        self.rate = ExchangeRate.objects.create(from_currency=self.usd, to_currency=self.uzs, rate=Decimal('12000'), date=date(2026, 1, 1))
+
+    def tearDown(self):
+        rates._matrix = None
+
+    def change_rate_elsewhere(self):
+        # queryset.update() sends no signal, so nothing in this process
+        # hears about the change
+        ExchangeRate.objects.filter(pk=self.rate.pk).update(rate=Decimal('13000'))
+
+    def test_shared_cache_version_reaches_other_processes(self):
+        with tempfile.TemporaryDirectory() as location:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+            with override_settings(CACHES=shared):
+                self.assertEqual(rates.get_rate_matrix().get(self.usd, self.uzs), Decimal('12000'))
+
+                self.change_rate_elsewhere()
+                self.assertEqual(rates.get_rate_matrix().get(self.usd, self.uzs), Decimal('12000'))
+
+                invalidate_in_other_process(location)
+                self.assertEqual(rates.get_rate_matrix().get(self.usd, self.uzs), Decimal('13000'))
+
+    def test_per_process_cache_falls_back_to_max_age(self):
+        self.assertEqual(rates.get_rate_matrix().get(self.usd, self.uzs), Decimal('12000'))
+
+        self.change_rate_elsewhere()
+        with tempfile.TemporaryDirectory() as location:
+            # Lands in another cache, as with the default LocMemCache
+            invalidate_in_other_process(location)
+        self.assertEqual(rates.get_rate_matrix().get(self.usd, self.uzs), Decimal('12000'))
+
+        with override_settings(RATE_MATRIX_MAX_AGE=0):
+            self.assertEqual(rates.get_rate_matrix().get(self.usd, self.uzs), Decimal('13000'))
+
+
+class ConvertBatchTests(TestCase):
+
+    def setUp(self):
+        rates._matrix = None
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.uzs = Currency.objects.create(code='UZS', name='Sum', symbol='s')
+        Currency.objects.create(code='EUR', name='Euro', symbol='e')
+        ExchangeRate.objects.create(from_currency=self.usd, to_currency=self.uzs, rate=Decimal('12000'), date=date(2026, 1, 1))
+        ExchangeRate.objects.create(from_currency=self.usd, to_currency=self.uzs, rate=Decimal('12500'), date=date(2026, 6, 1))
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create(email='a@b.c', username='alice', auth_status='done'))
+
+    def tearDown(self):
+        rates._matrix = None
+
+    def test_items_are_converted_on_their_date_or_flagged(self):
+        item = {'amount': '2.00', 'from_currency': 'USD', 'to_currency': 'UZS'}
+        response = self.client.post('/api/cards/currencies/convert_batch/', {'items': [
+            {**item, 'date': '2026-03-01'},
+            item,
+            {**item, 'date': '2025-01-01'},
+            {**item, 'from_currency': 'UZS', 'to_currency': 'USD', 'date': '2026-07-01'},
+            {**item, 'to_currency': 'XXX'},
+            {**item, 'to_currency': 'EUR'},
+            {'from_currency': 'USD'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['count'], response.data['converted_count'], response.data['error_count']), (7, 4, 3))
+        converted = [
+            (result['exchange_rate'], result['converted_amount'], result['rate_source'], result['date'])
+            for result in response.data['results'][:4]
+        ]
+        self.assertEqual(converted, [
+            (Decimal('12000'), Decimal('24000'), 'historical', date(2026, 3, 1)),
+            (Decimal('12500'), Decimal('25000'), 'latest', timezone.localdate()),
+            # Before the pair's history: the latest rate, but the item's own date
+            (Decimal('12500'), Decimal('25000'), 'latest', date(2025, 1, 1)),
+            (Decimal('1') / Decimal('12500'), Decimal('2') / Decimal('12500'), 'historical', date(2026, 7, 1)),
+        ])
+        errors = response.data['results'][4:]
+        self.assertEqual([result['index'] for result in errors], [4, 5, 6])
+        self.assertEqual(errors[0]['error'], "Invalid currency code")
+        self.assertEqual(errors[1]['error'], "No exchange rate found for USD to EUR")
+        self.assertIn('amount', errors[2]['error'])
+
+
+class LatestRatesQueryCountTests(TestCase):
+    """
+    /exchange-rates/latest/ reads the currency list once and the rates from
+    the RateMatrix, so adding currencies adds no queries.
+    """
+
+    URL = '/api/cards/exchange-rates/latest/'
+
+    def setUp(self):
+        rates._matrix = None
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.user = CustomUser.objects.create(email='a@b.c', username='alice', auth_status='done', default_currency='USD')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.created = 0
+
+    def tearDown(self):
+        rates._matrix = None
+
+    def add_currencies(self, count):
+        for _ in range(count):
+            self.created += 1
+            code = 'C' + chr(ord('A') + self.created // 26) + chr(ord('A') + self.created % 26)
+            currency = Currency.objects.create(code=code, name=code, symbol=code)
+            ExchangeRate.objects.create(from_currency=self.usd, to_currency=currency, rate=Decimal(self.created), date=date(2026, 1, 1))
+            ExchangeRate.objects.create(from_currency=self.usd, to_currency=currency, rate=Decimal(self.created + 1), date=date(2026, 1, 2))
+
+    def count_queries(self):
+        # Start cold, so the matrix load is part of the count
+        rates._matrix = None
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.data['rates']
+
+    def test_query_count_does_not_grow_with_currencies(self):
+        self.add_currencies(5)
+        queries, latest = self.count_queries()
+        self.assertEqual(len(latest), 5)
+
+        self.add_currencies(10)
+        rates._matrix = None
+        with self.assertNumQueries(queries):
+            response = self.client.get(self.URL)
+        self.assertEqual(len(response.data['rates']), 15)
+        # The newer of the two dates wins
+        self.assertEqual(response.data['rates']['CAB'], 2.0)
+
+        # Warm matrix: only the currency list
+        with self.assertNumQueries(queries - 2):
+            self.client.get(self.URL)
+
+
+class RateTimeseriesTests(TestCase):
+    """
+    Every open/high/low/close/average is a Decimal, whichever way the pair
+    is stored.
+    """
+
+    URL = '/api/cards/exchange-rates/timeseries/'
+
+    def setUp(self):
+        rates._matrix = None
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.uzs = Currency.objects.create(code='UZS', name='Sum', symbol='s')
+        self.eur = Currency.objects.create(code='EUR', name='Euro', symbol='e')
+        for day, rate in [(1, '12000'), (2, '12500'), (5, '13000')]:
+            ExchangeRate.objects.create(from_currency=self.usd, to_currency=self.uzs, rate=Decimal(rate), date=date(2026, 10, day))
+        for day, rate in [(1, '1.10'), (3, '1.20')]:
+            ExchangeRate.objects.create(from_currency=self.eur, to_currency=self.usd, rate=Decimal(rate), date=date(2026, 10, day))
+        user = CustomUser.objects.create(email='a@b.c', username='alice', auth_status='done', default_currency='USD')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def tearDown(self):
+        rates._matrix = None
+
+    def points(self, from_code, to_code, interval='day'):
+        response = self.client.get(self.URL, {
+            'from_currency': from_code, 'to_currency': to_code,
+            'start_date': '2026-10-01', 'end_date': '2026-10-07', 'interval': interval,
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        for point in response.data['points']:
+            for name in ('open', 'high', 'low', 'close', 'average'):
+                self.assertIsInstance(point[name], Decimal, name)
+        return response.data['source'], response.data['points']
+
+    def test_direct(self):
+        source, points = self.points('USD', 'UZS', 'month')
+        self.assertEqual(source, 'direct')
+        self.assertEqual(len(points), 1)
+        self.assertEqual((points[0]['open'], points[0]['close'], points[0]['average']), (Decimal('12000'), Decimal('13000'), Decimal('12500')))
+
+    def test_inverted(self):
+        source, points = self.points('UZS', 'USD', 'month')
+        self.assertEqual(source, 'inverted')
+        point = points[0]
+        self.assertEqual(point['open'], Decimal('0.000083333333'))
+        self.assertEqual(point['high'], Decimal('0.000083333333'))
+        self.assertEqual(point['low'], Decimal('0.000076923077'))
+        # Mean of the inverted rates, not the inverse of the mean
+        expected = (1 / Decimal('12000') + 1 / Decimal('12500') + 1 / Decimal('13000')) / 3
+        self.assertAlmostEqual(point['average'], expected, places=11)
+
+    def test_triangulated(self):
+        source, points = self.points('EUR', 'UZS')
+        self.assertEqual(source, 'triangulated')
+        # A point on every day either leg moved, at the rates in effect that day
+        self.assertEqual([(point['period'], point['close']) for point in points], [
+            (date(2026, 10, 1), Decimal('13200')),
+            (date(2026, 10, 2), Decimal('13750')),
+            (date(2026, 10, 3), Decimal('15000')),
+            (date(2026, 10, 5), Decimal('15600')),
+        ])
+
+        source, points = self.points('EUR', 'UZS', 'month')
+        self.assertEqual((points[0]['open'], points[0]['close'], points[0]['low'], points[0]['count']), (Decimal('13200'), Decimal('15600'), Decimal('13200'), 4))
+        self.assertEqual(points[0]['average'], Decimal('14387.5'))
+
+
+class LedgerCheckpointTests(TestCase):
+    """
+    Checkpoints are a shortcut through the ledger, so every answer they give
+    has to equal summing all the entries.
+    """
+
+    def setUp(self):
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.user = CustomUser.objects.create(email='a@b.c', username='alice', auth_status='done', default_currency='USD')
+        self.card = Card.objects.create(user=self.user, card_type=CardType.objects.create(name='Visa'), currency=self.usd, card_name='main')
+        self.today = timezone.localdate()
+
+    def day(self, days_ago):
+        return self.today - timedelta(days=days_ago)
+
+    def post(self, amount, days_ago):
+        post_entries([LedgerEntry(card_id=self.card.pk, entry_type='adjustment', amount=Decimal(amount), effective_date=self.day(days_ago))])
+
+    def summed(self, on_date):
+        entries = LedgerEntry.objects.filter(card=self.card, effective_date__lte=on_date)
+        return sum((entry.amount for entry in entries), Decimal('0'))
+
+    def checkpoint_dates(self):
+        return sorted(BalanceCheckpoint.objects.filter(card=self.card).values_list('as_of_date', flat=True))
+
+    def assert_consistent(self):
+        for days_ago in range(25, -1, -1):
+            self.assertEqual(balance_as_of(self.card, self.day(days_ago)), self.summed(self.day(days_ago)), days_ago)
+        self.card.refresh_from_db()
+        self.assertTrue(reconcile(self.card)['is_balanced'])
+        self.assertEqual(reconcile(self.card)['entry_count'], LedgerEntry.objects.filter(card=self.card).count())
+
+    def test_backdated_posting_drops_later_checkpoints(self):
+        self.post('100.00', 20)
+        self.post('-30.00', 10)
+        call_command('checkpoint_balances', date=self.day(15).isoformat(), stdout=StringIO())
+        call_command('checkpoint_balances', date=self.day(5).isoformat(), stdout=StringIO())
+        self.assertEqual(self.checkpoint_dates(), [self.day(15), self.day(5)])
+        self.assert_consistent()
+
+        self.post('-5.00', 12)
+
+        self.assertEqual(self.checkpoint_dates(), [self.day(15)])
+        self.assertEqual(balance_as_of(self.card, self.day(5)), Decimal('65.00'))
+        self.assert_consistent()
+
+        # On the checkpoint's own day counts as before it
+        self.post('1.00', 15)
+        self.assertEqual(self.checkpoint_dates(), [])
+        self.assert_consistent()
+
+    def test_posting_for_today_keeps_checkpoints(self):
+        self.post('100.00', 20)
+        create_checkpoint(self.card, self.day(1))
+
+        self.post('-40.00', 0)
+
+        self.assertEqual(self.checkpoint_dates(), [self.day(1)])
+        self.assert_consistent()
+
+    def test_reconcile_reports_a_balance_moved_outside_the_ledger(self):
+        self.post('100.00', 20)
+        create_checkpoint(self.card, self.day(1))
+        Card.objects.filter(pk=self.card.pk).update(balance=Decimal('90.00'), balance_minor=9000)
+
+        self.card.refresh_from_db()
+        result = reconcile(self.card)
+
+        self.assertFalse(result['is_balanced'])
+        self.assertEqual((result['ledger_balance'], result['difference']), (Decimal('100.00'), Decimal('-10.00')))
+
+    def test_edited_balance_is_posted_as_an_adjustment(self):
+        self.post('1000.00', 0)
+        stale = Card.objects.get(pk=self.card.pk)
+        post_balance(Card.objects.get(pk=self.card.pk), Decimal('-50.00'), entry_type='expense')
+
+        # Only the difference the edit makes is posted, on top of the 950
+        stale.balance = stale.balance + Decimal('200.00')
+        stale.save()
+        # A save that doesn't touch the balance leaves it alone
+        stale.card_name = 'renamed'
+        stale.save()
+
+        self.card.refresh_from_db()
+        self.assertEqual((self.card.balance, self.card.card_name), (Decimal('1150.00'), 'renamed'))
+        adjustment = LedgerEntry.objects.filter(card=self.card).latest('id')
+        self.assertEqual((adjustment.entry_type, adjustment.amount, adjustment.description), ('adjustment', Decimal('200.00'), 'Balance edited'))
+        self.assert_consistent()
+
+
+class StatementTests(TestCase):
+
+    def setUp(self):
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.user = CustomUser.objects.create(email='a@b.c', username='alice', auth_status='done', default_currency='USD')
+        card_type = CardType.objects.create(name='Visa')
+        self.card = Card.objects.create(user=self.user, card_type=card_type, currency=self.usd, card_name='main')
+        self.other_card = Card.objects.create(user=self.user, card_type=card_type, currency=self.usd, card_name='other')
+        self.today = timezone.localdate()
+        # Entered out of date order, several on the same day
+        amounts = [('100.00', 9), ('-10.00', 7), ('-2.50', 7), ('40.00', 3), ('-7.25', 9), ('-1.00', 7), ('5.00', 1)]
+        post_entries([
+            LedgerEntry(card_id=card.pk, entry_type='adjustment', amount=Decimal(amount), effective_date=self.today - timedelta(days=days_ago))
+            for card in (self.card, self.other_card) for amount, days_ago in amounts
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/cards/cards/{self.card.pk}/statement/'
+
+    def expected(self, entries):
+        running = Decimal('0')
+        rows = []
+        for entry in entries.order_by('effective_date', 'id'):
+            running += entry.amount
+            rows.append((entry.pk, running))
+        return rows
+
+    def pages(self, url, params):
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data)
+            if response.data['next'] is None:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def next_cursor(self, url):
+        next_url = self.client.get(url, {'page_size': 2}).data['next']
+        return parse_qs(urlparse(next_url).query)['cursor'][0]
+
+    def test_cursors_chain_pages_and_carry_the_balance(self):
+        pages = self.pages(self.url, {'page_size': 2})
+
+        self.assertEqual([len(page['results']) for page in pages], [2, 2, 2, 1])
+        rows = [(row['id'], row['balance']) for page in pages for row in page['results']]
+        self.assertEqual(rows, self.expected(LedgerEntry.objects.filter(card=self.card)))
+        for before, after in zip(pages, pages[1:]):
+            self.assertEqual(after['opening_balance'], before['closing_balance'])
+        self.card.refresh_from_db()
+        self.assertEqual(pages[-1]['closing_balance'], self.card.balance)
+
+    def test_start_date_opens_with_the_balance_before_it(self):
+        create_checkpoint(self.card, self.today - timedelta(days=8))
+        start = self.today - timedelta(days=7)
+
+        pages = self.pages(self.url, {'page_size': 2, 'start_date': start.isoformat(), 'end_date': (self.today - timedelta(days=2)).isoformat()})
+
+        self.assertEqual(pages[0]['opening_balance'], Decimal('92.75'))
+        rows = [(row['id'], row['balance']) for page in pages for row in page['results']]
+        entries = LedgerEntry.objects.filter(card=self.card, effective_date__gte=start, effective_date__lte=self.today - timedelta(days=2))
+        self.assertEqual(rows, [(pk, balance + Decimal('92.75')) for pk, balance in self.expected(entries)])
+        self.assertEqual(pages[-1]['closing_balance'], Decimal('119.25'))
+
+    def test_tampered_and_foreign_cursors_are_rejected(self):
+        cursor = self.next_cursor(self.url)
+        foreign = self.next_cursor(f'/api/cards/cards/{self.other_card.pk}/statement/')
+        payload, signature = cursor.rsplit(':', 1)
+        # A higher opening balance, signed without the statement salt
+        resigned = signing.dumps({**signing.loads(cursor, salt=STATEMENT_CURSOR_SALT), 'balance': 10 ** 9})
+
+        for bad in (f'{payload}:{signature[::-1]}', foreign, resigned, 'garbage'):
+            response = self.client.get(self.url, {'page_size': 2, 'cursor': bad})
+            self.assertEqual(response.status_code, 400, bad)
+            self.assertEqual(response.data, {'error': 'Invalid cursor'})
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def test_rates_matrix_and_per_call_query_agree(self):
+        output = StringIO()
+        call_command('benchmark_rates', conversions=200, days=30, stdout=output)
+
+        self.assertIn('RateMatrix.get_on', output.getvalue())
+        self.assertIn('Same results', output.getvalue())
+        # Scratch data is rolled back
+        self.assertFalse(Currency.objects.filter(code__in=['ZZA', 'ZZB']).exists())
+
+    def test_money_minor_unit_sums_are_exact(self):
+        output = StringIO()
+        call_command('benchmark_money', rows=2000, stdout=output)
+
+        lines = output.getvalue().splitlines()
+        self.assertTrue(lines[2].startswith('SQL SUM(amount_minor)'))
+        self.assertTrue(lines[2].endswith('exact'))
+        self.assertTrue(lines[4].endswith('exact'))
+        self.assertFalse(LedgerEntry.objects.exists())
+
+
+class ConcurrentPostingTests(TransactionTestCase):
+    """
+    Writers on separate threads (own connections) hitting the same card:
+    with the balance moved by balance = balance + delta in SQL none of them
+    can overwrite another's change, so the stored balance ends up equal to
+    the ledger total.
+    """
+
+    THREADS = 4
+    ROUNDS = 10
+
+    def setUp(self):
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.user = CustomUser.objects.create(email='a@b.c', username='alice', auth_status='done', default_currency='USD')
+        card_type = CardType.objects.create(name='Visa')
+        self.card = Card.objects.create(
+            user=self.user, card_type=card_type, currency=self.usd, card_name='main',
+            balance=Decimal('1000.00'), initial_balance=Decimal('1000.00'),
+        )
+        self.category = Category.objects.create(name='Food', type='expense')
+
+    def run_threads(self, work):
+        errors = []
+        start = threading.Barrier(self.THREADS)
+
+        def run(number):
+            try:
+                start.wait()
+                for round_number in range(self.ROUNDS):
+                    work(number, round_number)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(number,)) for number in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assertBalanceMatchesLedger(self, expected):
+        card = Card.objects.get(pk=self.card.pk)
+        ledger_minor, _ = ledger_total(card)
+        self.assertEqual(card.balance, expected)
+        self.assertEqual(card.balance_minor, to_minor(expected))
+        self.assertEqual(card.balance_minor, ledger_minor)
+
+    def test_concurrent_post_balance_and_postings(self):
+        def work(number, round_number):
+            # Every thread works from its own, soon stale, copy of the card
+            card = Card.objects.get(pk=self.card.pk)
+            if number % 2:
+                post_balance(card, Decimal('1.25'))
+                card.card_name = f'main {number}'
+                card.save()
+            else:
+                transaction = Transaction(
+                    user=self.user, card=card, category=self.category, type='expense',
+                    amount=Decimal('2.50'), title=f'{number}-{round_number}', date=date(2026, 10, 1),
+                )
+                posting = TransactionPostingService(self.user)
+                posting.save(transaction)
+                transaction.amount = Decimal('3.00')
+                posting.save(transaction)
+
+        self.run_threads(work)
+
+        half = self.THREADS // 2 * self.ROUNDS
+        self.assertEqual(Transaction.objects.count(), half)
+        self.assertBalanceMatchesLedger(Decimal('1000.00') + half * Decimal('1.25') - half * Decimal('3.00'))
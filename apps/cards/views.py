@@ -3,7 +3,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum, Q
+from django.db.models import Sum, Q, Count
+from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
 
@@ -11,6 +12,11 @@ from decimal import Decimal
 from .models import *
 from .serializers import *
 from .filters import *
+from .money import Money, from_minor
+from .rates import get_rate_matrix
+from .services import post_balance
+from core.cache import cached_response
+from .ledger import balance_as_of, statement_page, STATEMENT_PAGE_SIZE, STATEMENT_MAX_PAGE_SIZE
 
 
 
@@ -66,6 +72,73 @@ class CurrencyViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 
+    @action(detail=False, methods=['post'])
+    def convert_batch(self, request):
+        serializer = CurrencyBatchConversionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        items = []
+        results = []
+        for index, raw_item in enumerate(serializer.validated_data['items']):
+            item_serializer = CurrencyBatchConversionItemSerializer(data=raw_item)
+            if item_serializer.is_valid():
+                items.append((index, item_serializer.validated_data))
+                results.append(None)
+            else:
+                results.append({'index': index, 'error': item_serializer.errors})
+
+        codes = set()
+        for index, item in items:
+            codes.add(item['from_currency'])
+            codes.add(item['to_currency'])
+        currencies = dict(Currency.objects.filter(code__in=codes).values_list('code', 'id'))
+
+        rates_matrix = get_rate_matrix()
+        rates = {}
+        for index, item in items:
+            from_currency_id = currencies.get(item['from_currency'])
+            to_currency_id = currencies.get(item['to_currency'])
+            if from_currency_id is None or to_currency_id is None:
+                results[index] = {'index': index, 'error': "Invalid currency code"}
+                continue
+
+            key = (from_currency_id, to_currency_id, item.get('date'))
+            if key not in rates:
+                rate = None
+                if key[2] is not None:
+                    rate = rates_matrix.get_on(from_currency_id, to_currency_id, key[2])
+                # A date before the pair's history falls back to the latest rate
+                rates[key] = (rate, 'historical') if rate is not None else (rates_matrix.get(from_currency_id, to_currency_id), 'latest')
+            rate, rate_source = rates[key]
+
+            if rate is None:
+                results[index] = {
+                    'index': index,
+                    'error': f"No exchange rate found for {item['from_currency']} to {item['to_currency']}"
+                }
+                continue
+
+            results[index] = {
+                'index': index,
+                'amount': item['amount'],
+                'from_currency': item['from_currency'],
+                'to_currency': item['to_currency'],
+                'converted_amount': item['amount'] * rate,
+                'exchange_rate': rate,
+                'rate_source': rate_source,
+                'date': item.get('date', timezone.now().date()),
+            }
+
+        error_count = sum(1 for result in results if 'error' in result)
+
+        return Response({
+            'count': len(results),
+            'converted_count': len(results) - error_count,
+            'error_count': error_count,
+            'results': results
+        })
+
+
 class ExchangeRateViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ExchangeRateSerializer
     permission_classes = [IsAuthenticated]
@@ -73,6 +146,11 @@ class ExchangeRateViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_filed = ['from_currency', 'to_currency', 'date']
     ordering = ['-date']
 
+    TIMESERIES_INTERVALS = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+    TIMESERIES_MAX_POINTS = 400
+    # Inverted and triangulated rates have no stored precision of their own
+    TIMESERIES_DERIVED_PLACES = Decimal('1e-12')
+
 
     def get_queryset(self):
         return ExchangeRate.objects.all()
@@ -81,25 +159,181 @@ class ExchangeRateViewSet(viewsets.ReadOnlyModelViewSet):
     def latest(self, request):
         base_currency_code = request.query_params.get('base_currency', request.user.default_currency)
 
-        try: 
-            base_currency = Currency.objects.get(code=base_currency_code)
-        except Currency.DoesNotExist:
+        currencies = list(Currency.objects.filter(Q(is_active=True) | Q(code=base_currency_code)).values_list('id', 'code'))
+        base_currency_id = next((currency_id for currency_id, code in currencies if code == base_currency_code), None)
+
+        if base_currency_id is None:
             return Response({
                 'error': "Invalid currency code",
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        currencies = Currency.objects.filter(is_active=True).exclude(code=base_currency_code)
+        rates_matrix = get_rate_matrix()
         rates ={}
-        for currency in currencies:
-            rate = ExchangeRate.get_latest_rate(base_currency, currency)
+        for currency_id, code in currencies:
+            if currency_id == base_currency_id:
+                continue
+            rate = rates_matrix.get(base_currency_id, currency_id)
             if rate:
-                rates[currency.code] = float(rate)
+                rates[code] = float(rate)
         
         return Response({
             'base_currency': base_currency_code,
             'rates': rates,
             'date': timezone.now().date()
         })
+    
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        """
+        Rate history for one pair, downsampled in the database to at most
+        TIMESERIES_MAX_POINTS open/high/low/close/average points. Pairs only
+        known through triangulation are derived from the rate matrix.
+        """
+        from datetime import datetime, timedelta
+        from django.utils.cache import patch_cache_control
+
+        from_code = request.query_params.get('from_currency')
+        to_code = request.query_params.get('to_currency')
+        if not from_code or not to_code:
+            return Response({'error': 'from_currency and to_currency are required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        currencies = dict(Currency.objects.filter(code__in=[from_code, to_code]).values_list('code', 'id'))
+        if from_code not in currencies or to_code not in currencies:
+            return Response({'error': "Invalid currency code"}, status=status.HTTP_400_BAD_REQUEST)
+
+        today = timezone.now().date()
+        try:
+            end = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date() if 'end_date' in request.query_params else today
+            start = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date() if 'start_date' in request.query_params else end - timedelta(days=365)
+        except ValueError:
+            return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({'error': 'start_date must be before end_date'}, status=status.HTTP_400_BAD_REQUEST)
+
+        interval = request.query_params.get('interval', 'day')
+        if interval not in self.TIMESERIES_INTERVALS:
+            return Response({'error': f"interval must be one of: {', '.join(self.TIMESERIES_INTERVALS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        days = (end - start).days + 1
+        intervals = list(self.TIMESERIES_INTERVALS)
+        while days / self.TIMESERIES_INTERVALS[interval] > self.TIMESERIES_MAX_POINTS and interval != intervals[-1]:
+            interval = intervals[intervals.index(interval) + 1]
+
+        path = get_rate_matrix().paths.get((currencies[from_code], currencies[to_code]))
+        if path is not None:
+            source = 'triangulated'
+            results = self.triangulated_points(path, start, end, interval)
+        else:
+            source, results = self.stored_points(currencies[from_code], currencies[to_code], start, end, interval)
+
+        response = Response({
+            'from_currency': from_code,
+            'to_currency': to_code,
+            'interval': interval,
+            'start_date': start,
+            'end_date': end,
+            # direct, inverted (only the opposite pair is stored) or
+            # triangulated (derived through other currencies)
+            'source': source,
+            'points': results
+        })
+        patch_cache_control(response, private=True, max_age=86400 if end < today else 300)
+        return response
+
+    def stored_points(self, from_id, to_id, start, end, interval):
+        """
+        (source, points) from the stored rates of the pair, or of the opposite
+        pair inverted, grouped by period in the database.
+        """
+        from django.db.models import F, Value, Window, Min, Max, Avg, Count, DecimalField
+        from django.db.models.functions import FirstValue, TruncWeek, TruncMonth, TruncYear
+
+        inverted = False
+        rates = ExchangeRate.objects.filter(from_currency_id=from_id, to_currency_id=to_id, date__gte=start, date__lte=end)
+        if not rates.exists():
+            opposite = ExchangeRate.objects.filter(from_currency_id=to_id, to_currency_id=from_id, date__gte=start, date__lte=end)
+            if opposite.exists():
+                inverted = True
+                rates = opposite
+
+        trunc_func = {'week': TruncWeek, 'month': TruncMonth, 'year': TruncYear}.get(interval)
+        period = trunc_func('date') if trunc_func else F('date')
+        partition = {'partition_by': [F('period')]}
+
+        if inverted:
+            # 1.0, not 1: SQLite stores whole rates as integers and would
+            # divide them as such. Read back as a Decimal at
+            # TIMESERIES_DERIVED_PLACES, like the rest of the point.
+            average = Avg(Value(1.0) / F('rate'), output_field=DecimalField(max_digits=30, decimal_places=12))
+        else:
+            average = Avg('rate')
+
+        points = rates.order_by().annotate(period=period).annotate(
+            open=Window(FirstValue('rate'), order_by=F('date').asc(), **partition),
+            close=Window(FirstValue('rate'), order_by=F('date').desc(), **partition),
+            high=Window(Max('rate'), **partition),
+            low=Window(Min('rate'), **partition),
+            average=Window(average, **partition),
+            count=Window(Count('id'), **partition),
+        ).values('period', 'open', 'close', 'high', 'low', 'average', 'count').distinct().order_by('period')
+
+        results = []
+        for point in points:
+            if inverted:
+                one = Decimal('1')
+                point.update({
+                    'open': (one / point['open']).quantize(self.TIMESERIES_DERIVED_PLACES),
+                    'close': (one / point['close']).quantize(self.TIMESERIES_DERIVED_PLACES),
+                    'high': (one / point['low']).quantize(self.TIMESERIES_DERIVED_PLACES),
+                    'low': (one / point['high']).quantize(self.TIMESERIES_DERIVED_PLACES),
+                })
+            results.append(point)
+        return ('inverted' if inverted else 'direct'), results
+
+    def triangulated_points(self, path, start, end, interval):
+        """
+        Points for a pair with no stored rates in either direction, derived
+        along the matrix's triangulation path: on every day any leg has a
+        rate, the product of each leg's rate in effect that day. Grouped in
+        Python, since the rates don't exist as rows.
+        """
+        from datetime import timedelta
+
+        matrix = get_rate_matrix()
+        legs = list(zip(path, path[1:]))
+        days = set()
+        for leg_from_id, leg_to_id in legs:
+            dates, _ = matrix.series.get((leg_from_id, leg_to_id)) or matrix.load_series(leg_from_id, leg_to_id)
+            days.update(day for day in dates if start <= day <= end)
+
+        periods = {}
+        for day in sorted(days):
+            rate = matrix.get_on(path[0], path[-1], day)
+            if rate is None:
+                continue
+
+            if interval == 'week':
+                period = day - timedelta(days=day.weekday())
+            elif interval == 'month':
+                period = day.replace(day=1)
+            elif interval == 'year':
+                period = day.replace(month=1, day=1)
+            else:
+                period = day
+            periods.setdefault(period, []).append(rate.quantize(self.TIMESERIES_DERIVED_PLACES))
+
+        return [
+            {
+                'period': period,
+                'open': rates[0],
+                'close': rates[-1],
+                'high': max(rates),
+                'low': min(rates),
+                'average': (sum(rates) / len(rates)).quantize(self.TIMESERIES_DERIVED_PLACES),
+                'count': len(rates),
+            }
+            for period, rates in periods.items()
+        ]
 
 
 
@@ -127,7 +361,7 @@ class CardViewSet(viewsets.ModelViewSet):
     ViewSet for managing user's cards.
     
     Endpoints:
-    - GET /api/cards/cards/ - List user's cards
+    - GET /api/cards/cards/ - List user's cards (?fields=/?omit= to trim)
     - POST /api/cards/cards/ - Create new card
     - GET /api/cards/cards/{id}/ - Get specific card
     - PUT/PATCH /api/cards/cards/{id}/ - Update card
@@ -136,6 +370,8 @@ class CardViewSet(viewsets.ModelViewSet):
     - POST /api/cards/cards/{id}/update_balance/ - Manually adjust balance
     - GET /api/cards/cards/total_balance/ - Get total balance across all cards
     - GET /api/cards/cards/statistics/ - Get card statistics
+    - GET /api/cards/cards/{id}/balance_as_of/?date= - Balance at the end of a day, from the ledger
+    - GET /api/cards/cards/{id}/statement/ - Ledger entries with running balance (cursor paginated)
     """
 
     permission_classes = [IsAuthenticated]
@@ -147,7 +383,10 @@ class CardViewSet(viewsets.ModelViewSet):
 
 
     def get_queryset(self):
-        return Card.objects.filter(user=self.request.user).select_related('card_type', 'currency')
+        queryset = Card.objects.filter(user=self.request.user).select_related('card_type', 'currency')
+        if self.action == 'list':
+            queryset = CardSerializer.setup_queryset(queryset, self.request)
+        return queryset
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -197,12 +436,12 @@ class CardViewSet(viewsets.ModelViewSet):
         card = self.get_object()
         serializer = CardBalanceUpdateSerializer(data =request.data)
         serializer.is_valid(raise_exception=True)
-        old_balance = card.balance
         new_balance = serializer.validated_data['new_balance']
         reason = serializer.validated_data.get('reason', 'Manul balance adjustment')
 
-        card.balance = new_balance
-        card.save()
+        with transaction.atomic():
+            old_balance = Card.objects.select_for_update().values_list('balance', flat=True).get(pk=card.pk)
+            post_balance(card, new_balance - old_balance, description=reason)
 
         return Response({
             'message': 'Balance updated successfully',
@@ -253,6 +492,7 @@ class CardViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=False, methods=['get'])
+    @cached_response
     def statistics(self, request):
         user = request.user
         cards = self.get_queryset()
@@ -265,30 +505,40 @@ class CardViewSet(viewsets.ModelViewSet):
                 'error': 'Invalid default currency'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        total_cards = cards.count()
-        active_cards = cards.filter(status='active').count()
-        inactive_cards = cards.filter(status='inactive').count()
-        blocked_cards = cards.filter(status='blocked').count()
+        counts = cards.aggregate(
+            total_cards=Count('id'),
+            active_cards=Count('id', filter=Q(status='active')),
+            inactive_cards=Count('id', filter=Q(status='inactive')),
+            blocked_cards=Count('id', filter=Q(status='blocked')),
+        )
+        total_cards = counts['total_cards']
+        active_cards = counts['active_cards']
+        inactive_cards = counts['inactive_cards']
+        blocked_cards = counts['blocked_cards']
+
+        rates = get_rate_matrix()
+        total_balance = Money()
+        bycurrency = []
+        balances = cards.filter(status='active').values(
+            'currency_id', 'currency__code', 'currency__name', 'currency__is_active'
+        ).annotate(cards_count=Count('id'), total_minor=Sum('balance_minor')).order_by('currency__code')
 
-        total_balance = Decimal('0')
-        for card in cards.filter(status='active'):
-            balance_in_default = card.get_balance_in_currency(default_currency)
-            if balance_in_default:
-                total_balance += balance_in_default
-        
-        bytype = cards.values('card_type__name').annotate(count = Sum('id'))
+        for group in balances:
+            total = Money(group['total_minor'])
+            rate = rates.get(group['currency_id'], default_currency.pk)
+            if rate:
+                total_balance += total.convert(rate)
 
-        bycurrency = []
-        for crncy in Currency.objects.filter(is_active=True):
-            cards_in_currency = cards.filter(currency =crncy, status='active')
-            if cards_in_currency.exists():
-                total = sum(card.balance for card in cards_in_currency)
+            if group['currency__is_active']:
                 bycurrency.append({
-                    'currency': crncy.code,
-                    'currency_name': crncy.name,
-                    'cards_count': cards_in_currency.count(),
-                    'total_balance': total
+                    'currency': group['currency__code'],
+                    'currency_name': group['currency__name'],
+                    'cards_count': group['cards_count'],
+                    'total_balance': total.amount
                 })
+        total_balance = total_balance.amount
+        
+        bytype = cards.values('card_type__name').annotate(count = Count('id')).order_by('card_type__name')
         
         return Response({
             'total_cards': total_cards,
@@ -343,6 +593,72 @@ class CardViewSet(viewsets.ModelViewSet):
             'currency': card.currency.code
         })
     
+    @action(detail=True, methods=['get'])
+    def balance_as_of(self, request, pk=None):
+        from datetime import datetime
+
+        card = self.get_object()
+
+        on_date = request.query_params.get('date')
+        if not on_date:
+            return Response({'error': 'date is required (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            on_date = datetime.strptime(on_date, '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'card': card.pk,
+            'date': on_date,
+            'balance': balance_as_of(card, on_date),
+            'currency': card.currency.code
+        })
+
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """
+        Statement with a running balance. Optional start_date/end_date
+        (YYYY-MM-DD) and page_size; follow `next` for the following page.
+        """
+        from datetime import datetime
+        from django.core import signing
+        from rest_framework.utils.urls import replace_query_param
+
+        card = self.get_object()
+
+        try:
+            start = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date() if 'start_date' in request.query_params else None
+            end = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date() if 'end_date' in request.query_params else None
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page_size = min(int(request.query_params.get('page_size', STATEMENT_PAGE_SIZE)), STATEMENT_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'page_size must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if page_size < 1:
+            return Response({'error': 'page_size must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            entries, opening, closing, cursor = statement_page(
+                card, request.query_params.get('cursor'), start, end, page_size
+            )
+        except (signing.BadSignature, KeyError, ValueError):
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_url = None
+        if cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', cursor)
+
+        return Response({
+            'card': card.pk,
+            'currency': card.currency.code,
+            'opening_balance': from_minor(opening),
+            'closing_balance': from_minor(closing),
+            'next': next_url,
+            'results': StatementEntrySerializer(entries, many=True).data
+        })
+
     @action(detail=True, methods=['post'])
     def change_status(self, request, pk=None):
         card =self.get_object()
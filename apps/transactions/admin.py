@@ -56,3 +56,49 @@ class TransactionTagRelationAdmin(admin.ModelAdmin):
     search_fields = ('transaction__title', 'tag__name')
     ordering = ('-created_at',)
 
+
+@admin.register(RevaluationJob)
+class RevaluationJobAdmin(admin.ModelAdmin):
+    list_display = ('user', 'currency', 'status', 'processed_transactions', 'total_transactions', 'created_at', 'completed_at')
+    list_filter = ('status', 'currency')
+    search_fields = ('user__username', 'user__email')
+    readonly_fields = ('created_at', 'updated_at', 'completed_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(StatementImport)
+class StatementImportAdmin(admin.ModelAdmin):
+    list_display = ('user', 'card', 'format', 'status', 'processed_rows', 'imported_count', 'duplicate_count', 'error_count', 'created_at')
+    list_filter = ('status', 'format')
+    search_fields = ('user__username', 'user__email', 'file')
+    readonly_fields = ('created_at', 'updated_at', 'completed_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('user', 'key_hash', 'status_code', 'created_at')
+    list_filter = ('status_code',)
+    search_fields = ('user__username', 'user__email', 'key_hash')
+    readonly_fields = ('key_hash', 'request_hash', 'status_code', 'response', 'created_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(RecurringTransaction)
+class RecurringTransactionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'title', 'card', 'type', 'amount', 'frequency', 'interval', 'next_date', 'is_active')
+    list_filter = ('frequency', 'type', 'is_active')
+    search_fields = ('user__username', 'user__email', 'title')
+    readonly_fields = ('last_generated_at', 'created_at', 'updated_at')
+    ordering = ('next_date',)
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'card', 'category', 'type', 'amount_minor', 'user_amount_minor', 'count')
+    list_filter = ('type',)
+    search_fields = ('user__username', 'user__email')
+    ordering = ('-date',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
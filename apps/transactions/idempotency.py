@@ -0,0 +1,163 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+DEFAULT_TTL_HOURS = 24
+DEFAULT_LEASE_SECONDS = 60
+
+
+def key_ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', DEFAULT_TTL_HOURS))
+
+
+def claim_lease():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+
+
+def digest(value):
+    if isinstance(value, str):
+        value = value.encode()
+    return hashlib.sha256(value).hexdigest()
+
+
+def canonical(value):
+    # Uploads count by name and size: reading request.body to hash the
+    # bytes would hit DATA_UPLOAD_MAX_MEMORY_SIZE on any large receipt.
+    if isinstance(value, UploadedFile):
+        return ['file', value.name, value.size]
+    if hasattr(value, 'lists'):
+        return {key: [canonical(item) for item in items] for key, items in value.lists()}
+    if isinstance(value, dict):
+        return {str(key): canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    return value
+
+
+def request_digest(request):
+    body = json.dumps(canonical(request.data), sort_keys=True, default=str)
+    return digest('\n'.join([request.method, request.path, body]))
+
+
+def take_over(record, request_hash):
+    """
+    Claim a key whose request is still marked in progress after the lease
+    ran out (the worker died or was killed). The UPDATE only matches the
+    claim that was read, so of two retries racing for it only one wins.
+    """
+    if record.status_code is not None or record.request_hash != request_hash:
+        return False
+
+    now = timezone.now()
+    if record.claimed_at >= now - claim_lease():
+        return False
+
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code=None, claimed_at=record.claimed_at
+    ).update(claimed_at=now)
+    if taken:
+        record.claimed_at = now
+    return bool(taken)
+
+
+def claim(user, key_hash, request_hash):
+    """
+    Insert the key as in-progress. The unique (user, key_hash) constraint is
+    what serializes concurrent duplicates: only one INSERT wins, the others
+    get the stored row back. An expired row is replaced, not replayed, and a
+    stale in-progress one is taken over. Returns (None, False) if the row
+    keeps disappearing under us (pruned between the INSERT and the read).
+    """
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user=user, key_hash=key_hash, request_hash=request_hash), True
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, key_hash=key_hash).first()
+            if existing is None:
+                continue
+            if existing.created_at >= timezone.now() - key_ttl():
+                return existing, take_over(existing, request_hash)
+            IdempotencyKey.objects.filter(pk=existing.pk, created_at=existing.created_at).delete()
+    return None, False
+
+
+def owned(record):
+    # The claim this request holds; gone if another retry took it over.
+    return IdempotencyKey.objects.filter(pk=record.pk, claimed_at=record.claimed_at)
+
+
+def idempotent(view_method):
+    """
+    Make a view method honour the Idempotency-Key header. The first request
+    with a key runs normally and its response is stored; a retry with the
+    same key and body gets the stored response back (marked with an
+    Idempotent-Replayed header) without running the view again. A retry that
+    arrives while the first is still running gets 409 (for up to
+    IDEMPOTENCY_LEASE_SECONDS, after which it runs the request itself), and
+    reusing a key for a different request gets 422. Requests without the
+    header are untouched.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response({
+                'error': f"{IDEMPOTENCY_HEADER} must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = request_digest(request)
+        record, created = claim(request.user, digest(key), request_hash)
+
+        if record is None:
+            return Response({
+                'error': 'A request with this Idempotency-Key is still being processed'
+            }, status=status.HTTP_409_CONFLICT)
+
+        if not created:
+            if record.request_hash != request_hash:
+                return Response({
+                    'error': f"{IDEMPOTENCY_HEADER} was already used for a different request"
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if record.status_code is None:
+                return Response({
+                    'error': 'A request with this Idempotency-Key is still being processed'
+                }, status=status.HTTP_409_CONFLICT)
+
+            response = Response(record.response, status=record.status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            owned(record).delete()
+            raise
+
+        if response.status_code >= 500:
+            # Let the client retry a failure that may not happen again.
+            owned(record).delete()
+        else:
+            owned(record).update(status_code=response.status_code, response=response.data)
+        return response
+
+    return wrapper
+
+
+def prune_expired_keys():
+    return IdempotencyKey.objects.filter(created_at__lt=timezone.now() - key_ttl()).delete()[0]
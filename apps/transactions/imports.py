@@ -0,0 +1,288 @@
+import csv
+import io
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.cards.money import to_minor
+from .jobs import start_in_background
+from .models import Category, StatementImport, Transaction
+from .services import TransactionPostingService
+
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 50
+
+DEFAULT_COLUMNS = {
+    'date': 'date',
+    'amount': 'amount',
+    'title': 'title',
+    'description': 'description',
+    'category': 'category',
+    'type': 'type',
+}
+# Transaction.amount holds 15 digits, 2 of them after the point
+MAX_AMOUNT = Decimal('1e13')
+DATE_FORMATS = ['%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y', '%Y%m%d']
+TYPE_ALIASES = {
+    'income': 'income',
+    'credit': 'income',
+    'expense': 'expense',
+    'debit': 'expense',
+}
+
+OFX_TAG_RE = re.compile(r'<([^<>]+)>([^<]*)')
+
+
+def read_csv(stream, mapping):
+    columns = {**DEFAULT_COLUMNS, **{k: v for k, v in mapping.items() if k in DEFAULT_COLUMNS}}
+    for row in csv.DictReader(stream):
+        yield {field: (row.get(column) or '').strip() for field, column in columns.items()}
+
+
+def ofx_tokens(stream, size=64 * 1024):
+    """
+    (TAG, value) pairs from an OFX/SGML stream, read a block at a time so
+    single-line files don't have to fit in memory either.
+    """
+    buffer = ''
+    while True:
+        data = stream.read(size)
+        buffer += data
+        end = buffer.rfind('<') if data else len(buffer)
+        for match in OFX_TAG_RE.finditer(buffer, 0, max(end, 0)):
+            yield match.group(1).strip().upper(), match.group(2).strip()
+        buffer = buffer[max(end, 0):]
+        if not data:
+            break
+
+
+def read_ofx(stream, mapping):
+    current = None
+    for tag, value in ofx_tokens(stream):
+        if tag == 'STMTTRN':
+            current = {}
+        elif tag == '/STMTTRN' and current is not None:
+            posted = current.get('DTPOSTED', '')[:8]
+            yield {
+                'date': f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) == 8 else posted,
+                'amount': current.get('TRNAMT', ''),
+                'title': current.get('NAME') or current.get('MEMO', ''),
+                'description': current.get('MEMO', ''),
+                'category': '',
+                'type': '',
+            }
+            current = None
+        elif current is not None and not tag.startswith('/'):
+            current[tag] = value
+
+
+READERS = {
+    'csv': read_csv,
+    'ofx': read_ofx,
+}
+
+
+def parse_date(value, date_format=None):
+    for fmt in [date_format] if date_format else DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{value}'")
+
+
+def parse_amount(value):
+    value = value.replace(' ', '').replace('\xa0', '')
+    if ',' in value and '.' not in value:
+        value = value.replace(',', '.')
+    else:
+        value = value.replace(',', '')
+
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{value}'")
+    # NaN and Infinity parse, but comparing or quantizing them raises
+    # InvalidOperation, which would fail the whole import
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount '{value}'")
+    if not amount:
+        raise ValueError("Amount must not be zero")
+    if abs(amount) >= MAX_AMOUNT:
+        raise ValueError(f"Amount '{value}' is too large")
+    return amount
+
+
+class RowParser:
+    """
+    Turns a raw statement row into the dict TransactionPostingService
+    expects. Categories are matched by name (case-insensitive) against the
+    user's and the default categories, loaded once per import.
+    """
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.date_format = statement.column_mapping.get('date_format')
+        self.categories = {}
+
+        categories = Category.objects.filter(Q(user=None) | Q(user=statement.user), is_active=True).order_by('user_id')
+        for category in categories:
+            self.categories.setdefault((category.name.lower(), category.type), category)
+
+    def parse(self, raw):
+        amount = parse_amount(raw['amount'])
+        transaction_type = TYPE_ALIASES.get(raw['type'].lower()) or ('expense' if amount < 0 else 'income')
+
+        category = self.categories.get((raw['category'].lower(), transaction_type))
+        if category is None:
+            category = self.statement.income_category if transaction_type == 'income' else self.statement.expense_category
+
+        title = raw['title'] or raw['description'] or 'Imported transaction'
+        return {
+            'card': self.statement.card,
+            'category': category,
+            'type': transaction_type,
+            'amount': abs(amount).quantize(Decimal('0.01')),
+            'title': title[:200],
+            'description': raw['description'] or None,
+            'date': parse_date(raw['date'], self.date_format),
+        }
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class DuplicateFilter:
+    """
+    Drops rows that were already stored for the card before this import
+    started (re-uploaded or overlapping statements). Repeats inside the file
+    are real spending (two identical coffees on one day), so the n-th
+    occurrence of a fingerprint is only skipped when at least n matching
+    transactions existed beforehand. Occurrences are only counted for
+    fingerprints found in the database, which keeps the counter as small
+    as the overlap.
+    """
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.occurrences = {}
+
+    def new_items(self, items):
+        fingerprints = [
+            Transaction.make_fingerprint(self.statement.card_id, item['date'], item['type'], to_minor(item['amount']), item['title'])
+            for item in items
+        ]
+        stored = dict(
+            Transaction.objects.filter(
+                card_id=self.statement.card_id,
+                fingerprint__in=set(fingerprints),
+                created_at__lt=self.statement.created_at,
+            ).order_by().values('fingerprint').annotate(count=Count('id')).values_list('fingerprint', 'count')
+        )
+
+        new_items = []
+        for item, fingerprint in zip(items, fingerprints):
+            if fingerprint in stored:
+                self.occurrences[fingerprint] = self.occurrences.get(fingerprint, 0) + 1
+                if self.occurrences[fingerprint] <= stored[fingerprint]:
+                    continue
+            new_items.append(item)
+        return new_items
+
+
+def import_chunk(posting, duplicates, items):
+    """
+    Post the rows of a chunk that aren't duplicates with one bulk_create.
+    """
+    new_items = duplicates.new_items(items)
+    if new_items:
+        posting.bulk_create(new_items)
+    return len(new_items), len(items) - len(new_items)
+
+
+def run_import(import_id):
+    """
+    Stream the uploaded file through reader -> parser -> chunks, committing
+    each chunk of IMPORT_CHUNK_SIZE rows together with the import's counters.
+    Only one chunk is held in memory at a time. An interrupted import is
+    continued after its last committed row by `manage.py resume_imports`;
+    the rows before it are parsed again only to count repeated rows.
+    """
+    statement = StatementImport.objects.select_related('user', 'card').get(pk=import_id)
+    if statement.status == 'completed':
+        return statement
+
+    statement.status = 'running'
+    statement.bytes_total = statement.file.size
+    statement.save(update_fields=['status', 'bytes_total', 'updated_at'])
+
+    parser = RowParser(statement)
+    posting = TransactionPostingService(statement.user)
+    duplicates = DuplicateFilter(statement)
+    reader = READERS[statement.format]
+
+    try:
+        with statement.file.open('rb') as raw:
+            stream = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+            rows = enumerate(reader(stream, statement.column_mapping), 1)
+
+            for chunk in chunked(rows, IMPORT_CHUNK_SIZE):
+                items = []
+                done_items = []
+                for row_number, row in chunk:
+                    done = row_number <= statement.processed_rows
+                    try:
+                        (done_items if done else items).append(parser.parse(row))
+                    except (KeyError, ValueError) as e:
+                        if done:
+                            continue
+                        statement.error_count += 1
+                        if len(statement.errors) < IMPORT_MAX_ERRORS:
+                            statement.errors.append({'row': row_number, 'error': str(e)})
+
+                if done_items:
+                    # Already handled by an earlier run; only advance the
+                    # occurrence counts.
+                    duplicates.new_items(done_items)
+                if chunk[-1][0] <= statement.processed_rows:
+                    continue
+
+                with transaction.atomic():
+                    imported, skipped = import_chunk(posting, duplicates, items)
+
+                    statement.imported_count += imported
+                    statement.duplicate_count += skipped
+                    statement.processed_rows = chunk[-1][0]
+                    statement.bytes_processed = raw.tell()
+                    statement.save(update_fields=[
+                        'processed_rows', 'bytes_processed', 'imported_count', 'duplicate_count',
+                        'error_count', 'errors', 'updated_at'
+                    ])
+    except Exception as e:
+        statement.status = 'failed'
+        statement.error = str(e)
+        statement.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    statement.status = 'completed'
+    statement.bytes_processed = statement.bytes_total
+    statement.completed_at = timezone.now()
+    statement.save(update_fields=['status', 'bytes_processed', 'completed_at', 'updated_at'])
+    return statement
+
+
+def schedule_import(statement):
+    start_in_background(run_import, statement.pk)
+    return statement
@@ -0,0 +1,125 @@
+import threading
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from apps.cards.models import Currency
+from apps.cards.money import from_minor, to_minor
+from core.cache import bump_data_version
+from .models import RevaluationJob, Transaction
+from .rollups import RollupDeltas
+
+
+REVALUATION_CHUNK_SIZE = 1000
+
+
+def start_in_background(target, *args):
+    """
+    Run `target(*args)` on a daemon thread once the current transaction
+    commits, so the thread sees the rows that scheduled it.
+    """
+    def run():
+        close_old_connections()
+        try:
+            target(*args)
+        finally:
+            connection.close()
+
+    transaction.on_commit(lambda: threading.Thread(target=run, daemon=True).start())
+
+
+def schedule_revaluation(user):
+    """
+    Queue a re-valuation of all of `user`'s transactions into their current
+    default currency. Earlier jobs for the same user stop at their next chunk.
+    """
+    job = RevaluationJob.objects.create(
+        user=user,
+        currency=user.default_currency,
+        total_transactions=Transaction.objects.filter(user=user).count(),
+    )
+    start_in_background(run_revaluation, job.pk)
+    return job
+
+
+def run_revaluation(job_id):
+    """
+    Rewrite amount_in_user_currency and exchange_rate_used chunk by chunk in
+    id order, moving the daily rollups by the difference. Each chunk commits
+    together with the job's cursor, so a job
+    that dies half way resumes where it stopped instead of starting over.
+    """
+    job = RevaluationJob.objects.get(pk=job_id)
+    if job.status in ['completed', 'superseded']:
+        return job
+
+    try:
+        user_currency_id = Currency.objects.get(code=job.currency).pk
+    except Currency.DoesNotExist:
+        job.status = 'failed'
+        job.error = f"Unknown currency {job.currency}"
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        return job
+
+    job.status = 'running'
+    job.save(update_fields=['status', 'updated_at'])
+
+    try:
+        while True:
+            if RevaluationJob.objects.filter(user_id=job.user_id, id__gt=job.pk).exists():
+                job.status = 'superseded'
+                job.save(update_fields=['status', 'updated_at'])
+                return job
+
+            # Read, locked, in the transaction that writes: an edit committed
+            # in between would otherwise get its amount_in_user_currency
+            # overwritten from the old amount and its rollups moved by a
+            # stale difference. On SQLite the IMMEDIATE transaction
+            # serializes it already.
+            with transaction.atomic():
+                rows = list(
+                    Transaction.objects.filter(user_id=job.user_id, id__gt=job.last_transaction_id)
+                    .select_for_update(of=('self',))
+                    .order_by('id')
+                    .values_list('id', 'amount', 'date', 'card__currency_id', 'card_id', 'category_id', 'type', 'amount_in_user_currency')[:REVALUATION_CHUNK_SIZE]
+                )
+                if not rows:
+                    break
+
+                rates = {}
+                chunk = []
+                rollups = RollupDeltas()
+                for transaction_id, amount, transaction_date, card_currency_id, card_id, category_id, transaction_type, old_amount in rows:
+                    key = (card_currency_id, transaction_date)
+                    if key not in rates:
+                        rates[key] = Transaction.get_user_currency_rate(card_currency_id, user_currency_id, transaction_date)
+
+                    new_amount = from_minor(to_minor(amount * rates[key]))
+                    chunk.append(Transaction(
+                        id=transaction_id,
+                        exchange_rate_used=rates[key],
+                        amount_in_user_currency=new_amount,
+                    ))
+                    rollups.change(
+                        (job.user_id, transaction_date, card_id, category_id, transaction_type),
+                        0, to_minor(new_amount) - (to_minor(old_amount) or 0), 0,
+                    )
+
+                Transaction.objects.bulk_update(chunk, ['exchange_rate_used', 'amount_in_user_currency'])
+                rollups.apply()
+                bump_data_version(job.user_id)
+
+                job.last_transaction_id = rows[-1][0]
+                job.processed_transactions += len(rows)
+                job.save(update_fields=['last_transaction_id', 'processed_transactions', 'updated_at'])
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    job.status = 'completed'
+    job.completed_at = timezone.now()
+    job.total_transactions = max(job.total_transactions, job.processed_transactions)
+    job.save(update_fields=['status', 'completed_at', 'total_transactions', 'updated_at'])
+    return job
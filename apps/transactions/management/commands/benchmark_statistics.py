@@ -0,0 +1,145 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.accounts.models import CustomUser
+from apps.cards.models import Card, CardType, Currency
+from apps.cards.money import from_minor, to_minor
+from apps.transactions.models import Category, Transaction
+from apps.transactions.rollups import rebuild_rollups
+from apps.transactions.views import TransactionViewSet
+from core.cache import version_key
+
+
+ENDPOINTS = [
+    ('statistics', {'period': 'all'}),
+    ('by_category', {}),
+    ('by_date', {'group_by': 'month'}),
+    ('by_card', {}),
+    ('monthly_trend', {}),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+def scans(transactions):
+    """
+    What each endpoint ran before the rollups: the same grouping straight
+    over the transactions table.
+    """
+    year_ago = timezone.localdate() - timedelta(days=365)
+    return {
+        'statistics': lambda: list(transactions.values('category__name', 'category__icon', 'type').annotate(
+            total=Sum('amount_in_user_currency'), count=Count('id'),
+        ).order_by('-total')),
+        'by_category': lambda: list(transactions.values('category__id', 'category__name', 'category__icon', 'category__type').annotate(
+            total_amount=Sum('amount_in_user_currency'), transaction_count=Count('id'),
+        ).order_by('-total_amount')),
+        'by_date': lambda: list(transactions.annotate(period=TruncMonth('date')).values('period').annotate(
+            total_income=Sum('amount_in_user_currency', filter=Q(type='income')),
+            total_expense=Sum('amount_in_user_currency', filter=Q(type='expense')),
+            income_count=Count('id', filter=Q(type='income')),
+            expense_count=Count('id', filter=Q(type='expense')),
+        ).order_by('period')),
+        'by_card': lambda: list(transactions.values('card__id', 'card__card_name', 'card__currency__code', 'card__card_type__name').annotate(
+            total_income=Sum('amount', filter=Q(type='income')),
+            total_expense=Sum('amount', filter=Q(type='expense')),
+            transaction_count=Count('id'),
+        ).order_by('-transaction_count')),
+        'monthly_trend': lambda: list(transactions.filter(date__gte=year_ago).annotate(month=TruncMonth('date')).values('month').annotate(
+            income=Sum('amount_in_user_currency', filter=Q(type='income')),
+            expense=Sum('amount_in_user_currency', filter=Q(type='expense')),
+        ).order_by('month')),
+    }
+
+
+class Command(BaseCommand):
+    help = "Time the transaction statistics endpoints (read from the daily rollups) against the same grouping over the transactions table, on scratch data that is rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help="Number of transactions (default 1000000)")
+        parser.add_argument('--days', type=int, default=3 * 365, help="Spread the transactions over this many days (default 1095)")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def timed(self, function):
+        started = time.perf_counter()
+        result = function()
+        return result, time.perf_counter() - started
+
+    def run(self, options):
+        rows = options['rows']
+        days = options['days']
+        values = random.Random(options['seed'])
+
+        currency = Currency.objects.filter(code='UZS').first() or Currency.objects.create(code='UZS', name='Sum', symbol="so'm")
+        user = CustomUser.objects.create(username='benchmark-statistics', email='benchmark-statistics@example.com', default_currency=currency.code)
+        card_type = CardType.objects.create(name='Benchmark')
+        cards = [Card.objects.create(user=user, card_type=card_type, currency=currency, card_name=f'card {number}') for number in range(3)]
+        categories = [
+            Category.objects.create(user=user, name=f'{kind} {number}', type=kind)
+            for kind in ('income', 'expense') for number in range(5)
+        ]
+
+        today = timezone.localdate()
+        exact = {'income': 0, 'expense': 0}
+        batch = []
+        started = time.perf_counter()
+        for number in range(rows):
+            category = categories[values.randrange(len(categories))]
+            amount_minor = values.randrange(1000, 100000000)
+            amount = from_minor(amount_minor)
+            exact[category.type] += amount_minor
+            batch.append(Transaction(
+                user=user, card=cards[number % len(cards)], category=category, type=category.type,
+                amount=amount, amount_minor=amount_minor, amount_in_user_currency=amount, exchange_rate_used=Decimal('1'),
+                title=f'Benchmark {number}', date=today - timedelta(days=values.randrange(days)),
+            ))
+            if len(batch) == 5000:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+        Transaction.objects.bulk_create(batch)
+        insert_seconds = time.perf_counter() - started
+
+        rollup_rows, rebuild_seconds = self.timed(lambda: rebuild_rollups([user.pk]))
+        self.stdout.write(f"{rows} transactions over {days} days: inserted in {insert_seconds:.1f}s, {rollup_rows} rollup rows rebuilt in {rebuild_seconds:.1f}s")
+
+        # A fresh data version, so the response cache can't answer
+        cache.delete(version_key(user.pk))
+        factory = APIRequestFactory()
+        transactions = Transaction.objects.filter(user=user)
+        before = scans(transactions)
+        responses = {}
+        for name, params in ENDPOINTS:
+            request = factory.get(f'/api/transactions/transactions/{name}/', params)
+            force_authenticate(request, user=user)
+            view = TransactionViewSet.as_view({'get': name})
+            response, rollup_seconds = self.timed(lambda: view(request))
+            responses[name] = response.data
+            _, scan_seconds = self.timed(before[name])
+            self.stdout.write(f"{name:<14} rollups {rollup_seconds:.3f}s   transactions table {scan_seconds:.3f}s")
+
+        statistics = responses['statistics']
+        if (to_minor(statistics['total_income']), to_minor(statistics['total_expense'])) == (exact['income'], exact['expense']) \
+                and statistics['total_transactions'] == rows:
+            self.stdout.write(self.style.SUCCESS("statistics totals match the generated transactions"))
+        else:
+            self.stdout.write(self.style.ERROR("statistics totals differ from the generated transactions"))
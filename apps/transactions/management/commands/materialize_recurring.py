@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.transactions.recurring import RECURRING_BATCH_SIZE, materialize_due
+
+
+class Command(BaseCommand):
+    help = "Post every due occurrence of the recurring transaction schedules (safe to re-run)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Generate occurrences up to this date (YYYY-MM-DD), default today")
+        parser.add_argument('--batch-size', type=int, default=RECURRING_BATCH_SIZE, help="Schedules per batch")
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--date must be in YYYY-MM-DD format")
+
+        processed, created = materialize_due(today, options['batch_size'])
+        self.stdout.write(f"Processed {processed} schedules, created {created} transactions")
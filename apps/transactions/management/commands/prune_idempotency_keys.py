@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.idempotency import prune_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL_HOURS"
+
+    def handle(self, *args, **options):
+        deleted = prune_expired_keys()
+        self.stdout.write(f"Pruned {deleted} idempotency keys")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily transaction rollups from the transactions table (backfill or repair)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help="Only this user id (repeatable)")
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(options['user'])
+        self.stdout.write(f"Wrote {written} rollup rows")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.transactions.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = "Create the transaction full-text index and its triggers if missing and rebuild it (SQLite with FTS5 only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if install_search_index(connections[options['database']]):
+            self.stdout.write("Rebuilt the transaction search index")
+        else:
+            self.stdout.write("Full-text search is not available on this database, search uses LIKE")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.imports import run_import
+from apps.transactions.models import StatementImport
+
+
+class Command(BaseCommand):
+    help = "Run statement imports that are pending or were interrupted, continuing after their last committed row"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-failed', action='store_true', help="Retry failed imports as well")
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'running']
+        if options['include_failed']:
+            statuses.append('failed')
+
+        for import_id in StatementImport.objects.filter(status__in=statuses).order_by('id').values_list('id', flat=True):
+            try:
+                statement = run_import(import_id)
+            except Exception as e:
+                self.stderr.write(f"Import {import_id}: failed ({e})")
+                continue
+            self.stdout.write(f"Import {statement.pk}: {statement.status}, {statement.imported_count} imported, {statement.duplicate_count} duplicates, {statement.error_count} errors")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.transactions.jobs import run_revaluation
+from apps.transactions.models import RevaluationJob
+
+
+class Command(BaseCommand):
+    help = "Run re-valuation jobs that are pending or were interrupted, continuing from their last committed chunk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-failed', action='store_true', help="Retry failed jobs as well")
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'running']
+        if options['include_failed']:
+            statuses.append('failed')
+
+        for job_id in RevaluationJob.objects.filter(status__in=statuses).order_by('id').values_list('id', flat=True):
+            job = run_revaluation(job_id)
+            self.stdout.write(f"Job {job.pk} ({job.user_id} -> {job.currency}): {job.status}, {job.processed_transactions}/{job.total_transactions}")
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevaluationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(help_text='Currency code transactions are being re-valued into', max_length=3)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('superseded', 'Superseded'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('total_transactions', models.PositiveIntegerField(default=0)),
+                ('processed_transactions', models.PositiveIntegerField(default=0)),
+                ('last_transaction_id', models.BigIntegerField(default=0, help_text='Highest transaction id already re-valued; the job resumes after it')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revaluation_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Revaluation Job',
+                'verbose_name_plural': 'Revaluation Jobs',
+                'db_table': 'revaluation_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='revaluation_user_id_441446_idx'), models.Index(fields=['status'], name='revaluation_status_3d0a51_idx')],
+            },
+        ),
+    ]
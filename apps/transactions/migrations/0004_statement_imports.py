@@ -0,0 +1,79 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:55
+
+import hashlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_fingerprint(apps, schema_editor):
+    # Same key as Transaction.make_fingerprint, copied so later changes to
+    # the model don't change what this migration wrote.
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    last_id = 0
+    while True:
+        rows = list(
+            Transaction.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'card_id', 'date', 'type', 'amount_minor', 'title')[:2000]
+        )
+        if not rows:
+            break
+
+        chunk = []
+        for transaction_id, card_id, transaction_date, transaction_type, amount_minor, title in rows:
+            key = f"{card_id}|{transaction_date.isoformat()}|{transaction_type}|{amount_minor}|{(title or '').strip().lower()}"
+            chunk.append(Transaction(id=transaction_id, fingerprint=hashlib.sha1(key.encode()).hexdigest()))
+        Transaction.objects.bulk_update(chunk, ['fingerprint'])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_minor_units'),
+        ('transactions', '0003_minor_units'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='Hash of card, date, type, amount and title, used to skip duplicates on import', max_length=40),
+        ),
+        migrations.RunPython(backfill_fingerprint, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='StatementImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/%Y/%m/%d/')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('ofx', 'OFX')], default='csv', max_length=3)),
+                ('column_mapping', models.JSONField(blank=True, default=dict, help_text='CSV column names for date, amount, title, description, category and type, plus an optional date_format')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('bytes_total', models.BigIntegerField(default=0)),
+                ('bytes_processed', models.BigIntegerField(default=0)),
+                ('processed_rows', models.PositiveIntegerField(default=0, help_text='Rows already handled; the import resumes after them')),
+                ('imported_count', models.PositiveIntegerField(default=0)),
+                ('duplicate_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list, help_text='First rows that could not be imported')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('card', models.ForeignKey(help_text='Card the imported transactions are posted to', on_delete=django.db.models.deletion.CASCADE, related_name='statement_imports', to='cards.card')),
+                ('expense_category', models.ForeignKey(help_text='Used for expense rows without a matching category', on_delete=django.db.models.deletion.PROTECT, related_name='+', to='transactions.category')),
+                ('income_category', models.ForeignKey(help_text='Used for income rows without a matching category', on_delete=django.db.models.deletion.PROTECT, related_name='+', to='transactions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statement_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Statement Import',
+                'verbose_name_plural': 'Statement Imports',
+                'db_table': 'statement_imports',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='statement_i_user_id_718fc6_idx'), models.Index(fields=['status'], name='statement_i_status_b21665_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 6.0.2 on 2026-10-17 02:06
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_ledger'),
+        ('transactions', '0005_idempotency_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, help_text="Amount in card's currency", max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly'), ('yearly', 'Yearly')], default='monthly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days/weeks/months/years', validators=[django.core.validators.MinValueValidator(1)])),
+                ('start_date', models.DateField(help_text='First occurrence; also fixes the day of month for monthly/yearly rules')),
+                ('end_date', models.DateField(blank=True, help_text='No occurrences after this date', null=True)),
+                ('next_date', models.DateField(help_text='Next occurrence that has not been generated yet')),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_generated_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='recurring_transactions', to='cards.card')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='recurring_transactions', to='transactions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Recurring Transaction',
+                'verbose_name_plural': 'Recurring Transactions',
+                'db_table': 'recurring_transactions',
+                'ordering': ['next_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='recurring',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Schedule this transaction was generated from', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='transactions.recurringtransaction'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurring__isnull', False)), fields=('recurring', 'date'), name='unique_recurring_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringtransaction',
+            index=models.Index(fields=['is_active', 'next_date'], name='recurring_t_is_acti_01dd20_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringtransaction',
+            index=models.Index(fields=['user', 'next_date'], name='recurring_t_user_id_5b5585_idx'),
+        ),
+    ]
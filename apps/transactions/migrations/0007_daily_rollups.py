@@ -0,0 +1,65 @@
+# Generated by Django 6.0.2 on 2026-10-17 02:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Count, F, Sum
+from django.db.models.functions import Cast, Coalesce, Round
+
+
+def backfill_rollups(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    DailyRollup = apps.get_model('transactions', 'DailyRollup')
+
+    rows = Transaction.objects.order_by().values('user_id', 'date', 'card_id', 'category_id', 'type').annotate(
+        amount_total=Sum('amount_minor'),
+        user_amount_total=Coalesce(Sum(Cast(Round(F('amount_in_user_currency') * 100), BigIntegerField())), 0),
+        transaction_count=Count('id'),
+    )
+
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        batch.append(DailyRollup(
+            user_id=row['user_id'], date=row['date'], card_id=row['card_id'],
+            category_id=row['category_id'], type=row['type'],
+            amount_minor=row['amount_total'] or 0, user_amount_minor=row['user_amount_total'],
+            count=row['transaction_count'],
+        ))
+        if len(batch) >= 1000:
+            DailyRollup.objects.bulk_create(batch)
+            batch = []
+    DailyRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_ledger'),
+        ('transactions', '0006_recurring_transactions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('amount_minor', models.BigIntegerField(default=0, help_text='Sum of amount (card currency) in minor units')),
+                ('user_amount_minor', models.BigIntegerField(default=0, help_text='Sum of amount_in_user_currency in minor units')),
+                ('count', models.IntegerField(default=0)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='cards.card')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='transactions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Rollup',
+                'verbose_name_plural': 'Daily Rollups',
+                'db_table': 'daily_rollups',
+                'indexes': [models.Index(fields=['user', 'date'], name='daily_rollu_user_id_4535cb_idx'), models.Index(fields=['user', 'category', 'date'], name='daily_rollu_user_id_b85aee_idx')],
+                'unique_together': {('user', 'date', 'card', 'category', 'type')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0.2 on 2026-10-17 03:40
+
+from django.db import DatabaseError, migrations, transaction
+
+
+# Frozen copy of apps.transactions.search.CREATE_STATEMENTS
+CREATE_STATEMENTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        title, description, location,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF title, description, location ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO transactions_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END""",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # SQLite only, and only when it was built with FTS5; elsewhere search
+    # keeps using LIKE.
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    try:
+        with transaction.atomic(using=connection.alias):
+            for statement in CREATE_STATEMENTS:
+                schema_editor.execute(statement, params=None)
+            schema_editor.execute("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')", params=None)
+    except DatabaseError:
+        pass
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    for trigger in ['insert', 'delete', 'update']:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS transactions_fts_{trigger}", params=None)
+    schema_editor.execute("DROP TABLE IF EXISTS transactions_fts", params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-17 02:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When the request holding the key started; a pending key older than IDEMPOTENCY_LEASE_SECONDS can be taken over'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-17 03:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_idempotency_claimed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearchIndex',
+            fields=[
+                ('transaction', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='transactions.transaction')),
+                ('document', models.TextField(db_column='transactions_fts')),
+            ],
+            options={
+                'db_table': 'transactions_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from decimal import Decimal
+import hashlib
 from apps.accounts.models import CustomUser
 from apps.cards.models import *
 
@@ -62,7 +64,7 @@ class Category(models.Model):
     
     @property
     def is_default(self):
-        return self.user is None
+        return self.user_id is None
     
     @property
     def full_name(self):
@@ -81,6 +83,7 @@ class Transaction(models.Model):
     category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='transactions')
     type = models.CharField(max_length=10, choices=TRANSACTION_TYPE_CHOICES)
     amount = models.DecimalField(max_digits=15, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))], help_text="Amount in card's currenct")
+    amount_minor = models.BigIntegerField(default=0, editable=False, help_text="Amount in minor units (e.g. cents), kept in sync with amount for fast aggregation")
     amount_in_user_currency = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True, help_text="Amount converted to user's default currency")
     exchange_rate_used = models.DecimalField(max_digits=20, decimal_places=6, default=1, help_text="Exchange rate at time of transaction")
     title = models.CharField(max_length=200, help_text="Short description (e.g., 'Grocery shopping')")
@@ -88,6 +91,8 @@ class Transaction(models.Model):
     date = models.DateField(default=timezone.now, help_text="Transaction date")
     receipt_image = models.ImageField(upload_to='receipt/%Y/%m/%d/', null=True, blank=True, help_text="Upload receipt photo")
     location = models.CharField(max_length=200, blank=True, null=True, help_text="Where the transaction occured")
+    fingerprint = models.CharField(max_length=40, blank=True, default='', db_index=True, editable=False, help_text="Hash of card, date, type, amount and title, used to skip duplicates on import")
+    recurring = models.ForeignKey('RecurringTransaction', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='transactions', help_text="Schedule this transaction was generated from")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -102,47 +107,275 @@ class Transaction(models.Model):
             models.Index(fields=['card', '-date']),
             models.Index(fields=['category', '-date']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['recurring', 'date'], condition=models.Q(recurring__isnull=False), name='unique_recurring_occurrence'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title} ({self.amount} {self.card.currency.code})"
     
+    # Values the balance and the daily rollups were last posted with
+    POSTED_FIELDS = ['card_id', 'category_id', 'type', 'amount', 'amount_in_user_currency', 'date']
+
+    @staticmethod
+    def get_user_currency_rate(card_currency_id, user_currency_id, on_date):
+        if card_currency_id == user_currency_id:
+            return Decimal('1.0')
+
+        rate = ExchangeRate.get_rate_on(card_currency_id, user_currency_id, on_date) or ExchangeRate.get_latest_rate(card_currency_id, user_currency_id)
+        return rate or Decimal('1.0')
+
+    @staticmethod
+    def make_fingerprint(card_id, transaction_date, transaction_type, amount_minor, title):
+        key = f"{card_id}|{transaction_date.isoformat()}|{transaction_type}|{amount_minor}|{(title or '').strip().lower()}"
+        return hashlib.sha1(key.encode()).hexdigest()
+
     def save(self, *args, **kwargs):
-        user_currency = Currency.objects.get(code=self.user.default_currency)
-        card_currency = self.card.currency
-
-        if card_currency != user_currency:
-            rate = ExchangeRate.get_latest_rate(card_currency, user_currency)
-            if rate:
-                self.exchange_rate_used = rate
-                self.amount_in_user_currency = self.amount * rate
-            else:
-                self.exchange_rate_used = Decimal('1.0')
-                self.amount_in_user_currency = self.amount
-        else:
-            self.exchange_rate_used = Decimal('1.0')
-            self.amount_in_user_currency = self.amount
-
-        is_new = self.pk is None
-
-        if not is_new:
-            old_transaction = Transaction.objects.get(pk=self.pk)
-            if old_transaction.type == 'income':
-                old_transaction.card.balance -= old_transaction.amount
-            else:
-                old_transaction.card.balance += old_transaction.amount
-            old_transaction.card.save()
-
-        super().save(*args, **kwargs)
-        self.card.update_balance(self.amount, self.type)
+        from .services import TransactionPostingService
+
+        TransactionPostingService(self.user).save(self, *args, **kwargs)
     
     def delete(self, *args, **kwargs):
-        if self.type == 'income':
-            self.card.balance -= self.amount
-        else:
-            self.card.balance += self.amount
-        self.card.save()
+        from .services import TransactionPostingService
+
+        return TransactionPostingService().delete(self, *args, **kwargs)
+
+class DailyRollup(models.Model):
+    """
+    Per-day totals of a user's transactions by card, category and type,
+    kept in step with every posting and delete by TransactionPostingService.
+    The analytics endpoints read these instead of the raw transactions, so
+    their cost follows days x categories rather than the number of rows.
+    Rebuild with the rebuild_rollups command.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='daily_rollups')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_rollups')
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    amount_minor = models.BigIntegerField(default=0, help_text="Sum of amount (card currency) in minor units")
+    user_amount_minor = models.BigIntegerField(default=0, help_text="Sum of amount_in_user_currency in minor units")
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'daily_rollups'
+        verbose_name = 'Daily Rollup'
+        verbose_name_plural = 'Daily Rollups'
+        unique_together = ['user', 'date', 'card', 'category', 'type']
+        indexes = [
+            models.Index(fields=['user', 'date']),
+            models.Index(fields=['user', 'category', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.date} {self.card_id}/{self.category_id} {self.type}: {self.count}"
+
+class TransactionSearchIndex(models.Model):
+    """
+    The FTS5 table behind `?search=` (see search.py), so the ORM can join it
+    to transactions. Created and filled by install_search_index and the
+    triggers, never written through Django; only exists on SQLite.
+    """
+    transaction = models.OneToOneField(Transaction, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', db_constraint=False, related_name='search_index')
+    # FTS5's hidden column named after the table: the left side of MATCH and
+    # the first argument of bm25()
+    document = models.TextField(db_column='transactions_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'transactions_fts'
+
+class RecurringTransaction(models.Model):
+    """
+    Template for a transaction that repeats (salary, rent, subscriptions).
+    `next_date` is the first occurrence not generated yet; the
+    materialize_recurring command posts every occurrence up to today and
+    moves it forward.
+    """
+    FREQUENCY_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+        ('yearly', 'Yearly'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='recurring_transactions')
+    card = models.ForeignKey(Card, on_delete=models.PROTECT, related_name='recurring_transactions')
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='recurring_transactions')
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=15, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))], help_text="Amount in card's currency")
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='monthly')
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)], help_text="Repeat every N days/weeks/months/years")
+    start_date = models.DateField(help_text="First occurrence; also fixes the day of month for monthly/yearly rules")
+    end_date = models.DateField(null=True, blank=True, help_text="No occurrences after this date")
+    next_date = models.DateField(help_text="Next occurrence that has not been generated yet")
+    is_active = models.BooleanField(default=True)
+    last_generated_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'recurring_transactions'
+        verbose_name = 'Recurring Transaction'
+        verbose_name_plural = 'Recurring Transactions'
+        ordering = ['next_date']
+        indexes = [
+            models.Index(fields=['is_active', 'next_date']),
+            models.Index(fields=['user', 'next_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.title} ({self.get_frequency_display()})"
+
+    def occurrence_after(self, day):
+        """
+        The occurrence that follows `day`. Monthly and yearly rules keep the
+        start date's day of month, clamped to the length of shorter months.
+        """
+        import calendar
+        from datetime import timedelta
+
+        if self.frequency == 'daily':
+            return day + timedelta(days=self.interval)
+        if self.frequency == 'weekly':
+            return day + timedelta(weeks=self.interval)
+
+        months = self.interval * (12 if self.frequency == 'yearly' else 1)
+        month_index = day.year * 12 + day.month - 1 + months
+        year, month = divmod(month_index, 12)
+        month += 1
+        return day.replace(year=year, month=month, day=min(self.start_date.day, calendar.monthrange(year, month)[1]))
+
+    def due_dates(self, until, limit=None):
+        """
+        Occurrences from next_date up to and including `until` (and end_date),
+        at most `limit` of them.
+        """
+        dates = []
+        day = self.next_date
+        last = min(until, self.end_date) if self.end_date else until
+        while day <= last and (limit is None or len(dates) < limit):
+            dates.append(day)
+            day = self.occurrence_after(day)
+        return dates
+
+class RevaluationJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('superseded', 'Superseded'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='revaluation_jobs')
+    currency = models.CharField(max_length=3, help_text="Currency code transactions are being re-valued into")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total_transactions = models.PositiveIntegerField(default=0)
+    processed_transactions = models.PositiveIntegerField(default=0)
+    last_transaction_id = models.BigIntegerField(default=0, help_text="Highest transaction id already re-valued; the job resumes after it")
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'revaluation_jobs'
+        verbose_name = 'Revaluation Job'
+        verbose_name_plural = 'Revaluation Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['status']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} -> {self.currency} ({self.status})"
+
+    @property
+    def progress(self):
+        if not self.total_transactions:
+            return 100 if self.status == 'completed' else 0
+        return round(self.processed_transactions * 100 / self.total_transactions, 2)
+
+class StatementImport(models.Model):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    ]
 
-        super().delete(*args, **kwargs)
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='statement_imports')
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='statement_imports', help_text="Card the imported transactions are posted to")
+    file = models.FileField(upload_to='imports/%Y/%m/%d/')
+    format = models.CharField(max_length=3, choices=FORMAT_CHOICES, default='csv')
+    column_mapping = models.JSONField(default=dict, blank=True, help_text="CSV column names for date, amount, title, description, category and type, plus an optional date_format")
+    income_category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='+', help_text="Used for income rows without a matching category")
+    expense_category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='+', help_text="Used for expense rows without a matching category")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    bytes_total = models.BigIntegerField(default=0)
+    bytes_processed = models.BigIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0, help_text="Rows already handled; the import resumes after them")
+    imported_count = models.PositiveIntegerField(default=0)
+    duplicate_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="First rows that could not be imported")
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'statement_imports'
+        verbose_name = 'Statement Import'
+        verbose_name_plural = 'Statement Imports'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['status']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.file.name} ({self.status})"
+
+    @property
+    def progress(self):
+        if self.status == 'completed':
+            return 100
+        if not self.bytes_total:
+            return 0
+        return round(min(self.bytes_processed, self.bytes_total) * 100 / self.bytes_total, 2)
+
+class IdempotencyKey(models.Model):
+    """
+    Response stored for an Idempotency-Key header so a retried write is
+    answered from here instead of being executed again. Keys are kept as a
+    sha256 digest and pruned after IDEMPOTENCY_KEY_TTL_HOURS (prune_idempotency_keys).
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key_hash = models.CharField(max_length=64)
+    request_hash = models.CharField(max_length=64, help_text="Digest of method, path and body the key was first used with")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Empty while the first request is still running")
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    claimed_at = models.DateTimeField(default=timezone.now, help_text="When the request holding the key started; a pending key older than IDEMPOTENCY_LEASE_SECONDS can be taken over")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        unique_together = ['user', 'key_hash']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.key_hash[:12]} ({self.status_code or 'pending'})"
 
 class TransactionTag(models.Model):
     name = models.CharField(max_length=50, help_text="Tag name (e.g., 'urgent', 'work', 'vacation')")
@@ -162,7 +395,7 @@ class TransactionTag(models.Model):
     
     @property
     def is_default(self):
-        return self.user is None
+        return self.user_id is None
 
 class TransactionTagRelation(models.Model):
     transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='transaction_tags')
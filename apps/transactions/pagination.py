@@ -0,0 +1,144 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .search import SEARCH_RANK
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on the full ordering plus the primary key, e.g.
+    (date, created_at, id). DRF's CursorPagination positions on the first
+    field only and skips ties with an OFFSET; here the cursor holds every
+    ordering value of the row at the page edge, so each page is a single
+    `WHERE (date, created_at, id) < (...) ORDER BY ... LIMIT n` with no
+    COUNT(*) and no OFFSET, however deep it is. `?ordering=` is honoured
+    (the fields must not be nullable, annotations are allowed), and a
+    cursor only applies to the ordering it was issued for.
+    """
+
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.names = [name.lstrip('-') for name in self.ordering]
+        self.fields = [self.ordering_field(queryset, name) for name in self.names]
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[1]
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor[0], reverse))
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else '-' + name for name in ordering]
+
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = has_more if reverse else cursor is not None
+        # An empty page still links back to where the cursor pointed.
+        self.first_values = self.values_of(results[0]) if results else (cursor[0] if cursor else None)
+        self.last_values = self.values_of(results[-1]) if results else (cursor[0] if cursor else None)
+        return self.page
+
+    def after(self, values, reverse=False):
+        """
+        Rows past `values` in the ordering (before them when `reverse`),
+        spelled as (a > x) OR (a = x AND b > y) OR ... with a plain range
+        on the first field in front so the leading index can be used.
+        """
+        condition = Q()
+        equal = Q()
+        for ordering, name, value in zip(self.ordering, self.names, values):
+            descending = ordering.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+
+        first_lookup = 'lte' if self.ordering[0].startswith('-') != reverse else 'gte'
+        return Q(**{f"{self.names[0]}__{first_lookup}": values[0]}) & condition
+
+    def ordering_field(self, queryset, name):
+        # Annotations (e.g. a search rank) can be ordered on too.
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def values_of(self, instance):
+        return [getattr(instance, name) for name in self.names]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if data['o'] != list(self.ordering) or len(data['v']) != len(self.fields):
+                raise ValueError
+            values = [field.to_python(value) for field, value in zip(self.fields, data['v'])]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(data.get('r'))
+
+    def encode_cursor(self, values, reverse=False):
+        data = {
+            'o': list(self.ordering),
+            'v': [self.serialize(value) for value in values],
+        }
+        if reverse:
+            data['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def serialize(self, value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if isinstance(value, (int, str)) or value is None:
+            return value
+        return str(value)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last_values)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first_values, reverse=True)
+
+
+class TransactionPagination(KeysetPagination):
+    ordering = ('-date', '-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        # Full-text results come best match first unless ?ordering= is given
+        if SEARCH_RANK in queryset.query.annotations and not request.query_params.get(api_settings.ORDERING_PARAM):
+            ordering = (SEARCH_RANK,) + ordering
+        return ordering
@@ -0,0 +1,156 @@
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+from apps.cards.money import to_minor
+from core.cache import bump_data_version
+from .models import DailyRollup, Transaction
+
+
+ROLLUP_BATCH_SIZE = 100
+REBUILD_BATCH_SIZE = 1000
+ROLLUP_FIELDS = ['amount_minor', 'user_amount_minor', 'count']
+
+
+def rollup_key(user_id, values):
+    return (user_id, values['date'], values['card_id'], values['category_id'], values['type'])
+
+
+class RollupDeltas:
+    """
+    Net change per (user, date, card, category, type) row, collected while a
+    posting is built and written with apply(). Adding and removing the same
+    transaction cancels out, so an edit that doesn't move any total writes
+    nothing.
+    """
+
+    def __init__(self):
+        self.deltas = {}
+
+    def change(self, key, amount_minor, user_amount_minor, count):
+        current = self.deltas.get(key, (0, 0, 0))
+        self.deltas[key] = (current[0] + amount_minor, current[1] + user_amount_minor, current[2] + count)
+
+    def add(self, transaction):
+        self.add_values(transaction.user_id, {
+            'date': transaction.date,
+            'card_id': transaction.card_id,
+            'category_id': transaction.category_id,
+            'type': transaction.type,
+            'amount': transaction.amount,
+            'amount_in_user_currency': transaction.amount_in_user_currency,
+        })
+
+    def add_values(self, user_id, values, sign=1):
+        self.change(
+            rollup_key(user_id, values),
+            sign * to_minor(values['amount']),
+            sign * (to_minor(values['amount_in_user_currency']) or 0),
+            sign,
+        )
+
+    def remove_values(self, user_id, values):
+        self.add_values(user_id, values, sign=-1)
+
+    def apply(self):
+        return apply_rollup_deltas(self.deltas)
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Add `deltas` ({key: (amount_minor, user_amount_minor, count)}) to the
+    rollup rows: one SELECT for the rows that exist, F() increments through
+    a CASE UPDATE per ROLLUP_BATCH_SIZE rows, and one multi-row INSERT for
+    the rest. If another posting inserts one of the rows first, the INSERT
+    fails inside its savepoint and those rows are incremented instead.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return 0
+
+    dates = [key[1] for key in deltas]
+    rows = DailyRollup.objects.filter(
+        user_id__in={key[0] for key in deltas},
+        card_id__in={key[2] for key in deltas},
+        date__range=(min(dates), max(dates)),
+    ).values_list('pk', 'user_id', 'date', 'card_id', 'category_id', 'type')
+    existing = {tuple(row[1:]): row[0] for row in rows if tuple(row[1:]) in deltas}
+
+    with transaction.atomic(savepoint=False):
+        keys = list(existing)
+        for start in range(0, len(keys), ROLLUP_BATCH_SIZE):
+            batch = keys[start:start + ROLLUP_BATCH_SIZE]
+            DailyRollup.objects.filter(pk__in=[existing[key] for key in batch]).update(**{
+                field: F(field) + Case(
+                    *[When(pk=existing[key], then=Value(deltas[key][index])) for key in batch],
+                    output_field=IntegerField() if field == 'count' else BigIntegerField(),
+                )
+                for index, field in enumerate(ROLLUP_FIELDS)
+            })
+
+        missing = {key: delta for key, delta in deltas.items() if key not in existing}
+        if missing:
+            try:
+                with transaction.atomic():
+                    DailyRollup.objects.bulk_create([
+                        DailyRollup(
+                            user_id=key[0], date=key[1], card_id=key[2], category_id=key[3], type=key[4],
+                            amount_minor=delta[0], user_amount_minor=delta[1], count=delta[2],
+                        )
+                        for key, delta in missing.items()
+                    ], batch_size=REBUILD_BATCH_SIZE)
+            except IntegrityError:
+                apply_rollup_deltas(missing)
+
+    return len(deltas)
+
+
+def grouped_totals(transactions):
+    """
+    Rollup rows for `transactions` in one GROUP BY. amount_in_user_currency
+    is summed as whole minor units so the result matches what the postings
+    added, whatever the backend does with decimal sums.
+    """
+    return transactions.order_by().values('user_id', 'date', 'card_id', 'category_id', 'type').annotate(
+        amount_total=Sum('amount_minor'),
+        user_amount_total=Coalesce(Sum(Cast(Round(F('amount_in_user_currency') * 100), BigIntegerField())), 0),
+        transaction_count=Count('id'),
+    )
+
+
+def rebuild_rollups(user_ids=None):
+    """
+    Recompute the rollups from the transactions table, for everyone or only
+    `user_ids`, by replacing the rows with one GROUP BY over the
+    transactions. Returns the number of rollup rows written.
+    """
+    transactions = Transaction.objects.all()
+    rollups = DailyRollup.objects.all()
+    if user_ids is not None:
+        transactions = transactions.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    written = 0
+    user_ids = set(rollups.values_list('user_id', flat=True).distinct())
+    with transaction.atomic():
+        rollups.delete()
+
+        batch = []
+        for row in grouped_totals(transactions).iterator(chunk_size=REBUILD_BATCH_SIZE):
+            user_ids.add(row['user_id'])
+            batch.append(DailyRollup(
+                user_id=row['user_id'], date=row['date'], card_id=row['card_id'],
+                category_id=row['category_id'], type=row['type'],
+                amount_minor=row['amount_total'] or 0,
+                user_amount_minor=row['user_amount_total'],
+                count=row['transaction_count'],
+            ))
+            if len(batch) == REBUILD_BATCH_SIZE:
+                DailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailyRollup.objects.bulk_create(batch)
+        written += len(batch)
+        bump_data_version(*user_ids)
+
+    return written
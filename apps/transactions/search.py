@@ -0,0 +1,159 @@
+import re
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F, FloatField, Func, Lookup, Value
+from rest_framework import filters
+
+from .models import TransactionSearchIndex
+
+
+SEARCH_TABLE = 'transactions_fts'
+SEARCH_RANK = 'search_rank'
+# bm25 weights of title, description and location
+RANK_WEIGHTS = (10.0, 3.0, 1.0)
+DEFAULT_SEARCH_INDEX_RECHECK_SECONDS = 60
+
+# External content table: the index keeps only the tokens and reads the
+# text back from `transactions`. The triggers fire on every write that
+# reaches the table, including bulk_create, queryset.update() and
+# queryset.delete(), so no code path has to remember to update it.
+CREATE_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title, description, location,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title, description, location ON transactions BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END""",
+]
+SEARCH_OBJECTS = [SEARCH_TABLE, f'{SEARCH_TABLE}_insert', f'{SEARCH_TABLE}_delete', f'{SEARCH_TABLE}_update']
+
+# alias -> (ready, monotonic time of the check)
+_ready = {}
+
+
+def search_index_supported(connection):
+    return connection.vendor == 'sqlite'
+
+
+def install_search_index(connection):
+    """
+    Create the FTS5 table and its triggers if they are missing and rebuild
+    the index from the transactions table. Returns False when the database
+    isn't SQLite or SQLite was built without FTS5; search then stays on
+    LIKE.
+    """
+    if not search_index_supported(connection):
+        return False
+
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                for statement in CREATE_STATEMENTS:
+                    cursor.execute(statement)
+                cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+    except DatabaseError:
+        return False
+
+    _ready.pop(connection.alias, None)
+    return True
+
+
+def search_index_ready(connection):
+    """
+    Whether the index and all three triggers exist. Django rebuilds a SQLite
+    table to alter it, which drops its triggers, so a later migration on
+    Transaction switches search back to LIKE until
+    `manage.py rebuild_search_index` is run. The answer is kept for
+    SEARCH_INDEX_RECHECK_SECONDS, so a change made from another process
+    (the rebuild command, a migration) is seen within that time.
+    """
+    max_age = getattr(settings, 'SEARCH_INDEX_RECHECK_SECONDS', DEFAULT_SEARCH_INDEX_RECHECK_SECONDS)
+    cached = _ready.get(connection.alias)
+    if cached is not None and time.monotonic() - cached[1] < max_age:
+        return cached[0]
+
+    ready = False
+    if search_index_supported(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(SEARCH_OBJECTS))})",
+                SEARCH_OBJECTS,
+            )
+            ready = cursor.fetchone()[0] == len(SEARCH_OBJECTS)
+    _ready[connection.alias] = (ready, time.monotonic())
+    return ready
+
+
+def match_query(terms):
+    """
+    FTS5 query for the search box: every word has to match, as a prefix
+    ("cof sho" finds "Coffee shop"). Words are quoted so FTS5 operators and
+    punctuation typed by the user are taken literally.
+    """
+    words = [word for term in terms for word in re.findall(r'\w+', term)]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class Match(Lookup):
+    """
+    `search_index__document__match=<query>`: the FTS5 `<table> MATCH` on the
+    table's hidden column. A lookup rather than an expression so the join
+    is an INNER JOIN; FTS5 refuses MATCH on the nullable side of a LEFT JOIN.
+    """
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+TransactionSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
+class Bm25(Func):
+    function = 'bm25'
+    output_field = FloatField()
+
+
+class TransactionSearchFilter(filters.SearchFilter):
+    """
+    `?search=` through the FTS5 index, annotated with its bm25 score as
+    `search_rank` (lower is better; TransactionPagination lists by it when
+    no ordering is asked for). On other databases, or before the index is
+    installed, it is the plain SearchFilter over `search_fields`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        if not search_index_ready(connections[queryset.db]):
+            return super().filter_queryset(request, queryset, view)
+
+        query = match_query(terms)
+        if not query:
+            return queryset.none()
+
+        # Joined through TransactionSearchIndex rather than a correlated
+        # subquery: SQLite can't seek an FTS5 match to one rowid, so bm25 per
+        # row would rerun the whole match. The rank reuses the same join.
+        return queryset.filter(search_index__document__match=query).annotate(**{
+            SEARCH_RANK: Bm25(F('search_index__document'), *[Value(weight) for weight in RANK_WEIGHTS]),
+        })
@@ -1,5 +1,8 @@
 from rest_framework import serializers
+from django.db.models import Q
 from .models import *
+from .services import TagAssigner
+from core.serializers import SparseFieldsetMixin
 
 
 
@@ -40,7 +43,7 @@ class TransactionTagSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     card_name = serializers.CharField(source = 'card.card_name', read_only = True)
     card_currency = serializers.CharField(source = 'card.currency.code', read_only = True)
     category_name = serializers.CharField(source = 'category.name', read_only = True)
@@ -51,6 +54,7 @@ class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields= ['id', 'type', 'title', 'amount', 'date', 'card', 'card_name', 'card_currency', 'category', 'category_name', 'category_icon', 'category_color', 'amount_in_user_currency', 'tags', 'created_at']
+        prefetch_fields = {'tags': ['transaction_tags__tag']}
 
 
     def get_tags(self, obj):
@@ -92,24 +96,124 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
 
     def validate_card(self, value):
         request= self.context.get('request')
-        if value.user != request.user:
+        if value.user_id != request.user.pk:
             raise serializers.ValidationError("You can only create transaction for your ownn cards ")
         return value
     
     def validate(self, data):
-        if data['category'].type != data['type']:
+        category = data.get('category', getattr(self.instance, 'category', None))
+        transaction_type = data.get('type', getattr(self.instance, 'type', None))
+        if category.type != transaction_type:
             raise serializers.ValidationError({
-                'category': f"Category type must match transaction type ({data['type']})"
+                'category': f"Category type must match transaction type ({transaction_type})"
             })
         
-        if data['type'] == 'expense':
-            card = data['card']
+        if transaction_type == 'expense' and 'amount' in data:
+            card = data.get('card', getattr(self.instance, 'card', None))
             if not card.can_withdraw(data['amount']):
                 raise serializers.ValidationError({'amount': f"Insufficient balance. Card has {card.balance} {card.currency.code}"})
         return data
 
 
 
+class TransactionBulkItemSerializer(serializers.Serializer):
+    card = serializers.IntegerField()
+    category = serializers.IntegerField()
+    type = serializers.ChoiceField(choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'))
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    date = serializers.DateField(required=False)
+    location = serializers.CharField(max_length=200, required=False, allow_blank=True, allow_null=True)
+    tags = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class TransactionBulkCreateSerializer(serializers.Serializer):
+    transactions = TransactionBulkItemSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_transactions(self, items):
+        """
+        Resolve cards, categories and tags for the whole batch with one
+        query each, then check every item against them. Expenses are checked
+        against the card balance left after the items before them.
+        """
+        user = self.context['request'].user
+
+        cards = Card.objects.select_related('currency').in_bulk({item['card'] for item in items})
+        categories = Category.objects.filter(Q(user=None) | Q(user=user), is_active=True).in_bulk({item['category'] for item in items})
+
+        allowed_tags = TagAssigner(user).resolve({tag_id for item in items for tag_id in item.get('tags', [])})
+
+        balances = {}
+        errors = []
+        for item in items:
+            item_errors = {}
+            card = cards.get(item['card'])
+            category = categories.get(item['category'])
+
+            if card is None or card.user_id != user.pk:
+                item_errors['card'] = "You can only create transaction for your ownn cards "
+            if category is None:
+                item_errors['category'] = "Invalid category"
+            elif category.type != item['type']:
+                item_errors['category'] = f"Category type must match transaction type ({item['type']})"
+
+            if not item_errors:
+                balance = balances.get(card.pk, card.balance)
+                if item['type'] == 'expense':
+                    if balance < item['amount']:
+                        item_errors['amount'] = f"Insufficient balance. Card has {balance} {card.currency.code}"
+                    balance -= item['amount']
+                else:
+                    balance += item['amount']
+                balances[card.pk] = balance
+
+                item['card'] = card
+                item['category'] = category
+                item['tags'] = [tag_id for tag_id in dict.fromkeys(item.get('tags', [])) if tag_id in allowed_tags]
+
+            errors.append(item_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+
+
+class StatementImportSerializer(serializers.ModelSerializer):
+    card_name = serializers.CharField(source='card.card_name', read_only=True)
+    progress = serializers.ReadOnlyField()
+
+    class Meta:
+        model = StatementImport
+        fields = [
+            'id', 'card', 'card_name', 'file', 'format', 'column_mapping', 'income_category', 'expense_category',
+            'status', 'progress', 'processed_rows', 'imported_count', 'duplicate_count', 'error_count', 'errors',
+            'error', 'created_at', 'completed_at'
+        ]
+        read_only_fields = [
+            'status', 'processed_rows', 'imported_count', 'duplicate_count', 'error_count', 'errors',
+            'error', 'created_at', 'completed_at'
+        ]
+
+    def validate_card(self, value):
+        request = self.context.get('request')
+        if value.user_id != request.user.pk:
+            raise serializers.ValidationError("You can only import into your own cards")
+        return value
+
+    def validate(self, data):
+        request = self.context.get('request')
+        for field, category_type in [('income_category', 'income'), ('expense_category', 'expense')]:
+            category = data[field]
+            if category.user_id not in (None, request.user.pk):
+                raise serializers.ValidationError({field: "Cannot use another user's category"})
+            if category.type != category_type:
+                raise serializers.ValidationError({field: f"Category must be an {category_type} category"})
+        return data
+
+
+
 
 class TransactionStatisticsSerializer(serializers.Serializer):
     period =  serializers.CharField()
@@ -123,3 +227,48 @@ class TransactionStatisticsSerializer(serializers.Serializer):
     expense_count = serializers.IntegerField()
     total_transactions = serializers.IntegerField()
 
+
+
+class RecurringTransactionSerializer(serializers.ModelSerializer):
+    card_name = serializers.CharField(source='card.card_name', read_only=True)
+    category_name = serializers.CharField(source='category.name', read_only=True)
+
+    class Meta:
+        model = RecurringTransaction
+        fields = [
+            'id', 'card', 'card_name', 'category', 'category_name', 'type', 'amount', 'title', 'description',
+            'frequency', 'interval', 'start_date', 'end_date', 'next_date', 'is_active', 'last_generated_at',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['next_date', 'last_generated_at', 'created_at', 'updated_at']
+
+    def validate_card(self, value):
+        request = self.context.get('request')
+        if value.user_id != request.user.pk:
+            raise serializers.ValidationError("You can only use your own cards")
+        return value
+
+    def validate(self, data):
+        request = self.context.get('request')
+        category = data.get('category', getattr(self.instance, 'category', None))
+        transaction_type = data.get('type', getattr(self.instance, 'type', None))
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = data.get('end_date', getattr(self.instance, 'end_date', None))
+
+        if category.user_id not in (None, request.user.pk):
+            raise serializers.ValidationError({'category': "Cannot use another user's category"})
+        if category.type != transaction_type:
+            raise serializers.ValidationError({'category': f"Category type must match transaction type ({transaction_type})"})
+        if end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': "End date must be after start date"})
+        return data
+
+    def create(self, validated_data):
+        validated_data['next_date'] = validated_data['start_date']
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        # Moving the start only matters while nothing has been generated yet.
+        if 'start_date' in validated_data and instance.last_generated_at is None:
+            validated_data['next_date'] = validated_data['start_date']
+        return super().update(instance, validated_data)
@@ -0,0 +1,302 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import models, transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.cards.money import from_minor, to_minor
+from apps.cards.rates import get_rate_matrix
+from apps.cards.models import LedgerEntry
+from apps.cards.services import post_entries, signed_amount
+from core.cache import bump_data_version
+from .models import Transaction, TransactionTag, TransactionTagRelation
+from .rollups import RollupDeltas, grouped_totals
+
+
+BULK_BATCH_SIZE = 500
+
+
+class TagAssigner:
+    """
+    Attaches tags to transactions. Requested ids are resolved with a single
+    query that also does the ownership check (default tags or the user's
+    own); unknown or foreign ids are ignored, as they always were.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def resolve(self, tag_ids):
+        ids = set()
+        for tag_id in tag_ids or []:
+            try:
+                ids.add(int(tag_id))
+            except (TypeError, ValueError):
+                continue
+
+        if not ids:
+            return set()
+        return set(
+            TransactionTag.objects.filter(Q(user=None) | Q(user=self.user), id__in=ids)
+            .values_list('id', flat=True)
+        )
+
+    def assign(self, transaction, tag_ids, is_new=False):
+        """
+        Make the transaction's tags match `tag_ids`: only missing relations
+        are inserted and only dropped ones are deleted. A transaction that
+        was just created has no relations yet, so they aren't read.
+        """
+        wanted = self.resolve(tag_ids)
+        current = set()
+        if not is_new:
+            current = set(
+                TransactionTagRelation.objects.filter(transaction=transaction).values_list('tag_id', flat=True)
+            )
+
+        with db_transaction.atomic():
+            if current - wanted:
+                TransactionTagRelation.objects.filter(transaction=transaction, tag_id__in=current - wanted).delete()
+            if wanted - current:
+                TransactionTagRelation.objects.bulk_create([
+                    TransactionTagRelation(transaction=transaction, tag_id=tag_id) for tag_id in wanted - current
+                ])
+
+        # Relations prefetched by the viewset's queryset are stale now.
+        getattr(transaction, '_prefetched_objects_cache', {}).pop('transaction_tags', None)
+        return wanted
+
+
+class TransactionPostingService:
+    """
+    Saves and deletes transactions and keeps card balances in step.
+
+    Reference data (currency ids, exchange rates) comes from the in-process
+    rate matrix, so a posting costs the transaction INSERT/UPDATE, the
+    ledger entry INSERT and one balance UPDATE; an edit or delete also
+    re-reads the stored row under a lock, since that, not the copy the
+    instance was loaded with, is what the balance reflects.
+    """
+
+    def __init__(self, user=None):
+        self.user = user
+        self.rates = {}
+
+    def user_currency_id(self):
+        return get_rate_matrix().currency_id(self.user.default_currency)
+
+    def convert(self, transaction, user_currency_id=None):
+        if isinstance(transaction.date, datetime):
+            transaction.date = timezone.localdate(transaction.date)
+
+        if user_currency_id is None:
+            user_currency_id = self.user_currency_id()
+
+        rate = Decimal('1.0')
+        if user_currency_id is not None:
+            key = (transaction.card.currency_id, user_currency_id, transaction.date)
+            if key not in self.rates:
+                self.rates[key] = Transaction.get_user_currency_rate(*key)
+            rate = self.rates[key]
+
+        transaction.exchange_rate_used = rate
+        # Rounded here the way the rollups count it, so the stored value and
+        # the rollup totals agree to the minor unit.
+        transaction.amount_in_user_currency = from_minor(to_minor(transaction.amount * rate))
+        transaction.amount_minor = to_minor(transaction.amount)
+        transaction.fingerprint = Transaction.make_fingerprint(
+            transaction.card_id, transaction.date, transaction.type, transaction.amount_minor, transaction.title
+        )
+
+    def posted(self, transaction):
+        """
+        Transaction.POSTED_FIELDS of the stored row (what the balance and
+        rollups currently reflect), or None for a transaction that isn't in
+        the database yet. Call inside the atomic block that writes: the row
+        is locked (on SQLite the IMMEDIATE transaction already is), so two
+        edits of the same stale instance can't both reverse the same posting.
+        """
+        if transaction.pk is None:
+            return None
+
+        return Transaction.objects.select_for_update().filter(pk=transaction.pk).order_by().values(*Transaction.POSTED_FIELDS).first()
+
+    def balance_effect(self, values):
+        return values['card_id'], values['type'], values['amount'], values['date']
+
+    def reversal_entry(self, transaction_id, posted):
+        return LedgerEntry(
+            card_id=posted['card_id'],
+            entry_type='reversal',
+            amount=-signed_amount(posted['amount'], posted['type']),
+            effective_date=posted['date'],
+            transaction_id=transaction_id,
+        )
+
+    def posting_entry(self, transaction):
+        return LedgerEntry(
+            card_id=transaction.card_id,
+            entry_type=transaction.type,
+            amount=signed_amount(transaction.amount, transaction.type),
+            effective_date=transaction.date,
+            transaction_id=transaction.pk,
+            description=transaction.title[:255],
+        )
+
+    def apply_to_card(self, card, deltas):
+        # Keep the loaded card roughly in step for the response; the
+        # database value written with F() is the authoritative one.
+        delta = deltas.get(card.pk)
+        if delta:
+            card.balance += delta
+            card.balance_minor = to_minor(card.balance)
+            if hasattr(card, '_loaded_balance'):
+                card._loaded_balance += delta
+
+    def posted_values(self, transaction):
+        return {field: getattr(transaction, field) for field in Transaction.POSTED_FIELDS}
+
+    def save(self, transaction, *args, **kwargs):
+        self.convert(transaction)
+
+        with db_transaction.atomic():
+            posted = self.posted(transaction)
+
+            rollups = RollupDeltas()
+            if posted is not None:
+                rollups.remove_values(transaction.user_id, posted)
+            rollups.add(transaction)
+
+            models.Model.save(transaction, *args, **kwargs)
+
+            entries = []
+            if posted is None or self.balance_effect(posted) != self.balance_effect(self.posted_values(transaction)):
+                if posted is not None:
+                    entries.append(self.reversal_entry(transaction.pk, posted))
+                entries.append(self.posting_entry(transaction))
+            deltas = post_entries(entries)
+            rollups.apply()
+
+        if Transaction.card.is_cached(transaction):
+            self.apply_to_card(transaction.card, deltas)
+        return transaction
+
+    def create(self, data):
+        return self.save(Transaction(user=self.user, **data))
+
+    def bulk_create(self, items):
+        """
+        Create many transactions at once: multi-row INSERTs for the
+        transactions, their tag relations and their ledger entries, and one
+        balance UPDATE with the net change per card (see bulk_insert).
+        `items` are validated dicts with resolved `card`/`category` and a
+        `tags` id list.
+        """
+        user_currency_id = self.user_currency_id()
+
+        transactions = []
+        tag_ids = []
+        for item in items:
+            data = dict(item)
+            tag_ids.append(data.pop('tags', []))
+
+            transaction = Transaction(user=self.user, **data)
+            self.convert(transaction, user_currency_id)
+            transactions.append(transaction)
+
+        return self.bulk_insert(transactions, tag_ids)
+
+    def bulk_insert(self, transactions, tag_ids=None):
+        """
+        Insert already converted transactions (possibly for several users)
+        with their tag relations and ledger entries, and move the card
+        balances with one UPDATE, all in a single atomic block.
+        """
+        with db_transaction.atomic():
+            Transaction.objects.bulk_create(transactions, batch_size=BULK_BATCH_SIZE)
+            if tag_ids:
+                TransactionTagRelation.objects.bulk_create([
+                    TransactionTagRelation(transaction=transaction, tag_id=tag_id)
+                    for transaction, transaction_tag_ids in zip(transactions, tag_ids)
+                    for tag_id in transaction_tag_ids
+                ], batch_size=BULK_BATCH_SIZE)
+            deltas = post_entries([self.posting_entry(transaction) for transaction in transactions])
+
+            rollups = RollupDeltas()
+            for transaction in transactions:
+                rollups.add(transaction)
+            rollups.apply()
+            bump_data_version(*{transaction.user_id for transaction in transactions})
+
+        for card in {transaction.card_id: transaction.card for transaction in transactions}.values():
+            self.apply_to_card(card, deltas)
+        return transactions
+
+    def update(self, transaction, data):
+        for field, value in data.items():
+            setattr(transaction, field, value)
+        return self.save(transaction)
+
+    def delete(self, transaction, *args, **kwargs):
+        with db_transaction.atomic():
+            posted = self.posted(transaction)
+            deltas = {}
+            if posted is not None:
+                deltas = post_entries([self.reversal_entry(transaction.pk, posted)])
+
+                rollups = RollupDeltas()
+                rollups.remove_values(transaction.user_id, posted)
+                rollups.apply()
+            result = models.Model.delete(transaction, *args, **kwargs)
+
+        if Transaction.card.is_cached(transaction):
+            self.apply_to_card(transaction.card, deltas)
+        return result
+
+    def bulk_delete(self, queryset):
+        """
+        Delete every transaction in `queryset` and reverse its effect on the
+        card balances and rollups. The rows are locked first (SELECT ... FOR
+        UPDATE; on SQLite the IMMEDIATE transaction already holds the write
+        lock), so nothing can edit or delete them between reading their
+        totals and deleting them. One GROUP BY over (user, date, card,
+        category, type) of the locked rows gives both the rollup decrements
+        and, summed per card and day, the reversal entries; the balances move
+        with one UPDATE. The rows themselves go through QuerySet.delete(),
+        which also removes their tag relations.
+        """
+        with db_transaction.atomic():
+            pks = list(queryset.select_for_update().order_by().values_list('pk', flat=True))
+            if not pks:
+                return 0
+            locked = Transaction.objects.filter(pk__in=pks)
+
+            rollups = RollupDeltas()
+            reversals = {}
+            for row in grouped_totals(locked):
+                rollups.change(
+                    (row['user_id'], row['date'], row['card_id'], row['category_id'], row['type']),
+                    -row['amount_total'], -row['user_amount_total'], -row['transaction_count'],
+                )
+                net, count = reversals.get((row['card_id'], row['date']), (0, 0))
+                signed = row['amount_total'] if row['type'] == 'income' else -row['amount_total']
+                reversals[(row['card_id'], row['date'])] = (net + signed, count + row['transaction_count'])
+
+            post_entries([
+                LedgerEntry(
+                    card_id=card_id,
+                    entry_type='reversal',
+                    amount=-from_minor(net),
+                    effective_date=day,
+                    description=f"Bulk delete of {count} transactions",
+                )
+                for (card_id, day), (net, count) in reversals.items()
+            ])
+            rollups.apply()
+            bump_data_version(*{key[0] for key in rollups.deltas})
+
+            # Only what the post_delete receivers read
+            _, deleted = locked.only('id', 'user_id').delete()
+
+        return deleted.get(Transaction._meta.label, 0)
@@ -1,3 +1,790 @@
-from django.test import TestCase
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from apps.accounts.models import CustomUser
+from apps.cards import rates
+from apps.cards.ledger import ledger_total
+from apps.cards.models import Card, CardType, Currency, ExchangeRate, LedgerEntry
+from .idempotency import claim, digest
+from .imports import run_import
+from .jobs import run_revaluation
+from .recurring import materialize_due
+from .models import Category, DailyRollup, IdempotencyKey, RecurringTransaction, RevaluationJob, StatementImport, Transaction, TransactionTag, TransactionTagRelation
+from .rollups import rebuild_rollups
+from . import search
+from .services import TransactionPostingService
+
+
+TRANSACTIONS_URL = '/api/transactions/transactions/'
+
+
+class TransactionTestData:
+    """
+    A user with a USD default currency, a USD card and an expense category.
+    """
+
+    def create_world(self):
+        self.usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.uzs = Currency.objects.create(code='UZS', name='Sum', symbol='s')
+        self.card_type = CardType.objects.create(name='Visa')
+        self.user = CustomUser.objects.create(email='a@b.c', username='alice', auth_status='done', default_currency='USD')
+        self.card = Card.objects.create(
+            user=self.user, card_type=self.card_type, currency=self.usd, card_name='main',
+            balance=Decimal('1000'), initial_balance=Decimal('1000'),
+        )
+        self.category = Category.objects.create(name='Food', type='expense')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def transaction_data(self, **extra):
+        data = {
+            'card': self.card.pk, 'category': self.category.pk, 'type': 'expense',
+            'amount': '5.00', 'title': 'Coffee', 'date': '2026-10-01',
+        }
+        data.update(extra)
+        return data
+
+
+def large_image(size=3 * 1024 * 1024):
+    # Noise doesn't compress, so the PNG is about as big as its pixels
+    side = int((size / 3) ** 0.5) + 1
+    output = BytesIO()
+    Image.frombytes('RGB', (side, side), bytes(range(256)) * (side * side * 3 // 256 + 1)).save(output, 'PNG', compress_level=0)
+    return SimpleUploadedFile('receipt.png', output.getvalue(), content_type='image/png')
+
+
+class IdempotencyKeyTests(TransactionTestData, TestCase):
+
+    def setUp(self):
+        self.create_world()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def test_large_multipart_upload_with_key(self):
+        data = self.transaction_data(receipt_image=large_image())
+        self.assertGreater(data['receipt_image'].size, 2621440)
+
+        response = self.client.post(TRANSACTIONS_URL, data, format='multipart', HTTP_IDEMPOTENCY_KEY='upload-1')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        data['receipt_image'].seek(0)
+        replay = self.client.post(TRANSACTIONS_URL, data, format='multipart', HTTP_IDEMPOTENCY_KEY='upload-1')
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_same_key_with_different_body_is_rejected(self):
+        self.client.post(TRANSACTIONS_URL, self.transaction_data(), format='json', HTTP_IDEMPOTENCY_KEY='k')
+        response = self.client.post(TRANSACTIONS_URL, self.transaction_data(amount='6.00'), format='json', HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(response.status_code, 422)
+
+    def test_stale_pending_claim_is_taken_over(self):
+        self.client.post(TRANSACTIONS_URL, self.transaction_data(), format='json', HTTP_IDEMPOTENCY_KEY='k')
+        # As if the worker died before storing its response
+        IdempotencyKey.objects.update(status_code=None, response=None, claimed_at=timezone.now())
+
+        response = self.client.post(TRANSACTIONS_URL, self.transaction_data(), format='json', HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(response.status_code, 409)
+
+        IdempotencyKey.objects.update(claimed_at=timezone.now() - timedelta(minutes=5))
+        response = self.client.post(TRANSACTIONS_URL, self.transaction_data(), format='json', HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+        replay = self.client.post(TRANSACTIONS_URL, self.transaction_data(), format='json', HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data['id'], response.data['id'])
+
+    def test_claim_gives_up_when_the_row_keeps_vanishing(self):
+        with mock.patch.object(IdempotencyKey.objects, 'create', side_effect=IntegrityError):
+            self.assertEqual(claim(self.user, digest('k'), digest('body')), (None, False))
+
+            response = self.client.post(TRANSACTIONS_URL, self.transaction_data(), format='json', HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class StatementImportTests(TransactionTestData, TestCase):
+
+    def setUp(self):
+        self.create_world()
+        self.income = Category.objects.create(name='Salary', type='income')
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def upload(self, *rows):
+        content = 'date,amount,title\n' + ''.join(f'{row}\n' for row in rows)
+        return StatementImport.objects.create(
+            user=self.user, card=self.card, file=ContentFile(content.encode(), name='statement.csv'),
+            income_category=self.income, expense_category=self.category,
+        )
+
+    def test_repeated_rows_in_one_file_are_all_imported(self):
+        statement = run_import(self.upload('2026-10-01,-5.00,Coffee', '2026-10-01,-5.00,Coffee').pk)
+
+        self.assertEqual((statement.imported_count, statement.duplicate_count), (2, 0))
+        self.assertEqual(Transaction.objects.filter(title='Coffee').count(), 2)
+
+    def test_only_rows_stored_before_the_import_are_skipped(self):
+        run_import(self.upload('2026-10-01,-5.00,Coffee', '2026-10-01,-5.00,Coffee').pk)
+
+        # The same statement again plus a third coffee that day
+        statement = run_import(self.upload(*['2026-10-01,-5.00,Coffee'] * 3, '2026-10-02,-7.00,Lunch').pk)
+
+        self.assertEqual((statement.imported_count, statement.duplicate_count), (2, 2))
+        self.assertEqual(Transaction.objects.filter(title='Coffee').count(), 3)
+
+    def test_unusable_amounts_are_row_errors(self):
+        statement = run_import(self.upload(
+            '2026-10-01,NaN,Coffee', '2026-10-01,-inf,Tea', '2026-10-01,sNaN,Juice', '2026-10-01,1e30,Yacht', '2026-10-02,-7.00,Lunch',
+        ).pk)
+
+        self.assertEqual(statement.status, 'completed')
+        self.assertEqual((statement.imported_count, statement.error_count), (1, 4))
+        self.assertEqual([error['row'] for error in statement.errors], [1, 2, 3, 4])
+        self.assertEqual(list(Transaction.objects.values_list('title', flat=True)), ['Lunch'])
+
+    def test_interrupted_import_is_resumed(self):
+        run_import(self.upload('2026-09-30,-5.00,Coffee').pk)
+        statement = self.upload('2026-09-30,-5.00,Coffee', '2026-10-01,-5.00,Tea', '2026-10-01,-5.00,Tea', '2026-10-02,-9.00,Taxi', '2026-09-30,-5.00,Coffee')
+
+        original = TransactionPostingService.bulk_create
+        calls = []
+
+        def fail_second_chunk(posting, items):
+            calls.append(len(items))
+            if len(calls) == 2:
+                raise RuntimeError('worker killed')
+            return original(posting, items)
+
+        with mock.patch('apps.transactions.imports.IMPORT_CHUNK_SIZE', 2), \
+                mock.patch.object(TransactionPostingService, 'bulk_create', fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                run_import(statement.pk)
+
+        statement.refresh_from_db()
+        self.assertEqual((statement.status, statement.processed_rows), ('failed', 2))
+
+        with mock.patch('apps.transactions.imports.IMPORT_CHUNK_SIZE', 2):
+            call_command('resume_imports', '--include-failed', stdout=StringIO())
+
+        statement.refresh_from_db()
+        self.assertEqual(statement.status, 'completed')
+        # The first coffee was there before; the one at the end of the file is new
+        self.assertEqual((statement.imported_count, statement.duplicate_count), (4, 1))
+        self.assertEqual(Transaction.objects.filter(title='Coffee').count(), 2)
+        self.assertEqual(Transaction.objects.filter(title='Tea').count(), 2)
+
+
+class PostingQueryBudgetTests(TransactionTestData, TestCase):
+    """
+    What a single posting costs. Inside TestCase every atomic block is a
+    SAVEPOINT/RELEASE pair, which counts as two queries here (BEGIN/COMMIT
+    outside tests). The card and the day's rollup row already exist, so
+    the rollup is one SELECT plus one increment.
+    """
+
+    def setUp(self):
+        self.create_world()
+        self.today = timezone.localdate()
+        self.posting = TransactionPostingService(self.user)
+        self.posting.create(self.item(title='First'))
+
+    def item(self, **extra):
+        data = {
+            'card': self.card, 'category': self.category, 'type': 'expense',
+            'amount': Decimal('5.00'), 'title': 'Coffee', 'date': self.today,
+        }
+        data.update(extra)
+        return data
+
+    def balance_updates(self, context):
+        return [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "cards"')]
+
+    def test_create(self):
+        # transaction INSERT, ledger INSERT, balance UPDATE, rollup SELECT + UPDATE
+        with self.assertNumQueries(2 + 5) as context:
+            self.posting.create(self.item())
+        self.assertEqual(len(self.balance_updates(context)), 1)
+
+    def test_amount_update(self):
+        transaction = self.posting.create(self.item())
+
+        # locked read of the stored row, transaction UPDATE, reversal +
+        # posting in one ledger INSERT, balance UPDATE, rollup SELECT + UPDATE
+        with self.assertNumQueries(2 + 6) as context:
+            self.posting.update(transaction, {'amount': Decimal('7.50')})
+        self.assertEqual(len(self.balance_updates(context)), 1)
+
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('1000') - Decimal('5.00') - Decimal('7.50'))
+
+    def test_title_only_update(self):
+        transaction = self.posting.create(self.item())
+
+        # The locked read and the transaction UPDATE: balance, ledger and
+        # rollups don't move
+        with self.assertNumQueries(2 + 2) as context:
+            self.posting.update(transaction, {'title': 'Flat white'})
+        self.assertEqual(self.balance_updates(context), [])
+
+    def test_title_only_update_of_a_loaded_transaction(self):
+        transaction = self.posting.create(self.item())
+        transaction = Transaction.objects.select_related('card').get(pk=transaction.pk)
+
+        with self.assertNumQueries(2 + 2) as context:
+            self.posting.update(transaction, {'title': 'Flat white'})
+        self.assertEqual(self.balance_updates(context), [])
+
+
+class StaleInstanceTests(TransactionTestData, TestCase):
+    """
+    Two requests that loaded the same row (a PATCH sent twice) each reverse
+    what is stored when they write, not what they loaded.
+    """
+
+    def setUp(self):
+        self.create_world()
+        self.transaction = TransactionPostingService(self.user).create({
+            'card': self.card, 'category': self.category, 'type': 'expense',
+            'amount': Decimal('5.00'), 'title': 'Coffee', 'date': date(2026, 10, 1),
+        })
+
+    def assert_posted(self, balance, amount_minor, count):
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, balance)
+        self.assertEqual(ledger_total(self.card)[0], self.card.balance_minor)
+        rollup = DailyRollup.objects.get(card=self.card, date=date(2026, 10, 1))
+        self.assertEqual((rollup.amount_minor, rollup.count), (amount_minor, count))
+
+    def test_two_stale_edits(self):
+        first = Transaction.objects.get(pk=self.transaction.pk)
+        second = Transaction.objects.get(pk=self.transaction.pk)
+
+        first.amount = Decimal('7.00')
+        first.save()
+        second.amount = Decimal('9.00')
+        second.save()
+
+        self.assert_posted(Decimal('991.00'), 900, 1)
+
+    def test_stale_delete_after_an_edit(self):
+        stale = Transaction.objects.get(pk=self.transaction.pk)
+        edited = Transaction.objects.get(pk=self.transaction.pk)
+        edited.amount = Decimal('7.00')
+        edited.save()
+
+        stale.delete()
+
+        self.assert_posted(Decimal('1000.00'), 0, 0)
+
+
+class RollupConsistencyTests(TransactionTestData, TestCase):
+    """
+    The statistics endpoints only read DailyRollup, so the rows kept up by
+    every write path have to equal what rebuild_rollups computes from the
+    transactions themselves.
+    """
+
+    def setUp(self):
+        rates._matrix = None
+        self.create_world()
+        self.income = Category.objects.create(name='Salary', type='income')
+        # amount_in_user_currency of the UZS card gets rounded
+        ExchangeRate.objects.create(from_currency=self.usd, to_currency=self.uzs, rate=Decimal('12345.67'), date=date(2026, 1, 1))
+        self.sum_card = Card.objects.create(
+            user=self.user, card_type=self.card_type, currency=self.uzs, card_name='sum',
+            balance=Decimal('5000000'), initial_balance=Decimal('5000000'),
+        )
+
+    def tearDown(self):
+        rates._matrix = None
+
+    def rollups(self):
+        rows = DailyRollup.objects.values_list('user_id', 'date', 'card_id', 'category_id', 'type', 'amount_minor', 'user_amount_minor', 'count')
+        kept = {}
+        for *key, amount_minor, user_amount_minor, count in rows:
+            if count:
+                kept[tuple(key)] = (amount_minor, user_amount_minor, count)
+            else:
+                # Emptied days keep a row, but it has to be all zeros
+                self.assertEqual((amount_minor, user_amount_minor), (0, 0))
+        return kept
+
+    def create(self, **extra):
+        response = self.client.post(TRANSACTIONS_URL, self.transaction_data(**extra), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        coffee = self.create()
+        salary = self.create(card=self.sum_card.pk, category=self.income.pk, type='income', amount='1234567.89', title='Salary')
+        lunch = self.create(amount='12.35', title='Lunch', date='2026-10-02')
+        taxi = self.create(card=self.sum_card.pk, amount='45000', title='Taxi', date='2026-10-02')
+
+        response = self.client.post(f'{TRANSACTIONS_URL}bulk_create/', {'transactions': [
+            self.transaction_data(amount='3.10', title='Tea'),
+            self.transaction_data(card=self.sum_card.pk, amount='15000.50', title='Bread', date='2026-10-03'),
+            self.transaction_data(amount='99.99', title='Shoes', date='2026-10-03'),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        tea, bread, shoes = [row['id'] for row in response.data['transactions']]
+
+        # Amount, then date, then card
+        for pk, changes in [
+            (coffee, {'amount': '7.77'}),
+            (salary, {'date': '2026-10-05', 'amount': '2000000'}),
+            (lunch, {'card': self.sum_card.pk, 'amount': '150000'}),
+        ]:
+            response = self.client.patch(f'{TRANSACTIONS_URL}{pk}/', changes, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+
+        self.assertEqual(self.client.delete(f'{TRANSACTIONS_URL}{taxi}/').status_code, 204)
+        response = self.client.post(f'{TRANSACTIONS_URL}bulk_delete/', {'transaction_ids': [tea, bread]}, format='json')
+        self.assertEqual(response.data['deleted_count'], 2)
+
+        incremental = self.rollups()
+        self.assertEqual(sum(row[2] for row in incremental.values()), 4)
+        self.assertIn(shoes, Transaction.objects.values_list('id', flat=True))
+
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_revaluation_matches_a_rebuild(self):
+        self.create(amount='7.77')
+        self.create(card=self.sum_card.pk, amount='45000', title='Taxi', date='2026-10-02')
+        self.user.default_currency = 'UZS'
+        self.user.save()
+        job = RevaluationJob.objects.create(user=self.user, currency='UZS', total_transactions=2)
+
+        with mock.patch('apps.transactions.jobs.REVALUATION_CHUNK_SIZE', 1), CaptureQueriesContext(connection) as context:
+            job = run_revaluation(job.pk)
+
+        self.assertEqual((job.status, job.processed_transactions), ('completed', 2))
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('amount_in_user_currency', flat=True)), [Decimal('45000'), Decimal('95925.86')],
+        )
+        # Every chunk is read inside the atomic block that writes it
+        queries = [query['sql'] for query in context.captured_queries]
+        reads = [number for number, sql in enumerate(queries) if sql.startswith('SELECT "transactions"."id"')]
+        self.assertEqual(len(reads), 3)
+        for number in reads:
+            self.assertTrue(queries[number - 1].startswith('SAVEPOINT'), queries[number - 1])
+
+        incremental = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_benchmark_statistics_totals_match(self):
+        output = StringIO()
+        call_command('benchmark_statistics', rows=300, days=60, stdout=output)
+        self.assertIn('statistics totals match', output.getvalue())
+
+
+class BulkCreateTests(TransactionTestData, TestCase):
+
+    def setUp(self):
+        rates._matrix = None
+        self.create_world()
+        self.income = Category.objects.create(name='Salary', type='income')
+        self.second_card = Card.objects.create(
+            user=self.user, card_type=self.card_type, currency=self.usd, card_name='second',
+            balance=Decimal('50'), initial_balance=Decimal('50'),
+        )
+        self.stranger = CustomUser.objects.create(email='x@y.z', username='mallory', auth_status='done', default_currency='USD')
+        self.foreign_card = Card.objects.create(user=self.stranger, card_type=self.card_type, currency=self.usd, card_name='theirs')
+
+    def tearDown(self):
+        rates._matrix = None
+
+    def post(self, *items):
+        return self.client.post(f'{TRANSACTIONS_URL}bulk_create/', {'transactions': list(items)}, format='json')
+
+    def test_errors_are_reported_per_item_and_nothing_is_created(self):
+        response = self.post(
+            self.transaction_data(),
+            self.transaction_data(card=self.foreign_card.pk),
+            self.transaction_data(category=self.income.pk),
+            self.transaction_data(category=999999),
+        )
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['transactions']
+        self.assertEqual([sorted(item) for item in errors], [[], ['card'], ['category'], ['category']])
+        self.assertIn('must match transaction type', errors[2]['category'])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(LedgerEntry.objects.filter(entry_type='expense').count(), 0)
+
+    def test_expenses_are_checked_against_the_running_balance(self):
+        response = self.post(
+            self.transaction_data(amount='600.00'),
+            self.transaction_data(amount='600.00'),
+            self.transaction_data(card=self.second_card.pk, amount='50.00'),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([sorted(item) for item in response.data['transactions']], [[], ['amount'], []])
+        self.assertIn('Card has 400.00 USD', response.data['transactions'][1]['amount'])
+
+        # Income earlier in the batch covers a later expense
+        response = self.post(
+            self.transaction_data(amount='600.00'),
+            self.transaction_data(type='income', category=self.income.pk, amount='300.00', title='Salary'),
+            self.transaction_data(amount='600.00'),
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_only_allowed_tags_are_attached_once(self):
+        default = TransactionTag.objects.create(name='essential')
+        own = TransactionTag.objects.create(name='work', user=self.user)
+        foreign = TransactionTag.objects.create(name='secret', user=self.stranger)
+
+        response = self.post(self.transaction_data(tags=[own.pk, foreign.pk, default.pk, own.pk, 999999]))
+
+        self.assertEqual(response.status_code, 201, response.data)
+        transaction = Transaction.objects.get()
+        self.assertEqual(
+            sorted(TransactionTagRelation.objects.filter(transaction=transaction).values_list('tag_id', flat=True)),
+            sorted([own.pk, default.pk]),
+        )
+
+    def test_one_ledger_insert_and_one_balance_update_for_the_batch(self):
+        items = [
+            self.transaction_data(amount='10.00'),
+            self.transaction_data(card=self.second_card.pk, amount='20.00'),
+            self.transaction_data(type='income', category=self.income.pk, amount='5.55', title='Refund'),
+            self.transaction_data(card=self.second_card.pk, amount='0.45', date='2026-10-02'),
+        ]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.post(*items)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created_count'], 4)
+        queries = [query['sql'] for query in context.captured_queries]
+        self.assertEqual(len([sql for sql in queries if sql.startswith('INSERT INTO "ledger_entries"')]), 1)
+        self.assertEqual(len([sql for sql in queries if sql.startswith('UPDATE "cards"')]), 1)
+
+        # One posting entry per transaction, netted into each card's balance
+        self.assertEqual(LedgerEntry.objects.exclude(entry_type='opening').count(), 4)
+        for card, balance in [(self.card, Decimal('995.55')), (self.second_card, Decimal('29.55'))]:
+            card.refresh_from_db()
+            self.assertEqual(card.balance, balance)
+            self.assertEqual(ledger_total(card)[0], card.balance_minor)
+
+
+class BulkDeleteTests(TransactionTestData, TestCase):
+
+    def setUp(self):
+        self.create_world()
+        self.tag = TransactionTag.objects.create(name='work', user=self.user)
+
+    def test_bulk_delete_reverses_balances_and_removes_tags(self):
+        created = [
+            self.client.post(TRANSACTIONS_URL, self.transaction_data(amount=amount, tags=[self.tag.pk]), format='json').data['id']
+            for amount in ('5.00', '7.50', '2.25')
+        ]
+        self.assertEqual(TransactionTagRelation.objects.count(), 3)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(f'{TRANSACTIONS_URL}bulk_delete/', {'transaction_ids': created[:2] + [999999]}, format='json')
+        self.assertEqual(response.data['deleted_count'], 2)
+        # Deleted by primary key, never through the private raw delete
+        deletes = [query['sql'] for query in context.captured_queries if query['sql'].startswith('DELETE FROM "transactions"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertIn('"transactions"."id" IN', deletes[0])
+
+        self.assertEqual(list(Transaction.objects.values_list('id', flat=True)), created[2:])
+        self.assertEqual(TransactionTagRelation.objects.count(), 1)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('1000') - Decimal('2.25'))
+        self.assertEqual(self.card.balance_minor, ledger_total(self.card)[0])
+
+    def test_nothing_to_delete(self):
+        response = self.client.post(f'{TRANSACTIONS_URL}bulk_delete/', {'transaction_ids': [999999]}, format='json')
+        self.assertEqual(response.data['deleted_count'], 0)
+        self.assertFalse(LedgerEntry.objects.filter(entry_type='reversal').exists())
+
+
+class KeysetPaginationTests(TransactionTestData, TestCase):
+
+    def setUp(self):
+        self.create_world()
+        self.income = Category.objects.create(name='Salary', type='income')
+        posting = TransactionPostingService(self.user)
+        for number in range(11):
+            posting.create({
+                'card': self.card, 'category': self.income if number % 4 == 0 else self.category,
+                'type': 'income' if number % 4 == 0 else 'expense',
+                'amount': Decimal(number % 3 + 1), 'title': f'Item {number}', 'date': date(2026, 10, number % 3 + 1),
+            })
+        # Ties on (date, created_at) are only told apart by the id
+        Transaction.objects.update(created_at=timezone.now())
+
+    def walk(self, **params):
+        """
+        Ids page by page following `next`, then back from the last page
+        following `previous`; both walks have to see the same rows.
+        """
+        forward = []
+        pages = []
+        response = self.client.get(TRANSACTIONS_URL, {'page_size': 3, **params})
+        while True:
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append([row['id'] for row in response.data['results']])
+            forward += pages[-1]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+
+        backward = [pages[-1]]
+        while response.data['previous'] is not None:
+            response = self.client.get(response.data['previous'])
+            self.assertEqual(response.status_code, 200, response.data)
+            backward.insert(0, [row['id'] for row in response.data['results']])
+
+        self.assertEqual(backward, pages)
+        return forward
+
+    def ids(self, queryset, *ordering):
+        return list(queryset.order_by(*ordering).values_list('id', flat=True))
+
+    def test_default_ordering_is_stable_across_ties(self):
+        self.assertEqual(self.walk(), self.ids(Transaction.objects.all(), '-date', '-created_at', '-id'))
+
+    def test_rows_added_ahead_of_the_cursor_do_not_shift_pages(self):
+        expected = self.ids(Transaction.objects.all(), '-date', '-created_at', '-id')
+        first = self.client.get(TRANSACTIONS_URL, {'page_size': 4}).data
+
+        TransactionPostingService(self.user).create({
+            'card': self.card, 'category': self.category, 'type': 'expense',
+            'amount': Decimal('9.00'), 'title': 'Late', 'date': date(2026, 10, 5),
+        })
+        second = self.client.get(first['next']).data
+
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], expected[:8])
+
+    def test_ordering_param(self):
+        self.assertEqual(self.walk(ordering='amount'), self.ids(Transaction.objects.all(), 'amount', 'id'))
+        self.assertEqual(self.walk(ordering='-amount,date'), self.ids(Transaction.objects.all(), '-amount', 'date', '-id'))
+
+    def test_cursor_only_applies_to_its_own_ordering(self):
+        next_url = self.client.get(TRANSACTIONS_URL, {'page_size': 3}).data['next']
+
+        response = self.client.get(f'{next_url}&ordering=amount')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_composes_with_the_filters(self):
+        expected = self.ids(Transaction.objects.filter(type='expense', amount__gte=2), '-date', '-created_at', '-id')
+
+        self.assertEqual(self.walk(type='expense', amount_min='2'), expected)
+        self.assertEqual(self.walk(date_after='2026-10-02', ordering='amount'), self.ids(Transaction.objects.filter(date__gte=date(2026, 10, 2)), 'amount', 'id'))
+
+    def test_search_rank_ordering(self):
+        search._ready.clear()
+        self.addCleanup(search._ready.clear)
+        Transaction.objects.filter(title__in=['Item 1', 'Item 2']).update(description='item item item')
+        ranked = [row['id'] for row in self.client.get(TRANSACTIONS_URL, {'search': 'item', 'page_size': 100}).data['results']]
+
+        self.assertEqual(len(ranked), 11)
+        self.assertEqual(self.walk(search='item'), ranked)
+
+
+class SparseFieldsetTests(TransactionTestData, TestCase):
+
+    def setUp(self):
+        self.create_world()
+        posting = TransactionPostingService(self.user)
+        tag = TransactionTag.objects.create(name='work', user=self.user)
+        for number in range(3):
+            transaction = posting.create({
+                'card': self.card, 'category': self.category, 'type': 'expense',
+                'amount': Decimal('5.00'), 'title': f'Coffee {number}', 'date': date(2026, 10, 1),
+            })
+            TransactionTagRelation.objects.create(transaction=transaction, tag=tag)
+
+    def list(self, queries, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(TRANSACTIONS_URL, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), queries, [query['sql'] for query in context.captured_queries])
+        return response.data['results'], context.captured_queries[0]['sql']
+
+    def test_everything_by_default(self):
+        # The transactions with their joins, the tag relations, the tags
+        results, sql = self.list(3)
+        self.assertLessEqual({'id', 'title', 'card_name', 'card_currency', 'category_name', 'tags'}, set(results[0]))
+        self.assertEqual(results[0]['tags'][0]['name'], 'work')
+        self.assertIn('JOIN "cards"', sql)
+
+    def test_fields_without_relations_need_no_joins_or_prefetch(self):
+        results, sql = self.list(1, fields='id,title')
+        self.assertEqual([set(row) for row in results], [{'id', 'title'}] * 3)
+        self.assertNotIn('JOIN', sql)
+
+    def test_omit_drops_the_tag_prefetch(self):
+        results, sql = self.list(1, omit='tags,category_name')
+        self.assertNotIn('tags', results[0])
+        self.assertNotIn('category_name', results[0])
+        self.assertIn('card_currency', results[0])
+        self.assertIn('JOIN "currencies"', sql)
+
+    def test_only_the_joins_the_fields_read(self):
+        results, sql = self.list(3, fields='card_currency,tags')
+        self.assertEqual(results[0]['card_currency'], 'USD')
+        self.assertIn('JOIN "currencies"', sql)
+        self.assertNotIn('JOIN "categories"', sql)
+        self.assertNotIn('JOIN "card_types"', sql)
+
+    def test_writes_keep_every_field(self):
+        response = self.client.post(f'{TRANSACTIONS_URL}?fields=id', self.transaction_data(), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertIn('amount', response.data)
+
+
+class SearchTests(TransactionTestData, TestCase):
+
+    def setUp(self):
+        self.create_world()
+        posting = TransactionPostingService(self.user)
+        for day, title in enumerate(['Coffee shop', 'Café Olé', 'Taxi to airport'], start=1):
+            posting.create({
+                'card': self.card, 'category': self.category, 'type': 'expense',
+                'amount': Decimal('5.00'), 'title': title, 'date': date(2026, 10, day),
+            })
+        posting.create({
+            'card': self.card, 'category': self.category, 'type': 'expense', 'amount': Decimal('5.00'),
+            'title': 'Lunch', 'description': 'coffee and coffee', 'date': date(2026, 10, 4),
+        })
+        search._ready.clear()
+        self.addCleanup(search._ready.clear)
+
+    def search(self, query, **params):
+        response = self.client.get(TRANSACTIONS_URL, {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['title'] for row in response.data['results']]
+
+    def test_ranked_through_the_index(self):
+        self.assertTrue(search.search_index_ready(connection))
+        # A title match outranks a description match
+        self.assertEqual(self.search('cof'), ['Coffee shop', 'Lunch'])
+        self.assertEqual(self.search('coffee', ordering='-date'), ['Lunch', 'Coffee shop'])
+        # Diacritics are folded by the index, which LIKE can't do
+        self.assertEqual(self.search('cafe'), ['Café Olé'])
+        self.assertEqual(self.search('"AND" OR*'), [])
+
+    def test_stale_answer_is_rechecked(self):
+        # As if this process checked before rebuild_search_index ran elsewhere
+        search._ready[connection.alias] = (False, time.monotonic())
+        self.assertEqual(self.search('cafe'), [])
+
+        with override_settings(SEARCH_INDEX_RECHECK_SECONDS=0):
+            self.assertEqual(self.search('cafe'), ['Café Olé'])
+        self.assertTrue(search._ready[connection.alias][0])
+
+
+class RecurringTransactionTests(TransactionTestData, TestCase):
+
+    def setUp(self):
+        rates._matrix = None
+        self.create_world()
+
+    def tearDown(self):
+        rates._matrix = None
+
+    def schedule(self, start_date, **extra):
+        data = {
+            'user': self.user, 'card': self.card, 'category': self.category, 'type': 'expense',
+            'amount': Decimal('10.00'), 'title': 'Rent', 'frequency': 'monthly',
+            'start_date': start_date, 'next_date': start_date,
+        }
+        data.update(extra)
+        return RecurringTransaction.objects.create(**data)
+
+    def posted_dates(self):
+        return list(Transaction.objects.order_by('date').values_list('date', flat=True))
+
+    def assert_balance(self, occurrences):
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('1000') - occurrences * Decimal('10.00'))
+        self.assertEqual(ledger_total(self.card)[0], self.card.balance_minor)
+
+    def test_monthly_keeps_the_day_clamped_to_short_months(self):
+        schedule = self.schedule(date(2026, 1, 31))
+
+        self.assertEqual(materialize_due(date(2026, 5, 1)), (1, 4))
+
+        self.assertEqual(self.posted_dates(), [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)])
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.next_date, date(2026, 5, 31))
+        self.assert_balance(4)
+
+    def test_rerun_posts_nothing_twice(self):
+        self.schedule(date(2026, 9, 1), frequency='weekly')
+
+        output = StringIO()
+        call_command('materialize_recurring', date='2026-09-20', stdout=output)
+        self.assertIn('created 3 transactions', output.getvalue())
+        self.assertEqual(materialize_due(date(2026, 9, 20)), (0, 0))
+        # A missed day is caught up by the next run
+        self.assertEqual(materialize_due(date(2026, 9, 30)), (1, 2))
+
+        self.assertEqual(self.posted_dates(), [date(2026, 9, day) for day in (1, 8, 15, 22, 29)])
+        self.assert_balance(5)
+
+    def test_deactivated_after_end_date(self):
+        schedule = self.schedule(date(2026, 9, 1), frequency='weekly', end_date=date(2026, 9, 15))
+
+        self.assertEqual(materialize_due(date(2026, 10, 1)), (1, 3))
+        self.assertEqual(materialize_due(date(2026, 12, 1)), (0, 0))
+
+        schedule.refresh_from_db()
+        self.assertFalse(schedule.is_active)
+        self.assertEqual(self.posted_dates(), [date(2026, 9, 1), date(2026, 9, 8), date(2026, 9, 15)])
+
+    def test_occurrences_per_run_are_capped(self):
+        schedule = self.schedule(date(2026, 10, 1), frequency='daily')
+
+        with mock.patch('apps.transactions.recurring.MAX_OCCURRENCES_PER_RUN', 2):
+            self.assertEqual(materialize_due(date(2026, 10, 5)), (1, 2))
+            self.assertEqual(materialize_due(date(2026, 10, 5)), (1, 2))
+            self.assertEqual(materialize_due(date(2026, 10, 5)), (1, 1))
+            self.assertEqual(materialize_due(date(2026, 10, 5)), (0, 0))
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.next_date, date(2026, 10, 6))
+        self.assertEqual(len(self.posted_dates()), 5)
+        self.assert_balance(5)
+
+    def test_occurrence_already_posted_is_refused(self):
+        schedule = self.schedule(date(2026, 9, 1))
+        materialize_due(date(2026, 9, 1))
+        # As if next_date had not moved forward with the posting
+        RecurringTransaction.objects.filter(pk=schedule.pk).update(next_date=date(2026, 9, 1))
+
+        with self.assertRaises(IntegrityError):
+            materialize_due(date(2026, 9, 1))
+
+        self.assertEqual(self.posted_dates(), [date(2026, 9, 1)])
+        self.assert_balance(1)
@@ -6,6 +6,8 @@ router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
 router.register(r'tags', TransactionTagViewSet, basename='transaction-tag')
+router.register(r'imports', StatementImportViewSet, basename='statement-import')
+router.register(r'recurring', RecurringTransactionViewSet, basename='recurring-transaction')
 
 
 urlpatterns = [
@@ -1,9 +1,9 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status, filters, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum, Q, Count
+from django.db.models import Sum, Q, prefetch_related_objects
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -11,7 +11,14 @@ from decimal import Decimal
 from .models import *
 from .serializers import *
 from .filters import *
+from .services import TagAssigner, TransactionPostingService
+from .imports import schedule_import
+from .idempotency import idempotent
+from .pagination import TransactionPagination
+from .search import TransactionSearchFilter
+from core.cache import cached_response
 from apps.cards.models import *
+from apps.cards.money import from_minor
 
 
 
@@ -92,7 +99,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
 class TransactionViewSet(viewsets.ModelViewSet):
     """    
     Endpoints:
-    - GET /api/transactions/ - List all user's transactions
+    - GET /api/transactions/ - List all user's transactions (cursor paginated, follow `next`/`previous`; ?fields=/?omit= to trim)
     - POST /api/transactions/ - Create new transaction
     - GET /api/transactions/{id}/ - Get specific transaction
     - PUT/PATCH /api/transactions/{id}/ - Update transaction
@@ -101,17 +108,27 @@ class TransactionViewSet(viewsets.ModelViewSet):
     - GET /api/transactions/recent/ - Get recent transactions
     - GET /api/transactions/by_category/ - Group by category
     - GET /api/transactions/by_date/ - Group by date
+    - POST /api/transactions/bulk_create/ - Create many transactions at once
     """
 
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, TransactionSearchFilter, filters.OrderingFilter]
     filterset_class = TransactionFilter
     search_fields = ['title', 'description', 'location']
     ordering_fields = ['date', 'amount', 'created_at']
     ordering = ['-date', '-created_at']
+    pagination_class = TransactionPagination
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user).select_related('card', 'category', 'card__currency', 'card__card_type').prefetch_related('transaction_tags__tag')
+        queryset = Transaction.objects.filter(user=self.request.user).select_related('card', 'category', 'card__currency', 'card__card_type').prefetch_related('transaction_tags__tag')
+        if self.action in ['list', 'recent']:
+            # Only the joins the requested ?fields= need
+            queryset = TransactionSerializer.setup_queryset(queryset, self.request)
+        return queryset
+
+    def get_rollups(self):
+        # Days whose transactions were all deleted keep a zero row
+        return DailyRollup.objects.filter(user=self.request.user, count__gt=0)
     
 
     def get_serializer_class(self):
@@ -124,22 +141,20 @@ class TransactionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def get_tag_ids(self, request):
+        if hasattr(request.data, 'getlist'):
+            return request.data.getlist('tags')
+        return request.data.get('tags') or []
+
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception= True)
 
-        tag_ids = request.data.get('tags', [])
-
-        transaction = serializer.save()
+        transaction = TransactionPostingService(request.user).create(serializer.validated_data)
 
-        if tag_ids:
-            for tag_id in tag_ids:
-                try:
-                    tag = TransactionTag.objects.get(id = tag_id)
-                    if tag.user is None or tag.user == request.user:
-                        TransactionTagRelation.objects.create(transaction=transaction, tag = tag)
-                except TransactionTag.DoesNotExist:
-                    pass
+        if 'tags' in request.data:
+            TagAssigner(request.user).assign(transaction, self.get_tag_ids(request), is_new=True)
 
         headers = self.get_success_headers(serializer.data)
         return Response(TransactionDetailSerializer(transaction).data, status=status.HTTP_201_CREATED, headers=headers)
@@ -148,26 +163,17 @@ class TransactionViewSet(viewsets.ModelViewSet):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
 
-        transaction = serializer.save()
+        transaction = TransactionPostingService(request.user).update(instance, serializer.validated_data)
 
         if 'tags' in request.data:
-            tag_ids = request.data.get('tags', [])
-
-            TransactionTagRelation.objects.filter(transaction=transaction).delete()
-
-            for tag_id in tag_ids:
-                try:
-                    tag = TransactionTag.objects.get(id =tag_id)
-                    if tag.user is None or tag.user == request.user:
-                        TransactionTagRelation.objects.create(transaction=transaction, tag=tag)
-
-                except TransactionTag.DoesNotExist:
-                    pass
-        return Response(TransactionDetailSerializer(transaction))
+            TagAssigner(request.user).assign(transaction, self.get_tag_ids(request))
+        return Response(TransactionDetailSerializer(transaction).data)
     
 
     @action(detail=False, methods=['get'])
+    @cached_response
     def statistics(self, request):
         period = request.query_params.get('period', 'month')
         start_date = request.query_params.get('start_date')
@@ -198,22 +204,32 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
 
         
-        transactions = self.get_queryset()
+        # One grouped pass over the period's daily rollups; the totals,
+        # counts and top lists are all sums over these (category, type) rows.
+        rollups = self.get_rollups()
         if start and end:
-            transactions= transactions.filter(date__gte=start, date__lte=end)
-
-        income_transactions = transactions.filter(type='income')
-        expense_transactions = transactions.filter(type='expense')
-
-        total_income = income_transactions.aggregate(total=Sum('amount_in_user_currency'))['total'] or Decimal('0')
-        total_expense = expense_transactions.aggregate(total=Sum('amount_in_user_currency'))['total'] or Decimal('0')
-
-        category_breakdown = transactions.values(
-            'category__name', 'category__icon', 'category__color', 'type'
-        ).annotate(total=Sum('amount_in_user_currency'), count=Count('id')).order_by('-total')
-
-        top_expense_categories = expense_transactions.values('category__name', 'category__icon').annotate(total=Sum('amount_in_user_currency')).order_by('-total')[:5]
-        top_income_categories = income_transactions.values('category__name', 'category__icon').annotate(total=Sum('amount_in_user_currency')).order_by('-total')[:5]
+            rollups = rollups.filter(date__gte=start, date__lte=end)
+
+        category_breakdown = list(rollups.values(
+            'category__name', 'category__icon', 'type'
+        ).annotate(total=Sum('user_amount_minor'), count=Sum('count')).order_by('-total'))
+
+        totals = {'income': Decimal('0'), 'expense': Decimal('0')}
+        counts = {'income': 0, 'expense': 0}
+        top_categories = {'income': [], 'expense': []}
+        for row in category_breakdown:
+            row['total'] = from_minor(row['total'])
+            totals[row['type']] += row['total']
+            counts[row['type']] += row['count']
+            if len(top_categories[row['type']]) < 5:
+                top_categories[row['type']].append({
+                    'category__name': row['category__name'],
+                    'category__icon': row['category__icon'],
+                    'total': row['total']
+                })
+
+        total_income = totals['income']
+        total_expense = totals['expense']
 
         data = {
             'period': period,
@@ -223,12 +239,12 @@ class TransactionViewSet(viewsets.ModelViewSet):
             'total_income': total_income,
             'total_expense': total_expense,
             'net': total_income - total_expense,
-            'income_count': income_transactions.count(),
-            'expense_count': expense_transactions.count(),
-            'total_transactions': transactions.count(),
-            'category_breakdown': list(category_breakdown),
-            'top_expense_categories': list(top_expense_categories),
-            'top_income_categories': list(top_income_categories)
+            'income_count': counts['income'],
+            'expense_count': counts['expense'],
+            'total_transactions': counts['income'] + counts['expense'],
+            'category_breakdown': category_breakdown,
+            'top_expense_categories': top_categories['expense'],
+            'top_income_categories': top_categories['income']
         }
 
         return Response(data)
@@ -244,109 +260,137 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def by_category(self, request):
-        transactions = self.get_queryset()
+        rollups = self.get_rollups()
 
         start_date= request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
 
         if start_date:
-            transactions = transactions.filter(date__gte=start_date)
+            rollups = rollups.filter(date__gte=start_date)
         if end_date:
-            transactions = transactions.filter(date__lte = end_date)
+            rollups = rollups.filter(date__lte = end_date)
 
         
         transaction_type = request.query_params.get('type')
         if transaction_type in ['income', 'expense']:
-            transactions = transactions.filter(type=transaction_type)
+            rollups = rollups.filter(type=transaction_type)
 
-        result = transactions.values(
+        result = list(rollups.values(
             'category__id',
             'category__name',
             'category__icon',
-            'category__color',
             'category__type',
         ).annotate(
-            total_amount=Sum('amount_in_user_currency'), transaction_count = Count('id')
-        ).order_by('-total_amount')
+            total_amount=Sum('user_amount_minor'), transaction_count = Sum('count')
+        ).order_by('-total_amount'))
 
-        return Response(list(result))
+        for row in result:
+            row['total_amount'] = from_minor(row['total_amount'])
+        return Response(result)
     
 
     @action(detail=False, methods=['get'])
     def by_date(self, request):
-        transactions = self.get_queryset()
+        rollups = self.get_rollups()
 
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         if start_date:
-            transactions = transactions.filter(date__get=start_date)
+            rollups = rollups.filter(date__gte=start_date)
         if end_date: 
-            transactions = transactions.filter(date__lte=end_date)
+            rollups = rollups.filter(date__lte=end_date)
 
-        from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
+        from django.db.models import F
+        from django.db.models.functions import TruncWeek, TruncMonth
 
-        group_by = request.query_params.get('gorup_by', 'day')
+        group_by = request.query_params.get('group_by', 'day')
 
         if group_by =='week':
-            trunc_func = TruncWeek
+            period = TruncWeek('date')
         elif group_by =='month':
-            trunc_func = TruncMonth
+            period = TruncMonth('date')
         else:
-            trunc_func = TruncDate
+            period = F('date')
         
-        result = transactions.annotate(period =trunc_func('date')).values('period').annotate(
-            total_income = Sum('amount_in_user_currency', filter=Q(type='income')),
-            total_expense = Sum('amount_in_user_currency', filter=Q(type='expense')),
-            income_count = Count('id', filter=Q(type='income')),
-            expense_count = Count('id', filter=Q(type='expense')),
-        ).order_by('period')
-
-        return Response(list(result))
+        result = list(rollups.annotate(period =period).values('period').annotate(
+            total_income = Sum('user_amount_minor', filter=Q(type='income')),
+            total_expense = Sum('user_amount_minor', filter=Q(type='expense')),
+            income_count = Sum('count', filter=Q(type='income'), default=0),
+            expense_count = Sum('count', filter=Q(type='expense'), default=0),
+        ).order_by('period'))
+
+        for row in result:
+            row['total_income'] = from_minor(row['total_income'])
+            row['total_expense'] = from_minor(row['total_expense'])
+        return Response(result)
     
     @action(detail=False, methods=['get'])
     def by_card(self, request):
-        transactions = self.get_queryset()
+        rollups = self.get_rollups()
 
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
 
         if start_date:
-            transactions = transactions.filter(date__get=start_date)
+            rollups = rollups.filter(date__gte=start_date)
         if end_date: 
-            transactions = transactions.filter(date__lte=end_date)
+            rollups = rollups.filter(date__lte=end_date)
         
-        result = transactions.values(
+        result = list(rollups.values(
             'card__id',
             'card__card_name',
             'card__currency__code',
             'card__card_type__name',
         ).annotate(
-            total_income = Sum('amount', filter=Q(type='income')),
-            total_expense = Sum('amount', filter=Q(type='expense')),
-            transaction_count = Count('id')
-        ).order_by('-transaction_count')
-
-        return Response(list(result))
+            total_income = Sum('amount_minor', filter=Q(type='income')),
+            total_expense = Sum('amount_minor', filter=Q(type='expense')),
+            transaction_count = Sum('count')
+        ).order_by('-transaction_count'))
+
+        for row in result:
+            row['total_income'] = from_minor(row['total_income'])
+            row['total_expense'] = from_minor(row['total_expense'])
+        return Response(result)
     
     @action(detail=False, methods=['get'])
+    @cached_response
     def monthly_trend(self, request):
         from django.db.models.functions import TruncMonth
 
         today = timezone.now().date()
         start_date = today - timedelta(days=365)
 
-        transactions = self.get_queryset().filter(date__gte=start_date)
+        rollups = self.get_rollups().filter(date__gte=start_date)
 
-        result = transactions.annotate(
+        result = list(rollups.annotate(
             month = TruncMonth('date')
         ).values('month').annotate(
-            income = Sum('amount_in_user_currency', filter=Q(type='income')),
-            expense = Sum('amount_in_user_currency', filter=Q(type='expense')),
-            net= Sum('amount_in_user_currency', filter=Q(type='income')) - Sum('amount_in_user_currency', filter=Q(type='expense'))
-        ).order_by('month')
-
-        return Response(list(result))
+            income = Sum('user_amount_minor', filter=Q(type='income')),
+            expense = Sum('user_amount_minor', filter=Q(type='expense')),
+            net= Sum('user_amount_minor', filter=Q(type='income')) - Sum('user_amount_minor', filter=Q(type='expense'))
+        ).order_by('month'))
+
+        for row in result:
+            row['income'] = from_minor(row['income'])
+            row['expense'] = from_minor(row['expense'])
+            row['net'] = from_minor(row['net'])
+        return Response(result)
     
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def bulk_create(self, request):
+        serializer = TransactionBulkCreateSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+
+        transactions = TransactionPostingService(request.user).bulk_create(serializer.validated_data['transactions'])
+        prefetch_related_objects(transactions, 'transaction_tags__tag')
+
+        return Response({
+            'message': f'{len(transactions)} transactions created successfully',
+            'created_count': len(transactions),
+            'transactions': TransactionSerializer(transactions, many=True).data
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['post'])
     def bulk_delete(self, request):
         transaction_ids = request.data.get('transaction_ids', [])
@@ -357,11 +401,8 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        transactions = self.get_queryset().filter(id__in=transaction_ids)
-        count = transactions.count()
-
-
-        transactions.delete()
+        transactions = Transaction.objects.filter(user=request.user, id__in=transaction_ids)
+        count = TransactionPostingService(request.user).bulk_delete(transactions)
 
         return Response({
             'message': f'{count} transactions deleted successfully',
@@ -411,4 +452,68 @@ class TransactionTagViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
 
-    
\ No newline at end of file
+    
+
+
+
+class StatementImportViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Endpoints:
+    - POST /api/transactions/imports/ - Upload a CSV/OFX statement (multipart), imported in the background
+    - GET /api/transactions/imports/ - List user's imports
+    - GET /api/transactions/imports/{id}/ - Import status and progress
+    """
+    serializer_class = StatementImportSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return StatementImport.objects.filter(user=self.request.user).select_related('card')
+
+    def perform_create(self, serializer):
+        statement = serializer.save(user=self.request.user)
+        schedule_import(statement)
+
+
+class RecurringTransactionViewSet(viewsets.ModelViewSet):
+    """
+    Endpoints:
+    - GET /api/transactions/recurring/ - List user's recurring transactions
+    - POST /api/transactions/recurring/ - Create a schedule (first occurrence on start_date)
+    - GET /api/transactions/recurring/{id}/ - Get a schedule
+    - PUT/PATCH /api/transactions/recurring/{id}/ - Update a schedule (applies to future occurrences)
+    - DELETE /api/transactions/recurring/{id}/ - Delete a schedule (generated transactions are kept)
+    - GET /api/transactions/recurring/{id}/upcoming/?count= - Next occurrence dates
+    """
+    serializer_class = RecurringTransactionSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['card', 'category', 'type', 'frequency', 'is_active']
+    ordering_fields = ['next_date', 'amount', 'created_at']
+    ordering = ['next_date']
+
+    def get_queryset(self):
+        return RecurringTransaction.objects.filter(user=self.request.user).select_related('card', 'category')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def upcoming(self, request, pk=None):
+        schedule = self.get_object()
+        try:
+            count = min(max(int(request.query_params.get('count', 5)), 1), 100)
+        except ValueError:
+            return Response({'error': 'count must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dates = []
+        day = schedule.next_date
+        while schedule.is_active and len(dates) < count and (schedule.end_date is None or day <= schedule.end_date):
+            dates.append(day)
+            day = schedule.occurrence_after(day)
+
+        return Response({
+            'id': schedule.pk,
+            'title': schedule.title,
+            'amount': schedule.amount,
+            'dates': dates
+        })
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:44
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+
+def backfill_amount_minor(apps, schema_editor):
+    CardTransfer = apps.get_model('transfers', 'CardTransfer')
+    CardTransfer.objects.update(amount_minor=Cast(Round(F('amount') * 100), models.BigIntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transfers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardtransfer',
+            name='amount_minor',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Amount in minor units (e.g. cents), kept in sync with amount'),
+        ),
+        migrations.RunPython(backfill_amount_minor, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from apps.cards.models import *
+from apps.cards.money import to_minor
+from apps.cards.services import post_entries, refresh_balance
 
 
 class CardTransfer(models.Model):
@@ -10,6 +12,7 @@ class CardTransfer(models.Model):
     from_card = models.ForeignKey('cards.Card', on_delete=models.PROTECT, related_name='outgoing_transfers')
     to_card = models.ForeignKey('cards.Card', on_delete=models.PROTECT, related_name='incoming_transfers')
     amount = models.DecimalField(max_digits=15, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    amount_minor = models.BigIntegerField(default=0, editable=False, help_text="Amount in minor units (e.g. cents), kept in sync with amount")
     exchange_rate = models.DecimalField(max_digits=15, decimal_places=6, null=True, blank=True,
                                         help_text='Rate used to convert from source to destination currency')
     converted_amount = models.DecimalField(max_digits=15, decimal_places=2,
@@ -26,12 +29,14 @@ class CardTransfer(models.Model):
         return f"Transfer: {self.from_card.card_name} -> {self.to_card.card_name} ({self.amount})"
 
     def save(self, *args, **kwargs):
-        if self.from_card.currency != self.to_card.currency:
+        self.amount_minor = to_minor(self.amount)
+
+        if self.from_card.currency_id != self.to_card.currency_id:
             from apps.cards.models import ExchangeRate
 
             rate = self.exchange_rate or ExchangeRate.get_latest_rate(
-                self.from_card.currency,
-                self.to_card.currency
+                self.from_card.currency_id,
+                self.to_card.currency_id
             )
 
             if not rate:
@@ -44,14 +49,20 @@ class CardTransfer(models.Model):
             self.exchange_rate = Decimal('1.000000')
             self.converted_amount = self.amount
 
-        if not self.pk:
-            self.from_card.balance -= self.amount
-            self.from_card.save()
+        if self.pk:
+            return super().save(*args, **kwargs)
 
-            self.to_card.balance += self.converted_amount
-            self.to_card.save()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            post_entries([
+                LedgerEntry(card_id=self.from_card_id, entry_type='transfer_out', amount=-self.amount,
+                            transfer_id=self.pk, description=f"Transfer to {self.to_card.card_name}"),
+                LedgerEntry(card_id=self.to_card_id, entry_type='transfer_in', amount=self.converted_amount,
+                            transfer_id=self.pk, description=f"Transfer from {self.from_card.card_name}"),
+            ])
 
-        super().save(*args, **kwargs)
+        refresh_balance(self.from_card)
+        refresh_balance(self.to_card)
 
     def get_fee_amount(self):
         return Decimal('0.00')
@@ -1,13 +1,15 @@
 from rest_framework import serializers
 from decimal import Decimal
 from .models import *
+from core.serializers import SparseFieldsetMixin
 
 
 
-class TransferSerializer(serializers.ModelSerializer):
+class TransferSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = CardTransfer
-        fields = "__all__"
+        # amount_minor is internal bookkeeping, not part of the API
+        exclude = ('amount_minor',)
         read_only_fields = ('user', 'exchange_rate', 'converted_amount', 'created_at')
 
     def validate(self, data):
@@ -21,7 +23,7 @@ class TransferSerializer(serializers.ModelSerializer):
         if from_card.user != user or to_card.user != user:
             raise serializers.ValidationError("Invalid card")
 
-        if from_car  == to_card:
+        if from_card == to_card:
             raise serializers.ValidationError("Cannot transfer to the same card")
 
         if amount< Decimal('0.01'):
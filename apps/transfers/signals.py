@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache import bump_data_version
+from .models import CardTransfer
+
+
+@receiver(post_save, sender=CardTransfer)
+@receiver(post_delete, sender=CardTransfer)
+def transfer_changed(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
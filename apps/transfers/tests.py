@@ -1,3 +1,35 @@
+from decimal import Decimal
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.accounts.models import CustomUser
+from apps.cards.models import Card, CardType, Currency
+from .models import CardTransfer
+
+
+class TransferSerializerTests(TestCase):
+
+    def setUp(self):
+        usd = Currency.objects.create(code='USD', name='Dollar', symbol='$')
+        self.user = CustomUser.objects.create(email='a@b.c', username='alice', auth_status='done', default_currency='USD')
+        card_type = CardType.objects.create(name='Visa')
+        self.source = Card.objects.create(user=self.user, card_type=card_type, currency=usd, card_name='main', balance=Decimal('100'), initial_balance=Decimal('100'))
+        self.target = Card.objects.create(user=self.user, card_type=card_type, currency=usd, card_name='savings')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_minor_units_stay_out_of_the_api(self):
+        response = self.client.post('/api/transfers/transfers/', {
+            'from_card': self.source.pk, 'to_card': self.target.pk, 'amount': '12.34',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertNotIn('amount_minor', response.data)
+        self.assertEqual(CardTransfer.objects.get().amount_minor, 1234)
 
-# Create your tests here.
+        listed = self.client.get('/api/transfers/transfers/').data['results']
+        detail = self.client.get(f'/api/transfers/transfers/detail/{listed[0]["id"]}/').data
+        self.assertEqual(listed[0]['amount'], '12.34')
+        self.assertNotIn('amount_minor', listed[0])
+        self.assertNotIn('amount_minor', detail)
@@ -8,6 +8,7 @@ from django.shortcuts import get_object_or_404
 from .models import CardTransfer
 from apps.cards.models import *
 from .serializers import *
+from apps.transactions.idempotency import idempotent
 
 
 
@@ -25,12 +26,12 @@ class TransferAPI(APIView):
 
             return Response({
                 'total_transferred': float(total),
-                'results': TransferSerializer(qs, many=True).data
+                'results': TransferSerializer(qs, many=True, context={'request': request}).data
             })
 
         if action == 'detail':
             obj = get_object_or_404(CardTransfer, pk=pk, user=request.user)
-            return Response(TransferSerializer(obj).data)
+            return Response(TransferSerializer(obj, context={'request': request}).data)
 
         if action == 'rate':
             f= request.GET.get("from")
@@ -87,15 +88,16 @@ class TransferAPI(APIView):
             stats = transfers.annotate(month=TruncMonth("created_at")).values("month").annotate(count=Count("id"), total=Sum("amount")).order_by("-month")[:6]
 
             return Response({
-                "recent": TransferSerializer(transfers[:20], many=True).data,
+                "recent": TransferSerializer(transfers[:20], many=True, context={'request': request}).data,
                 "monthly_stats": stats,
                 "total_count": transfers.count(),
             })
 
 
+    @idempotent
     def post(self, request, action=None):
 
-        serializer = CardTransferSerializer(data=request.data, context={'request': request})
+        serializer = TransferSerializer(data=request.data, context={'request': request})
 
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -0,0 +1,86 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+
+DEFAULT_RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+def version_key(user_id):
+    return f"user-data-version:{user_id}"
+
+
+def data_version(user_id):
+    """
+    Token that changes whenever the user's data does; same scheme as the
+    rate matrix version (apps.cards.rates.current_version).
+    """
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(*user_ids):
+    """
+    Retire every cached response of these users. Done after commit: bumping
+    earlier would let a concurrent request cache the old rows under the new
+    version.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    def bump():
+        cache.set_many({version_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
+
+    transaction.on_commit(bump)
+
+
+def response_cache_key(view, name, request):
+    from apps.cards.rates import current_version as rates_version
+
+    params = sorted((key, request.query_params.getlist(key)) for key in request.query_params)
+    raw = repr([
+        type(view).__name__,
+        name,
+        view.kwargs.get('pk'),
+        params,
+        # Period defaults ("this month"), the display currency and exchange
+        # rates all change the answer without a write by the user.
+        timezone.localdate().isoformat(),
+        request.user.default_currency,
+        rates_version(),
+    ])
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f"response:{request.user.pk}:{data_version(request.user.pk)}:{digest}"
+
+
+def cached_response(view_method):
+    """
+    Cache a GET action's 200 response per user. The key holds the user's
+    data version, so a write (see bump_data_version) makes every older entry
+    unreachable and a hit runs no data queries at all.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = response_cache_key(self, view_method.__name__, request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', DEFAULT_RESPONSE_CACHE_TIMEOUT)
+            cache.set(key, response.data, timeout)
+        return response
+
+    return wrapper
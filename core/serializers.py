@@ -0,0 +1,67 @@
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+
+def split_param(request, name):
+    return {value.strip() for param in request.query_params.getlist(name) for value in param.split(',') if value.strip()}
+
+
+def requested_fields(request):
+    """
+    (fields, omit) from `?fields=a,b` and `?omit=c`. fields is None when
+    the client didn't restrict them. Reads only: a write keeps every field,
+    since the same serializer validates the input.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    return split_param(request, 'fields') or None, split_param(request, 'omit')
+
+
+class SparseFieldsetMixin:
+    """
+    Lets a list client ask for only the fields it shows, with `?fields=`
+    and `?omit=` (comma separated, unknown names are ignored). Fields are
+    dropped before they are built, so a SerializerMethodField that isn't
+    asked for never runs. Only the top-level serializer is trimmed, never
+    one nested inside another.
+
+    setup_queryset() narrows the view's select_related/prefetch_related to
+    what the kept fields read: dotted sources ('card.currency.code') give
+    the joins and `Meta.prefetch_fields` names the prefetches of method
+    fields.
+    """
+
+    def is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_field_names(self, declared_fields, info):
+        names = super().get_field_names(declared_fields, info)
+        if not self.is_top_level():
+            return names
+
+        fields, omit = requested_fields(self.context.get('request'))
+        return [name for name in names if (fields is None or name in fields) and name not in omit]
+
+    @classmethod
+    def setup_queryset(cls, queryset, request):
+        fields, omit = requested_fields(request)
+        if fields is None and not omit:
+            return queryset
+
+        select = set()
+        prefetch = set()
+        prefetch_fields = getattr(cls.Meta, 'prefetch_fields', {})
+        for name, field in cls(context={'request': request}).fields.items():
+            path = field.source.split('.')[:-1] if field.source != '*' else []
+            if path:
+                select.add('__'.join(path))
+            prefetch.update(prefetch_fields.get(name, []))
+
+        # select_related() with no arguments would follow every relation
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        return queryset.prefetch_related(*sorted(prefetch))
@@ -200,6 +200,18 @@ DATABASES = {
     }
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['OPTIONS'] = {
+        # Writers (requests and the background import/revaluation threads)
+        # take the write lock when their transaction starts and wait for it,
+        # instead of failing with "database is locked" on an upgrade.
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 20,
+    }
+    # A file, not the shared in-memory database, so tests that write from
+    # several threads wait for the lock like the real database does.
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -261,4 +273,24 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Upper bound on how long a cached dashboard response (statistics, trends,
+# budget overview) is kept; writes by the user retire it immediately
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 3600))
+
+# Longest time a process keeps using its in-memory exchange rate matrix.
+# With a shared cache in CACHES rate changes reach every process at once;
+# without one this is how stale another process's rates can get.
+RATE_MATRIX_MAX_AGE = int(os.getenv("RATE_MATRIX_MAX_AGE", 300))
+
+# How long a stored Idempotency-Key response is replayed before it is pruned
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", 24))
+
+# A request still marked in progress this long after it started is assumed
+# dead (worker killed) and a retry with the same key runs it again
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 60))
+
+# How long a process trusts its check that the full-text search index is
+# installed, so rebuild_search_index run elsewhere is picked up
+SEARCH_INDEX_RECHECK_SECONDS = int(os.getenv("SEARCH_INDEX_RECHECK_SECONDS", 60))
+
 AUTH_USER_MODEL = "accounts.CustomUser"
\ No newline at end of file